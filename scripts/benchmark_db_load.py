@@ -0,0 +1,88 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from benchmark_upload_clean import write_synthetic_csv
+from database import Database
+from upload_zepto_data import upload_file
+
+# Configuration
+DEFAULT_ROWS = 100_000
+DEFAULT_TABLE = "zepto_assortment_bench"
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("Zepto_DB_Load_Benchmark")
+
+def truncate(table: str):
+    """Empties the benchmark table between runs (needs DATABASE_URL)."""
+    db = Database(loader="copy")
+    if db.loader != "copy":
+        return False
+    try:
+        from psycopg import sql
+        db._pg_connection().execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(table)))
+        return True
+    except Exception as e:
+        logger.warning(f"Could not truncate {table}: {e}")
+        return False
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="REST vs COPY load times into a scratch table. Create it first with: "
+                    f"create table {DEFAULT_TABLE} (like zepto_assortment including all);")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--table", type=str, default=DEFAULT_TABLE)
+    parser.add_argument("--loaders", nargs="+", choices=["rest", "copy"], default=["rest", "copy"])
+    parser.add_argument("--batch-size", type=int, default=100, help="REST batch size")
+    parser.add_argument("--file", type=str, default=None, help="Load an existing assortment CSV instead of a synthetic one")
+    args = parser.parse_args()
+
+    if args.table in ("zepto_assortment", "zepto_assortment_changes"):
+        print("Refusing to benchmark against a live table; pass a scratch --table.")
+        sys.exit(2)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if not path:
+            path = os.path.join(tmp, "assortment.csv")
+            write_synthetic_csv(path, args.rows)
+
+        for loader in args.loaders:
+            db = Database(loader=loader)
+            if db.loader != loader or not db.connected:
+                print(f"Skipping {loader}: not configured (see .env.example)")
+                continue
+            truncate(args.table)
+            start = time.perf_counter()
+            uploaded, failed, batches = upload_file(db, path, args.table, args.batch_size)
+            elapsed = time.perf_counter() - start
+            db.close()
+            results[loader] = {"rows": uploaded, "failed": failed, "batches": batches, "sec": elapsed}
+
+        # A second COPY of the same file should merge to nothing new
+        if "copy" in results:
+            db = Database(loader="copy")
+            start = time.perf_counter()
+            uploaded, failed, batches = upload_file(db, path, args.table)
+            results["copy (reload, merge only)"] = {"rows": uploaded, "failed": failed, "batches": batches,
+                                                    "sec": time.perf_counter() - start}
+            db.close()
+        truncate(args.table)
+
+    print(f"{'loader':<28}{'rows':>10}{'failed':>8}{'batches':>9}{'sec':>9}{'rows/s':>12}")
+    for name, r in results.items():
+        rate = r["rows"] / r["sec"] if r["sec"] > 0 else 0
+        print(f"{name:<28}{r['rows']:>10,}{r['failed']:>8,}{r['batches']:>9,}{r['sec']:>9.2f}{rate:>12,.0f}")
+
+if __name__ == "__main__":
+    main()
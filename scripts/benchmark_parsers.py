@@ -0,0 +1,223 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from scrapers.records import ProductBatch
+from scrapers.zepto import ZeptoScraper, build_flight_details_map, extract_cards, find_cards
+
+# Configuration
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+FIXTURES_DIR = os.path.join(DATA_DIR, "fixtures")
+BASELINE_FILE = os.path.join(DATA_DIR, "benchmarks", "parser_baseline.json")
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("Zepto_Parser_Benchmark")
+# Per-call INFO lines from the parsers would dominate the timings
+logging.getLogger("scrapers").setLevel(logging.WARNING)
+
+# --- Synthetic payloads (deterministic, shaped like live Zepto data) ---
+
+def pvid(i: int) -> str:
+    return f"{i:08x}-0000-4000-8000-{i:012x}"
+
+def make_api_items(n: int) -> list:
+    return [{
+        "id": pvid(i),
+        "name": f"Fresh Product {i} 500 g",
+        "mrp": 5000 + i % 300,
+        "sellingPrice": 4500 + i % 250,
+        "availableQuantity": i % 9,
+        "packsize": 500,
+        "brand": f"Brand{i % 40}",
+        "slug": f"brand{i % 40}-fresh-product-{i}",
+        "shelfLifeInHours": 72,
+    } for i in range(n)]
+
+def make_cards(n: int) -> list:
+    return [{
+        "id": pvid(i),
+        "product": {"name": f"Fresh Product {i}", "brand": f"Brand{i % 40}"},
+        "productVariant": {"formattedPacksize": "500 g", "mrp": 5000, "shelfLifeInHours": 72},
+        "sellingPrice": 4500 + i % 250,
+        "mrp": 5000 + i % 300,
+        "availableQuantity": i % 9,
+        "storeId": "b4dc8d65-0000-0000-0000-000000000000",
+    } for i in range(n)]
+
+def make_rsc_body(cards: list) -> str:
+    return "\n".join(f"{i:x}:" + json.dumps({"cardData": c}) for i, c in enumerate(cards))
+
+def make_flight_body(n: int) -> str:
+    """SSR Flight-style string: escaped JSON detail blocks plus product anchors."""
+    parts = []
+    for i in range(n):
+        parts.append(
+            f'{{\\"availableQuantity\\":{i % 9},\\"shelfLifeInHours\\":\\"72\\",'
+            f'\\"packsize\\":500,\\"id\\":\\"{pvid(i)}\\"}}'
+        )
+        parts.append(
+            f'<a href="/pn/brand{i % 40}-fresh-product-{i}/pvid/{pvid(i)}">{i}. Fresh Product {i} 500g</a>'
+            f'<td>₹{45 + i % 50}</td>'
+        )
+    return "".join(parts)
+
+# --- Reference implementations (what the scraper did before, kept for comparison) ---
+
+def inline_re_flight_details_map(content: str) -> dict:
+    """build_flight_details_map as it was: regexes by source string per id, windows sliced out."""
+    details_map = {}
+    for match in re.finditer(r'\\\"id\\\":\\\"([a-f0-9\-]+)\\\"', content):
+        window = content[max(0, match.start() - 1000):min(len(content), match.end() + 1000)]
+        details = {}
+        qty_match = re.search(r'\\\"availableQuantity\\\":(\d+)', window)
+        if qty_match:
+            details['inventory'] = qty_match.group(1)
+        sl_match = re.search(r'\\\"shelfLifeInHours\\\":\\\"([^\"]+)\\\"', window)
+        if sl_match:
+            details['shelf_life'] = sl_match.group(1)
+        ps_match = re.search(r'\\\"packsize\\\":(\d+)', window)
+        if ps_match:
+            details['pack_size_raw'] = ps_match.group(1)
+        if details:
+            details_map.setdefault(match.group(1), {}).update(details)
+    return details_map
+
+# --- Cases ---
+
+def build_cases(sizes: list, recorded: list) -> list:
+    """Each case: (name, products_in_payload, setup() -> payload, fn(payload) -> result)."""
+    scraper = ZeptoScraper(headless=True)
+    cases = []
+
+    for n in sizes:
+        cases.append((f"parse_product_from_dict[{n}]", n, lambda n=n: make_api_items(n),
+                      lambda items: [scraper.parse_product_from_dict(p, "Fruits", "Fresh", "560001") for p in items]))
+        cases.append((f"flight_details_map[{n}]", n, lambda n=n: make_flight_body(n),
+                      build_flight_details_map))
+        cases.append((f"flight_details_map_inline_re[{n}]", n, lambda n=n: make_flight_body(n),
+                      inline_re_flight_details_map))
+        cases.append((f"flight_links[{n}]", n, lambda n=n: (make_flight_body(n), build_flight_details_map(make_flight_body(n))),
+                      lambda payload: scraper.parse_flight_links(payload[0], payload[1], "Fruits", "Fresh", "560001", [], set())))
+        cases.append((f"find_cards[{n}]", n, lambda n=n: [json.loads(l.split(":", 1)[1]) for l in make_rsc_body(make_cards(n)).split("\n")],
+                      lambda decoded: [find_cards(d) for d in decoded]))
+        cases.append((f"extract_cards[{n}]", n, lambda n=n: make_rsc_body(make_cards(n)),
+                      extract_cards))
+        cases.append((f"card_to_product[{n}]", n, lambda n=n: make_cards(n),
+                      lambda cards: [scraper.card_to_product(c["id"], c, "Fruits", "Fresh", "560001") for c in cards]))
+        cases.append((f"card_to_record[{n}]", n, lambda n=n: make_cards(n),
+                      lambda cards: ProductBatch(scraper.batch_header("Fruits", "Fresh", "560001"),
+                                                 [scraper.card_to_record(c["id"], c) for c in cards])))
+
+    for name in recorded:
+        bodies_dir = os.path.join(FIXTURES_DIR, name, "bodies")
+        for entry in sorted(os.listdir(bodies_dir)):
+            with open(os.path.join(bodies_dir, entry), "r", encoding="utf-8", errors="ignore") as f:
+                text = f.read()
+            if '"cardData":' in text:
+                n = len(extract_cards(text))
+                cases.append((f"recorded:{name}:extract_cards[{entry[:8]}]", n, lambda t=text: t, extract_cards))
+            elif "/pn/" in text and len(text) > 10000:
+                n = len(build_flight_details_map(text)) or 1
+                cases.append((f"recorded:{name}:flight_details_map[{entry[:8]}]", n, lambda t=text: t, build_flight_details_map))
+    return cases
+
+def measure(setup, fn, products: int, repeat: int) -> dict:
+    payload = setup()
+
+    # Throughput: best of `repeat` runs
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn(payload)
+        best = min(best, time.perf_counter() - start)
+        del result
+
+    # Memory: traced peak during one run, and blocks still held by the result
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    result = fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained_blocks = sys.getallocatedblocks() - blocks_before
+    del result
+
+    products = max(products, 1)
+    return {
+        "products": products,
+        "best_sec": round(best, 6),
+        "products_per_sec": round(products / best, 1) if best > 0 else None,
+        "peak_bytes": peak,
+        "peak_bytes_per_product": round(peak / products, 1),
+        "retained_blocks_per_product": round(retained_blocks / products, 2),
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for name, curr in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base.get("products_per_sec") and curr["products_per_sec"] < base["products_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {curr['products_per_sec']:.0f}/s vs baseline {base['products_per_sec']:.0f}/s")
+        if base.get("peak_bytes_per_product") and curr["peak_bytes_per_product"] > base["peak_bytes_per_product"] * (1 + threshold):
+            regressions.append(f"{name}: peak {curr['peak_bytes_per_product']:.0f} B/product vs baseline {base['peak_bytes_per_product']:.0f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the ZeptoScraper parsing hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Synthetic payload sizes (products)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", type=str, default=None, help="Substring filter on case names")
+    parser.add_argument("--recorded", action="append", default=[], help="Also benchmark bodies from data/fixtures/<name>")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store results as the baseline ({BASELINE_FILE})")
+    parser.add_argument("--compare", action="store_true", help="Compare against the stored baseline and fail on regressions")
+    parser.add_argument("--baseline", type=str, default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative slowdown / memory growth")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<44}{'products/s':>14}{'best s':>10}{'peak B/prod':>13}{'blocks/prod':>13}")
+    for name, products, setup, fn in build_cases(args.sizes, args.recorded):
+        if args.only and args.only not in name:
+            continue
+        stats = measure(setup, fn, products, args.repeat)
+        results[name] = stats
+        print(f"{name:<44}{stats['products_per_sec']:>14,.0f}{stats['best_sec']:>10.4f}"
+              f"{stats['peak_bytes_per_product']:>13,.0f}{stats['retained_blocks_per_product']:>13.2f}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"created": datetime.now().isoformat(), "python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\nNo baseline at {args.baseline}. Run with --save-baseline first.")
+            sys.exit(2)
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"  - {r}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import asyncio
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from scrapers.zepto import ZeptoScraper
+
+# Configuration
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+FIXTURES_DIR = os.path.join(DATA_DIR, "fixtures")
+OUTPUT_DIR = os.path.join(DATA_DIR, "output")
+SESSION_FILE = "session.json"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("Zepto_Replay_Benchmark")
+
+async def timed(timings: dict, phase: str, coro):
+    """Awaits `coro` and appends its wall time (seconds) under `phase`."""
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings.setdefault(phase, []).append(time.perf_counter() - start)
+
+async def record(args):
+    """Runs the flow once against live zepto.com and stores every response."""
+    fixture_dir = os.path.join(FIXTURES_DIR, args.name)
+    scraper = ZeptoScraper(headless=True, record_dir=fixture_dir)
+    session = {"pincode": args.pincode, "categories": [], "product_urls": list(args.product_url or [])}
+
+    try:
+        await scraper.start()
+        await scraper.set_location(args.pincode)
+        categories = await scraper.get_all_categories()
+        session["categories"] = categories[:args.categories]
+
+        for cat_url in session["categories"]:
+            await scraper.scrape_assortment(cat_url, args.pincode)
+            await scraper.scrape_assortment_fast(cat_url, pincode=args.pincode)
+
+        for url in session["product_urls"]:
+            await scraper.scrape_availability(url, args.pincode)
+    finally:
+        await scraper.stop()
+
+    with open(os.path.join(fixture_dir, SESSION_FILE), "w", encoding="utf-8") as f:
+        json.dump(session, f, indent=2)
+    logger.info(f"Recorded session '{args.name}' ({len(session['categories'])} categories) to {fixture_dir}")
+
+async def bench_once(fixture_dir: str, session: dict, timings: dict, counts: dict):
+    scraper = ZeptoScraper(headless=True, replay_dir=fixture_dir)
+    scraper.delay_scale = 0
+    pincode = session["pincode"]
+
+    try:
+        await timed(timings, "start", scraper.start())
+        await timed(timings, "set_location", scraper.set_location(pincode))
+        categories = await timed(timings, "get_all_categories", scraper.get_all_categories())
+        counts["categories"] = len(categories)
+
+        for cat_url in session["categories"]:
+            products = await timed(timings, "scrape_assortment", scraper.scrape_assortment(cat_url, pincode))
+            counts["scrape_assortment"] = counts.get("scrape_assortment", 0) + len(products)
+            products = await timed(timings, "scrape_assortment_fast", scraper.scrape_assortment_fast(cat_url, pincode=pincode))
+            counts["scrape_assortment_fast"] = counts.get("scrape_assortment_fast", 0) + len(products)
+
+        for url in session["product_urls"]:
+            products = await timed(timings, "scrape_availability", scraper.scrape_availability(url, pincode))
+            counts["scrape_availability"] = counts.get("scrape_availability", 0) + len(products)
+    finally:
+        await timed(timings, "stop", scraper.stop())
+
+async def bench(args):
+    """Replays a recorded session `--repeat` times and reports per-phase timings."""
+    fixture_dir = os.path.join(FIXTURES_DIR, args.name)
+    with open(os.path.join(fixture_dir, SESSION_FILE), "r", encoding="utf-8") as f:
+        session = json.load(f)
+
+    timings = {}
+    totals = []
+    counts = {}
+    for i in range(args.repeat):
+        start = time.perf_counter()
+        run_counts = {}
+        await bench_once(fixture_dir, session, timings, run_counts)
+        totals.append(time.perf_counter() - start)
+        counts = run_counts
+        logger.info(f"Run {i+1}/{args.repeat}: {totals[-1]:.2f}s {run_counts}")
+
+    phases = {}
+    for phase, values in timings.items():
+        phases[phase] = {
+            "calls": len(values),
+            "total_sec": round(sum(values), 4),
+            "mean_sec": round(statistics.mean(values), 4),
+            "median_sec": round(statistics.median(values), 4),
+            "min_sec": round(min(values), 4),
+            "max_sec": round(max(values), 4),
+        }
+
+    report = {
+        "benchmark_timestamp": datetime.now().isoformat(),
+        "fixture": args.name,
+        "repeat": args.repeat,
+        "end_to_end_median_sec": round(statistics.median(totals), 4),
+        "end_to_end_runs_sec": [round(t, 4) for t in totals],
+        "items_per_run": counts,
+        "phases": phases,
+    }
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    report_file = os.path.join(OUTPUT_DIR, f"benchmark_replay_{args.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'phase':<26}{'calls':>6}{'median s':>11}{'mean s':>10}{'total s':>10}")
+    for phase, stats in phases.items():
+        print(f"{phase:<26}{stats['calls']:>6}{stats['median_sec']:>11.4f}{stats['mean_sec']:>10.4f}{stats['total_sec']:>10.4f}")
+    print(f"\nEnd-to-end median: {report['end_to_end_median_sec']:.2f}s  ->  {report_file}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Record Zepto sessions and benchmark the scrapers against the replayed data")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Record a live session into data/fixtures/<name>")
+    rec.add_argument("--name", type=str, default="default")
+    rec.add_argument("--pincode", type=str, default="560001")
+    rec.add_argument("--categories", type=int, default=3, help="How many categories to record")
+    rec.add_argument("--product-url", action="append", help="Product URL for scrape_availability (repeatable)")
+
+    run = sub.add_parser("bench", help="Replay data/fixtures/<name> and time each phase")
+    run.add_argument("--name", type=str, default="default")
+    run.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    asyncio.run(record(args) if args.command == "record" else bench(args))
+
+if __name__ == "__main__":
+    main()
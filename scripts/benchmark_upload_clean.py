@@ -0,0 +1,132 @@
+import argparse
+import csv
+import gc
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from normalize import DEFAULT_CHUNK_ROWS, iter_db_batches
+from scrapers.records import PRODUCT_CSV_FIELDS
+from upload_zepto_data import clean_csv_keys
+
+# Configuration
+DEFAULT_ROWS = 250_000
+BATCH_SIZE = 100
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("Zepto_Upload_Benchmark")
+
+def write_synthetic_csv(path: str, rows: int):
+    """Assortment CSV shaped like a real run, with the usual "N/A" and blank cells."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=PRODUCT_CSV_FIELDS)
+        writer.writeheader()
+        for i in range(rows):
+            qty = i % 9
+            writer.writerow({
+                "Category": f"Category {i % 30}",
+                "Subcategory": f"Subcategory {i % 300}",
+                "Item Name": f"Fresh Product {i} 500 g",
+                "Brand": f"Brand{i % 40}",
+                "Mrp": "N/A" if i % 97 == 0 else f"{50 + i % 300}.0",
+                "Price": "N/A" if i % 89 == 0 else f"{45 + i % 250}.5",
+                "Weight/pack_size": "500 g",
+                "Delivery ETA": "10 mins",
+                "availability": "In Stock" if qty else "Out of Stock",
+                "inventory": "N/A" if i % 53 == 0 else str(qty),
+                "store_id": f"store-{i % 50}",
+                "base_product_id": f"/pn/fresh-product-{i}/pvid/{i:08x}",
+                "shelf_life_in_hours": "N/A" if i % 3 else "72",
+                "timestamp": "2026-01-01 10:00:00",
+                "pincode_input": str(560001 + i % 20),
+                "clicked_label": "" if i % 7 else "Koramangala",
+            })
+
+def per_row(path: str) -> int:
+    """The previous uploader path: DictReader + clean_csv_keys, batched afterwards."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            records.append(clean_csv_keys(row))
+    batches = [records[i:i + BATCH_SIZE] for i in range(0, len(records), BATCH_SIZE)]
+    return sum(len(b) for b in batches)
+
+def columnar(path: str, chunk_rows: int) -> int:
+    return sum(len(batch) for batch in iter_db_batches(path, BATCH_SIZE, chunk_rows))
+
+def measure(fn, repeat: int) -> dict:
+    best = float("inf")
+    rows = 0
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        rows = fn()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows": rows, "best_sec": round(best, 4), "rows_per_sec": round(rows / best, 1) if best > 0 else None,
+            "peak_mb": round(peak / (1024 * 1024), 1)}
+
+def check_equivalent(path: str, sample: int = 2000) -> list:
+    """Differences between the two paths on the first `sample` rows (ignoring known, intended ones)."""
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        old = [clean_csv_keys(row) for _, row in zip(range(sample), reader)]
+    new = next(iter_db_batches(path, sample, sample))
+    diffs = []
+    for i, (a, b) in enumerate(zip(old, new)):
+        for key in a:
+            va, vb = a[key], b.get(key)
+            if key == "scraped_at":
+                va = va.replace(" ", "T") if va else va
+            if key == "shelf_life_in_hours" and va == "N/A":
+                va = None  # now null instead of the literal text
+            if va != vb:
+                diffs.append(f"row {i} {key}: {va!r} vs {vb!r}")
+    return diffs
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row clean_csv_keys vs the columnar upload path")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--file", type=str, default=None, help="Benchmark an existing assortment CSV instead of a synthetic one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if not path:
+            path = os.path.join(tmp, "assortment.csv")
+            write_synthetic_csv(path, args.rows)
+
+        diffs = check_equivalent(path)
+        if diffs:
+            print(f"{len(diffs)} difference(s) between the paths, e.g.:")
+            for d in diffs[:10]:
+                print(f"  - {d}")
+
+        results = {
+            "clean_csv_keys (per row)": measure(lambda: per_row(path), args.repeat),
+            f"iter_db_batches (chunks of {args.chunk_rows})": measure(lambda: columnar(path, args.chunk_rows), args.repeat),
+        }
+
+    print(f"{'path':<42}{'rows':>10}{'best s':>10}{'rows/s':>14}{'peak MB':>10}")
+    for name, r in results.items():
+        print(f"{name:<42}{r['rows']:>10,}{r['best_sec']:>10.3f}{r['rows_per_sec']:>14,.0f}{r['peak_mb']:>10.1f}")
+    old, new = results.values()
+    if new["best_sec"]:
+        print(f"\nSpeed-up: {old['best_sec'] / new['best_sec']:.1f}x")
+
+if __name__ == "__main__":
+    main()
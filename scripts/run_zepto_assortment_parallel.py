@@ -5,6 +5,7 @@ import random
 import os
 import csv
 import subprocess
+import time
 from datetime import datetime
 import pandas as pd
 import sys
@@ -13,7 +14,18 @@ import os
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from scrapers.zepto import ZeptoScraper
+from scrapers.zepto import ZeptoScraper, category_names
+from scrapers.category_registry import CategoryRegistry
+from scrapers.network_stats import PayloadAllowlist
+from scrapers.records import PRODUCT_CSV_FIELDS, ProductBatch
+from change_detection import ChangeDetector
+from normalize import read_frames, to_db_records
+from store_map import StoreMap
+from supervisor import WorkerSupervisor, process_rss_mb, process_tree_rss_mb
+from work_queue import open_work_queue
+import tracing
+from tracing import span
+from metrics import registry, MetricsServer, snapshot_task
 
 # Configuration
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
@@ -24,14 +36,68 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 INPUT_FILE = os.path.join(INPUT_DIR, "pin_codes_40.xlsx")
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, f"zepto_assortment_parallel_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
 PERF_FILE = os.path.join(OUTPUT_DIR, f"zepto_performance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+NETWORK_FILE = os.path.join(OUTPUT_DIR, f"zepto_network_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+CHANGES_FILE = os.path.join(OUTPUT_DIR, f"zepto_changes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+TRACE_FILE = os.path.join(OUTPUT_DIR, f"zepto_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
 MAX_WORKERS = 4 
 
+# Worker processes: each has its own event loop and browser, and is replaced if it dies
+BROWSER_RESTART_EVERY_PAGES = 150   # category pages before a fresh browser
+BROWSER_RSS_LIMIT_MB = 2048         # browser + renderers
+WORKER_RSS_LIMIT_MB = 1024          # the worker's Python process; retired past this
+UNIT_TIMEOUT_SECONDS = 45 * 60      # a unit running longer than this kills its worker
+MAX_UNIT_ATTEMPTS = 3
+MAX_WORKER_RESTARTS = 20
+# Worker processes send their metrics to the parent's /metrics this often (and after every unit)
+WORKER_METRICS_INTERVAL_SECONDS = 15
+# Random delay before each worker's first launch (the browser channel is cached, see scrapers.browser_pool)
+LAUNCH_STAGGER_SECONDS = float(os.environ.get("ZEPTO_LAUNCH_STAGGER", "1"))
+
+# Work queue: "local" (in-process) or "sqlite:///path/to/queue.db" shared by runners on several machines.
+# One runner (the coordinator) seeds and closes the run; others start with ZEPTO_QUEUE_ROLE=worker.
+WORK_QUEUE_URL = os.environ.get("ZEPTO_QUEUE_URL", "local")
+WORK_QUEUE_NAME = os.environ.get("ZEPTO_QUEUE_NAME", "zepto_assortment")
+QUEUE_ROLE = os.environ.get("ZEPTO_QUEUE_ROLE", "coordinator")
+LEASE_SECONDS = 10 * 60             # visibility timeout; heartbeated while the worker is alive
+QUEUE_POLL_SECONDS = 5
+
+# Per-phase spans (view with scripts/trace_summary.py); off unless ZEPTO_TRACING=1
+ENABLE_TRACING = os.environ.get("ZEPTO_TRACING", "0") == "1"
+
+# Live metrics: Prometheus text on http://127.0.0.1:<port>/metrics (0 disables) plus periodic snapshots
+METRICS_PORT = int(os.environ.get("ZEPTO_METRICS_PORT", "9108"))
+METRICS_SNAPSHOT_INTERVAL = 30
+METRICS_SNAPSHOT_FILE = os.path.join(OUTPUT_DIR, f"zepto_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+
+# Change detection: between full snapshots only the change log is kept and uploaded
+STATE_DIR = os.path.join(DATA_DIR, "state")
+ENABLE_CHANGE_DETECTION = True
+FULL_SNAPSHOT_EVERY_HOURS = 24
+CHANGES_TABLE = "zepto_assortment_changes"
+
+# Stream rows to the database while scraping instead of uploading the CSV afterwards.
+# Batches the database rejects are spooled here and retried (also by the next run).
+ENABLE_DB_SINK = os.environ.get("ZEPTO_DB_SINK", "0") == "1"
+DB_SINK_BATCH_ROWS = 500
+DB_SPOOL_DIR = os.path.join(STATE_DIR, "db_spool")
+
+# Store dedup: pincodes served by the same dark store are scraped once
+STORE_MAP_FILE = os.path.join(STATE_DIR, "zepto_store_map.json")
+STORE_MAP_TTL_HOURS = 24 * 7
+
+# Category tree per store, refreshed on TTL expiry or when the home page changes
+CATEGORY_REGISTRY_FILE = os.path.join(STATE_DIR, "zepto_categories.json")
+CATEGORY_TTL_HOURS = 24
+
+# Learned URL patterns that carry product data; other bodies are not read
+PAYLOAD_ALLOWLIST_FILE = os.path.join(STATE_DIR, "zepto_payload_allowlist.json")
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("Zepto_Assortment_Runner")
 
-async def writer_task(queue: asyncio.Queue, filename: str):
-    """Listens for data batches and appends to CSV."""
+async def writer_task(queue: asyncio.Queue, filename: str, sink=None):
+    """Listens for data batches and appends to CSV (and hands them to the database sink, if any)."""
     file_initialized = False
     
     with open(filename, 'w', newline='', encoding='utf-8') as f:
@@ -42,20 +108,28 @@ async def writer_task(queue: asyncio.Queue, filename: str):
                 if batch is None: # Poison pill
                     queue.task_done()
                     break
+                if sink is not None:
+                    sink.put(batch)
+                if isinstance(batch, ProductBatch):
+                    # Rows are only materialised here, one batch at a time
+                    batch = list(batch.to_rows())
                     
                 # Filter valid products
                 valid_products = [p for p in batch if isinstance(p, dict) and ('Price' in p or 'Item Name' in p)]
                 
                 if valid_products:
-                    if not file_initialized:
-                        writer = csv.DictWriter(f, fieldnames=valid_products[0].keys())
-                        writer.writeheader()
-                        file_initialized = True
-                    
-                    if writer:
-                        writer.writerows(valid_products)
-                        f.flush() # Ensure data is written
+                    with span("writer.write_batch", rows=len(valid_products), pincode=valid_products[0].get('pincode_input')):
+                        if not file_initialized:
+                            # Fixed header so normalize.CSV_TO_COLUMN always lines up, whatever scraper path filled the first batch
+                            writer = csv.DictWriter(f, fieldnames=PRODUCT_CSV_FIELDS, extrasaction='ignore')
+                            writer.writeheader()
+                            file_initialized = True
                         
+                        if writer:
+                            writer.writerows(valid_products)
+                            f.flush() # Ensure data is written
+                        
+                    registry.counter("zepto_rows_written_total").inc(len(valid_products))
                     logger.info(f"💾 Saved {len(valid_products)} products to CSV.")
                 
                 queue.task_done()
@@ -64,7 +138,7 @@ async def writer_task(queue: asyncio.Queue, filename: str):
 
 async def performance_writer_task(queue: asyncio.Queue, filename: str):
     """Listens for performance metrics and appends to CSV."""
-    fields = ['Pincode', 'Status', 'Categories_Scraped', 'Products_Found', 'Start_Time', 'End_Time', 'Duration_Seconds', 'Error_Message']
+    fields = ['Pincode', 'Status', 'Categories_Scraped', 'Products_Found', 'Truncated_Categories', 'Start_Time', 'End_Time', 'Duration_Seconds', 'Error_Message']
     
     with open(filename, 'w', newline='', encoding='utf-8') as f:
         writer = csv.DictWriter(f, fieldnames=fields)
@@ -85,107 +159,285 @@ async def performance_writer_task(queue: asyncio.Queue, filename: str):
             except Exception as e:
                 logger.error(f"Performance writer task error: {e}")
 
-async def worker(name: str, pin_queue: asyncio.Queue, result_queue: asyncio.Queue, perf_queue: asyncio.Queue):
+def write_network_report(rows: list, filename: str):
+    """Per-category request/byte accounting, plus a total line in the log."""
+    if not rows:
+        return
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['store_id', 'pincode'] + [k for k in rows[0] if k not in ('store_id', 'pincode')])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    transferred = sum(r['bytes_transferred'] for r in rows)
+    read = sum(r['bytes_read'] for r in rows)
+    kept = sum(r['bytes_kept'] for r in rows)
+    skipped = sum(r['bodies_skipped'] for r in rows)
+    throttled = sum(r.get('bodies_throttled', 0) for r in rows)
+    dropped = sum(r.get('bodies_dropped', 0) for r in rows)
+    logger.info(f"🌐 Network: {transferred / 1e6:.1f} MB transferred, {read / 1e6:.1f} MB read, "
+                f"{kept / 1e6:.1f} MB carried products, {skipped} bodies skipped, "
+                f"{throttled} throttled ({dropped} dropped) by the capture budget -> {filename}")
+
+def fan_out(products: ProductBatch, pincodes: list, store_map: StoreMap) -> list:
+    """Re-headers a store's batch for every pincode served by that store; the records are shared, not copied."""
+    batches = []
+    for pincode in pincodes:
+        entry = store_map.entries.get(pincode, {})
+        batches.append(products.relocated(pincode, entry.get('eta', products.header.delivery_eta),
+                                          entry.get('clicked_label', products.header.clicked_label)))
+    return batches
+
+async def resolve_store(name: str, scraper: ZeptoScraper, pincode: str, emit):
+    """Phase 1: set location for an unmapped pincode and report its store_id."""
+    try:
+        scraper.store_id = "N/A"
+        with span("runner.resolve_store", pincode=pincode, worker=name):
+            await scraper.set_location(pincode)
+        emit("store", (pincode, scraper.store_id, scraper.delivery_eta, scraper.clicked_location_label))
+        logger.info(f"[{name}] Resolved {pincode} -> store {scraper.store_id}")
+    except Exception as e:
+        logger.error(f"[{name}] Failed resolving store for {pincode}: {e}")
+
+async def scrape_store_unit(name: str, scraper: ZeptoScraper, store_key: str, unit_pincodes: list, emit) -> int:
     """
-    Worker:
-    1. Gets Pincode
-    2. Scrapes *All* Categories for that pincode
-    3. Pushes data to Result Queue
-    4. Pushes stats to Performance Queue
+    Phase 2: scrapes *All* Categories once for a (store_id, pincodes) unit.
+    Products go back to the parent to be fanned out to every pincode of the
+    store; a performance record is emitted per pincode. Returns the number of
+    category pages loaded.
     """
-    logger.info(f"Worker {name} starting...")
-    scraper = ZeptoScraper(headless=True)
-    
+    pincode = unit_pincodes[0]
+    logger.info(f"[{name}] Starting store {store_key} via {pincode} (serves {len(unit_pincodes)} pincodes)")
+    start_time = datetime.now()
+    products_count = 0
+    categories_count = 0
+    pages = 0
+    categories_ok = 0
+    categories_failed = 0
+    category_seconds = []
+    # (category, subcategory) scraped to the end; only these can report delisted SKUs
+    complete_pairs = set()
+    incomplete_pairs = set()
+    scraper.category_coverage.clear()
+    scraper.network_stats.clear()
+    status = "Success"
+    error_msg = ""
+
+    with span("runner.store_unit", pincode=pincode, store_id=store_key, worker=name, pincodes=len(unit_pincodes)):
+        try:
+            # 1. Set Location (no stale store id from the previous unit if this one fails)
+            scraper.store_id = "N/A"
+            await scraper.set_location(pincode)
+            if scraper.location_pincode != pincode or scraper.store_id == "N/A":
+                # Scraping now would record another location's catalogue (and a wrong store mapping) for these pincodes
+                reason = f"location {pincode} not confirmed (store {scraper.store_id})"
+                logger.warning(f"[{name}] {reason}; releasing store {store_key}")
+                emit("release", reason)
+                await asyncio.sleep(random.uniform(5, 10))
+                return pages
+
+            # Map went stale: only trust this scrape for the pincode we located
+            if not store_key.startswith("unresolved:") and scraper.store_id != store_key and len(unit_pincodes) > 1:
+                logger.warning(f"[{name}] {pincode} now maps to {scraper.store_id}, not {store_key}. Requeueing {len(unit_pincodes) - 1} pincodes.")
+                emit("requeue", unit_pincodes[1:])
+                unit_pincodes = [pincode]
+            emit("store", (pincode, scraper.store_id, scraper.delivery_eta, scraper.clicked_location_label))
+
+            # 2. Get Categories
+            with span("runner.post_location_wait"):
+                await asyncio.sleep(2)
+            with span("runner.category_discovery"):
+                categories = await scraper.get_all_categories()
+            categories_count = len(categories)
+            logger.info(f"[{name}] Found {len(categories)} categories to scrape for {pincode}")
+
+            # Scrape all categories
+            for cat_url in categories:
+                try:
+                    logger.info(f"[{name}] Fast Scraping {cat_url}...")
+                    cat_start = time.perf_counter()
+                    pages += 1
+                    products = await scraper.scrape_assortment_fast(cat_url, pincode=pincode)
+                    category_seconds.append(time.perf_counter() - cat_start)
+                    categories_ok += 1
+                    coverage = scraper.category_coverage.get(cat_url)
+                    if coverage and coverage['exhausted'] and not (coverage['expected'] and coverage['captured'] < coverage['expected']):
+                        complete_pairs.add(category_names(cat_url))
+                    else:
+                        incomplete_pairs.add(category_names(cat_url))
+
+                    if products:
+                        products_count += len(products)
+                        emit("products", (store_key, list(unit_pincodes), products))
+
+                    # Short delay between categories for fast mode
+                    await asyncio.sleep(0.1)
+
+                except Exception as e:
+                    logger.error(f"[{name}] Failed category {cat_url}: {e}")
+                    categories_failed += 1
+                    incomplete_pairs.add(category_names(cat_url))
+
+        except Exception as e:
+            logger.error(f"[{name}] Failed processing {pincode}: {e}")
+            status = "Failed"
+            error_msg = str(e)
+
+    end_time = datetime.now()
+    duration = (end_time - start_time).total_seconds()
+
+    emit("unit_stats", {"categories": categories_ok, "failures": categories_failed, "category_seconds": category_seconds})
+    # Two URLs can share a name pair; one failing is enough to hold back delistings
+    emit("completed", (list(unit_pincodes), sorted(complete_pairs - incomplete_pairs)))
+    emit("network", [dict(stats, store_id=store_key, pincode=pincode) for stats in scraper.network_stats.values()])
+    if scraper.category_registry and scraper.store_id in scraper.category_registry.stores:
+        emit("categories", (scraper.store_id, scraper.category_registry.stores[scraper.store_id]))
+    if scraper.payload_allowlist:
+        emit("allowlist", scraper.payload_allowlist.take_updates())
+
+    # Categories where we captured fewer products than the payload advertised
+    truncated = [c for c in scraper.category_coverage.values()
+                 if c['expected'] is not None and c['captured'] < c['expected']]
+    if truncated:
+        logger.warning(f"[{name}] {len(truncated)} categories below advertised count for store {store_key}")
+
+    # Send Performance Record (one per pincode; fanned-out pincodes cost no scrape time)
+    for i, unit_pincode in enumerate(unit_pincodes):
+        emit("perf", {
+            'Pincode': unit_pincode,
+            'Status': status if i == 0 else f"{status} (Fanned out from {pincode})",
+            'Categories_Scraped': categories_count,
+            'Products_Found': products_count,
+            'Truncated_Categories': len(truncated),
+            'Start_Time': start_time.isoformat(),
+            'End_Time': end_time.isoformat(),
+            'Duration_Seconds': duration if i == 0 else 0,
+            'Error_Message': error_msg
+        })
+
+    # Anti-ban break
+    delay = random.uniform(5, 10)
+    logger.info(f"[{name}] Finished store {store_key}. Cooling down for {delay:.0f}s...")
+    with span("runner.cooldown", worker=name):
+        await asyncio.sleep(delay)
+    return pages
+
+async def worker(name: str, task_queue, event_queue):
+    """
+    Worker process loop:
+    1. "resolve" tasks: sets location for a pincode and reports its dark store
+    2. "store" tasks: scrapes a (store_id, pincodes) unit, see scrape_store_unit
+    3. Restarts its browser every BROWSER_RESTART_EVERY_PAGES category pages, when
+       the browser is over BROWSER_RSS_LIMIT_MB or has disconnected
+    4. Retires once the Python process is over WORKER_RSS_LIMIT_MB, so the
+       supervisor starts a fresh one
+    Every event is reported before the task's "done"; the parent applies them
+    only then, so a unit requeued after a crash (or released because its
+    location was not confirmed) is never written twice.
+    Metrics are the exception: the supervisor merges them as they arrive.
+    """
+    def emit(kind, payload=None):
+        event_queue.put((name, kind, payload))
+
+    def emit_metrics():
+        updates = registry.take_updates()
+        if updates:
+            emit("metrics", updates)
+
+    async def push_metrics():
+        while True:
+            await asyncio.sleep(WORKER_METRICS_INTERVAL_SECONDS)
+            emit_metrics()
+
+    loop = asyncio.get_running_loop()
+    category_registry = CategoryRegistry(CATEGORY_REGISTRY_FILE, ttl_hours=CATEGORY_TTL_HOURS)
+    payload_allowlist = PayloadAllowlist(PAYLOAD_ALLOWLIST_FILE)
+    scraper = ZeptoScraper(headless=True, category_registry=category_registry, payload_allowlist=payload_allowlist)
+    pages = 0
+    metrics_pusher = asyncio.create_task(push_metrics())
+
     try:
+        # Stagger browser launches
+        await asyncio.sleep(random.uniform(0, LAUNCH_STAGGER_SECONDS))
         await scraper.start()
-        
+
         while True:
-            try:
-                pincode = pin_queue.get_nowait()
-            except asyncio.QueueEmpty:
+            task = await loop.run_in_executor(None, task_queue.get)
+            if task is None:
                 break
-            
-            logger.info(f"[{name}] Starting Pincode: {pincode}")
-            start_time = datetime.now()
-            products_count = 0
-            categories_count = 0
-            status = "Success"
-            error_msg = ""
-            
-            try:
-                # 1. Set Location
-                await scraper.set_location(pincode)
-                
-                # 2. Get Categories
-                await asyncio.sleep(2)
-                categories = await scraper.get_all_categories()
-                categories_count = len(categories)
-                logger.info(f"[{name}] Found {len(categories)} categories to scrape for {pincode}")
-                
-                # Scrape all categories
-                for cat_url in categories:
+
+            browser_mb = process_tree_rss_mb(include_self=False)
+            if pages >= BROWSER_RESTART_EVERY_PAGES or browser_mb > BROWSER_RSS_LIMIT_MB or not scraper.browser.is_connected():
+                logger.info(f"[{name}] Restarting browser after {pages} pages ({browser_mb:.0f} MB)")
+                with span("runner.browser_restart", worker=name):
                     try:
-                        logger.info(f"[{name}] Fast Scraping {cat_url}...")
-                        products = await scraper.scrape_assortment_fast(cat_url, pincode=pincode)
-                        
-                        if products:
-                            products_count += len(products)
-                            # Push to writer
-                            await result_queue.put(products)
-                        
-                        # Short delay between categories for fast mode
-                        await asyncio.sleep(0.1)
-                        
+                        await scraper.stop()
                     except Exception as e:
-                        logger.error(f"[{name}] Failed category {cat_url}: {e}")
-                
+                        logger.warning(f"[{name}] Browser did not close cleanly: {e}")
+                    await scraper.start()
+                pages = 0
+
+            try:
+                if task["kind"] == "resolve":
+                    await resolve_store(name, scraper, task["pincode"], emit)
+                else:
+                    pages += await scrape_store_unit(name, scraper, task["store_key"], task["pincodes"], emit)
             except Exception as e:
-                logger.error(f"[{name}] Failed processing {pincode}: {e}")
-                status = "Failed"
-                error_msg = str(e)
-            
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
-            
-            # Send Performance Record
-            perf_record = {
-                'Pincode': pincode,
-                'Status': status,
-                'Categories_Scraped': categories_count,
-                'Products_Found': products_count,
-                'Start_Time': start_time.isoformat(),
-                'End_Time': end_time.isoformat(),
-                'Duration_Seconds': duration,
-                'Error_Message': error_msg
-            }
-            await perf_queue.put(perf_record)
-                
-            pin_queue.task_done()
-            
-            # Anti-ban break
-            delay = random.uniform(5, 10)
-            logger.info(f"[{name}] Finished {pincode}. Cooling down for {delay:.0f}s...")
-            await asyncio.sleep(delay)
-                
-    except Exception as e:
-        logger.error(f"[{name}] Crashed: {e}")
+                logger.error(f"[{name}] Task {task['id']} failed: {e}")
+
+            # Announce retirement before "done" so no new task is handed to us
+            worker_mb = process_rss_mb()
+            retiring = worker_mb > WORKER_RSS_LIMIT_MB
+            if retiring:
+                emit("retire", f"worker RSS {worker_mb:.0f} MB over {WORKER_RSS_LIMIT_MB} MB")
+            emit_metrics()
+            emit("done", task["id"])
+            if retiring:
+                break
     finally:
+        metrics_pusher.cancel()
         await scraper.stop()
+        emit_metrics()
         logger.info(f"Worker {name} retired.")
 
+def worker_process(name: str, task_queue, event_queue, trace_file: str = None):
+    """Entry point of a worker process (started by WorkerSupervisor)."""
+    if trace_file:
+        tracing.configure_jsonl(trace_file.replace(".jsonl", f"_{name}.jsonl"))
+    try:
+        asyncio.run(worker(name, task_queue, event_queue))
+    finally:
+        tracing.tracer.shutdown()
+
 async def main():
+    if ENABLE_TRACING:
+        tracing.configure_jsonl(TRACE_FILE)
+    metrics_server = None
+    if METRICS_PORT:
+        try:
+            metrics_server = MetricsServer(METRICS_PORT).start()
+        except OSError as e:
+            logger.warning(f"Could not start metrics endpoint on port {METRICS_PORT}: {e}")
+    snapshots = asyncio.create_task(snapshot_task(METRICS_SNAPSHOT_FILE, METRICS_SNAPSHOT_INTERVAL))
+    try:
+        await run()
+    finally:
+        snapshots.cancel()
+        if metrics_server:
+            metrics_server.stop()
+        tracing.tracer.shutdown()
+
+def load_pincodes() -> list:
     if not os.path.exists(INPUT_FILE):
         logger.error(f"Input file {INPUT_FILE} not found.")
-        return
+        return None
 
-    # 1. Read Inputs
     try:
         df = pd.read_excel(INPUT_FILE)
         # Handle 'Pincode' or 'pincode' case insensitive
         col = next((c for c in df.columns if c.lower() == 'pincode'), None)
         if not col:
             logger.error("Input file must have 'Pincode' column")
-            return
+            return None
             
         raw_pincodes = df[col].dropna().astype(str).tolist()
         pincodes = []
@@ -199,33 +451,163 @@ async def main():
         
         pincodes = sorted(list(set(pincodes)))
         logger.info(f"Loaded {len(pincodes)} unique pincodes.")
+        return pincodes
     except Exception as e:
         logger.error(f"Failed to read input: {e}")
-        return
+        return None
 
-    # 2. Setup Queues
-    pin_queue = asyncio.Queue()
+async def run():
+    # 1. Read Inputs (worker nodes take their units from the coordinator's queue)
+    coordinator = QUEUE_ROLE != "worker"
+    pincodes = []
+    if coordinator:
+        pincodes = load_pincodes()
+        if not pincodes:
+            return
+
+    # 2. Setup Queues and shared state (owned by this process; workers report changes back)
+    store_map = StoreMap(STORE_MAP_FILE, ttl_hours=STORE_MAP_TTL_HOURS)
+    category_registry = CategoryRegistry(CATEGORY_REGISTRY_FILE, ttl_hours=CATEGORY_TTL_HOURS)
+    payload_allowlist = PayloadAllowlist(PAYLOAD_ALLOWLIST_FILE)
+    network_rows = []
+    # (pincode, category, subcategory) scraped to completion, for change detection
+    completed_units = set()
     result_queue = asyncio.Queue()
     perf_queue = asyncio.Queue()
-    
-    for p in pincodes:
-        pin_queue.put_nowait(p)
+
+    registry.gauge("zepto_result_queue_depth", "Product batches waiting for the CSV writer", fn=result_queue.qsize)
+    registry.gauge("zepto_perf_queue_depth", fn=perf_queue.qsize)
+    products_total = registry.counter("zepto_products_total", "Product rows pushed to the writer (after fan-out)")
+    categories_total = registry.counter("zepto_categories_scraped_total")
+    category_failures = registry.counter("zepto_category_failures_total")
+    category_seconds = registry.histogram("zepto_category_scrape_seconds", "Wall time per scrape_assortment_fast call")
+
+    work_queue = open_work_queue(WORK_QUEUE_URL, WORK_QUEUE_NAME, visibility_timeout=LEASE_SECONDS, max_attempts=MAX_UNIT_ATTEMPTS)
+
+    # Decided now, not after the run: between full snapshots only the change log is uploaded,
+    # so the sink streams full rows only on full-snapshot runs.
+    # Each node of a shared queue only holds its share of the rows, so it skips change detection.
+    detector = None
+    if ENABLE_CHANGE_DETECTION and not work_queue.shared:
+        detector = ChangeDetector(STATE_DIR, full_snapshot_every_hours=FULL_SNAPSHOT_EVERY_HOURS)
+    full_snapshot = detector is None or detector.full_snapshot_due()
 
     # 3. Launch Writers
-    writer = asyncio.create_task(writer_task(result_queue, OUTPUT_FILE))
+    sink = None
+    if ENABLE_DB_SINK:
+        from database import AsyncDatabase
+        from db_sink import DatabaseSink
+        sink = DatabaseSink(AsyncDatabase(), "zepto_assortment", DB_SPOOL_DIR, batch_rows=DB_SINK_BATCH_ROWS).start()
+    writer = asyncio.create_task(writer_task(result_queue, OUTPUT_FILE, sink if full_snapshot else None))
     perf_writer = asyncio.create_task(performance_writer_task(perf_queue, PERF_FILE))
 
-    # 4. Launch Workers
-    workers = []
-    actual_workers = min(MAX_WORKERS, len(pincodes))
-    
-    for i in range(actual_workers):
-        w = asyncio.create_task(worker(f"W-{i+1}", pin_queue, result_queue, perf_queue))
-        workers.append(w)
-        await asyncio.sleep(random.uniform(2, 5))
+    # 4. Launch Worker Processes
+    if coordinator:
+        work_queue.reset()
+    logger.info(f"Work queue {WORK_QUEUE_URL} ({WORK_QUEUE_NAME}), running as {'coordinator' if coordinator else 'worker node'}")
+    actual_workers = min(MAX_WORKERS, len(pincodes)) if coordinator else MAX_WORKERS
+    supervisor = WorkerSupervisor(worker_process, actual_workers, args=(TRACE_FILE if ENABLE_TRACING else None,),
+                                  task_timeout=UNIT_TIMEOUT_SECONDS, max_restarts=MAX_WORKER_RESTARTS,
+                                  work_queue=work_queue).start()
+
+    # Events are held per task until its "done", then applied in order
+    pending = {}
+
+    async def apply_event(kind: str, payload):
+        if kind == "store":
+            store_map.set(*payload)
+        elif kind == "products":
+            store_key, unit_pincodes, products = payload
+            products_total.inc(len(products) * len(unit_pincodes))
+            with span("runner.fan_out", rows=len(products) * len(unit_pincodes)):
+                batches = fan_out(products, unit_pincodes, store_map)
+            for batch in batches:
+                await result_queue.put(batch)
+        elif kind == "perf":
+            await perf_queue.put(payload)
+        elif kind == "requeue":
+            for other in payload:
+                supervisor.submit({"kind": "store", "store_key": f"unresolved:{other}", "pincodes": [other]})
+        elif kind == "unit_stats":
+            categories_total.inc(payload["categories"])
+            category_failures.inc(payload["failures"])
+            for seconds in payload["category_seconds"]:
+                category_seconds.observe(seconds)
+        elif kind == "network":
+            network_rows.extend(payload)
+        elif kind == "completed":
+            unit_pincodes, pairs = payload
+            completed_units.update((p, cat, sub) for p in unit_pincodes for cat, sub in pairs)
+        elif kind == "categories":
+            store_id, entry = payload
+            category_registry.stores[store_id] = entry
+        elif kind == "allowlist":
+            payload_allowlist.merge(payload)
 
-    # Wait for workers
-    await asyncio.gather(*workers)
+    async def handle_event(worker_name: str, kind: str, payload, task: dict):
+        if task is None:
+            return
+        if kind == "done":
+            # Mappings the coordinator resolved, for fan-out on any node
+            store_map.entries.update(task.get("entries") or {})
+            result = None
+            for event_kind, event_payload in pending.pop(task["id"], []):
+                await apply_event(event_kind, event_payload)
+                if event_kind == "store" and task["kind"] == "resolve":
+                    result = list(event_payload)
+            return result
+        elif kind == "requeued":
+            pending.pop(task["id"], None)
+        elif kind == "failed":
+            pending.pop(task["id"], None)
+            now = datetime.now().isoformat()
+            for p in task.get("pincodes") or [task.get("pincode")]:
+                await perf_queue.put({'Pincode': p, 'Status': "Failed", 'Categories_Scraped': 0, 'Products_Found': 0,
+                                      'Truncated_Categories': 0, 'Start_Time': now, 'End_Time': now, 'Duration_Seconds': 0,
+                                      'Error_Message': f"Unit failed {task['attempts']} times (worker died or location not confirmed)"})
+        else:
+            pending.setdefault(task["id"], []).append((kind, payload))
+
+    groups = {}
+    try:
+        if coordinator:
+            # 5. Resolve unmapped pincodes to their dark store
+            stale = store_map.stale_pincodes(pincodes)
+            logger.info(f"{len(pincodes) - len(stale)} pincodes have a cached store mapping, resolving {len(stale)}.")
+            work_queue.put_many([{"kind": "resolve", "pincode": p} for p in stale])
+            await supervisor.run_until_idle(handle_event)
+            # Resolutions made on other nodes come back as unit results
+            if work_queue.shared:
+                for resolved in work_queue.results("resolve"):
+                    store_map.set(*resolved)
+            store_map.save()
+
+            # 6. Group pincodes by dark store and scrape each store once
+            groups = store_map.group_by_store(pincodes)
+            work_queue.put_many([{"kind": "store", "store_key": store_key, "pincodes": store_pincodes,
+                                  "entries": {p: store_map.entries[p] for p in store_pincodes if p in store_map.entries}}
+                                 for store_key, store_pincodes in groups.items()])
+            skipped = len(pincodes) - len(groups)
+            logger.info(f"🏬 {len(pincodes)} pincodes map to {len(groups)} stores. Skipping {skipped} catalogue scrapes ({skipped / max(len(pincodes), 1):.0%}).")
+            await supervisor.run_until_idle(handle_event)
+            work_queue.close()
+        else:
+            # Worker node: drain whatever the coordinator queues until it closes the run
+            while True:
+                await supervisor.run_until_idle(handle_event)
+                if work_queue.is_closed():
+                    break
+                await asyncio.sleep(QUEUE_POLL_SECONDS)
+    finally:
+        await asyncio.get_running_loop().run_in_executor(None, supervisor.stop)
+
+    if supervisor.failed:
+        logger.error(f"{len(supervisor.failed)} units failed after {MAX_UNIT_ATTEMPTS} attempts.")
+    logger.info(f"Worker processes: {supervisor.restarts} restarted, {registry.counter('zepto_worker_crashes_total').value:.0f} crashed.")
+    store_map.save()
+    category_registry.save()
+    payload_allowlist.save()
+    write_network_report(network_rows, NETWORK_FILE)
     
     # Signal writers to stop
     await result_queue.put(None)
@@ -235,17 +617,51 @@ async def main():
     await perf_writer
     
     logger.info(f"All done! \nData: {OUTPUT_FILE}\nPerformance: {PERF_FILE}")
+    if coordinator:
+        logger.info(f"Store dedup: scraped {len(groups)} stores for {len(pincodes)} pincodes, skipped {len(pincodes) - len(groups)} catalogue scrapes.")
+
+    # Diff against the previous snapshot
+    upload_file, upload_table = OUTPUT_FILE, "zepto_assortment"
+    if ENABLE_CHANGE_DETECTION and work_queue.shared:
+        # Each node only holds its share of the rows; diffing one share would report the rest as delisted
+        logger.info("Shared work queue: uploading this node's full rows, change detection skipped.")
+    elif detector is not None and os.path.exists(OUTPUT_FILE):
+        try:
+            with span("runner.change_detection"):
+                summary = detector.process(OUTPUT_FILE, CHANGES_FILE, completed_units, full_snapshot=full_snapshot)
+            if not summary["full_snapshot"]:
+                # Only the deltas stay in the output directory; the full rows are kept compressed next to the snapshot
+                archived = detector.archive(OUTPUT_FILE)
+                upload_file, upload_table = summary["changes_file"], CHANGES_TABLE
+                logger.info(f"Incremental run: {summary['changes']} changes of {summary['rows']} rows kept (full rows in {archived}).")
+        except Exception as e:
+            logger.error(f"Change detection failed, keeping full output: {e}")
+
+    if sink is not None:
+        # Full-snapshot runs streamed their rows while scraping; otherwise the change log
+        # (or the full rows, if change detection failed) is sent now
+        if upload_file and not (full_snapshot and upload_table == "zepto_assortment"):
+            for frame in read_frames(upload_file):
+                sink.put_records(to_db_records(frame), upload_table)
+        with span("runner.db_sink_close"):
+            await sink.close()
+        return
+
+    if not upload_file:
+        logger.info("No changes since the previous snapshot. Nothing to upload.")
+        return
 
     # Trigger Upload
     logger.info("🚀 Starting automatic upload to Supabase...")
     try:
         uploader_script = os.path.join(os.path.dirname(__file__), "upload_zepto_data.py")
-        subprocess.run(["python", uploader_script, OUTPUT_FILE], check=True)
+        with span("runner.upload", table=upload_table):
+            subprocess.run(["python", uploader_script, upload_file, "--table", upload_table], check=True)
         logger.info("✅ Upload complete. Dashboard is updated!")
         print("\n\n" + "="*50)
         print(" EXECUTION COMPLETE ")
         print("="*50)
-        print(f"1. Scraped Data:   {OUTPUT_FILE}")
+        print(f"1. Scraped Data:   {upload_file}")
         print(f"2. Performance:    {PERF_FILE}")
         print("3. Dashboard:      Visit http://localhost:8501 and click 'Refresh Data'")
         print("="*50 + "\n")
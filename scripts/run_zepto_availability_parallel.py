@@ -12,7 +12,9 @@ import os
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+from scrapers.browser_pool import BrowserPool
 from scrapers.zepto import ZeptoScraper
+from work_queue import WorkQueue, open_work_queue, keep_leased, node_name
 
 # Configuration
 # Configuration
@@ -24,6 +26,19 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 INPUT_FILE = os.path.join(INPUT_DIR, "pin_codes_100.xlsx")
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, f"zepto_availability_parallel_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
 MAX_WORKERS = 4
+# Product URLs checked together per work unit (one location, fetched concurrently in-page)
+URLS_PER_UNIT = int(os.environ.get("ZEPTO_AVAILABILITY_BATCH", "20"))
+# A unit with more than this share of URLs in error (browser died, location not set) goes back to the queue
+MAX_UNIT_ERROR_FRACTION = 0.5
+
+# Work queue: "local" (in-process) or "sqlite:///path/to/queue.db" shared by runners on several machines.
+# One runner (the coordinator) seeds and closes the run; others start with ZEPTO_QUEUE_ROLE=worker.
+WORK_QUEUE_URL = os.environ.get("ZEPTO_QUEUE_URL", "local")
+WORK_QUEUE_NAME = os.environ.get("ZEPTO_QUEUE_NAME", "zepto_availability")
+QUEUE_ROLE = os.environ.get("ZEPTO_QUEUE_ROLE", "coordinator")
+LEASE_SECONDS = 5 * 60
+MAX_ITEM_ATTEMPTS = 3
+QUEUE_POLL_SECONDS = 5
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -54,41 +69,59 @@ async def writer_task(queue: asyncio.Queue, filename: str):
         except Exception as e:
             logger.error(f"Writer task error: {e}")
 
-async def worker(name: str, item_queue: asyncio.Queue, result_queue: asyncio.Queue):
+async def worker(name: str, work_queue: WorkQueue, result_queue: asyncio.Queue, coordinator: bool = True,
+                 browser_pool: BrowserPool = None):
     """
     Worker:
-    1. Gets (URL, Pincode)
-    2. Scrapes Availability
-    3. Pushes to Result Queue
+    1. Leases a (Pincode, URLs) unit, heartbeating while it works on it
+    2. Scrapes Availability of all its URLs at that location
+    3. Pushes to Result Queue and acks; a failed unit goes back to the queue
     """
     logger.info(f"Worker {name} starting...")
-    scraper = ZeptoScraper(headless=True)
+    owner = f"{node_name()}/{name}"
+    scraper = ZeptoScraper(headless=True, browser_pool=browser_pool)
     
     try:
         await scraper.start()
         
         while True:
-            try:
-                item = item_queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
+            item = work_queue.lease(owner)
+            if item is None:
+                # Units leased elsewhere may still come back; worker nodes also wait for the coordinator
+                if work_queue.outstanding() == 0 and (coordinator or work_queue.is_closed()):
+                    break
+                await asyncio.sleep(QUEUE_POLL_SECONDS)
+                continue
             
-            url, pincode = item
+            urls, pincode = item.get("urls") or [item["url"]], item["pincode"]
+            url = urls[0] if len(urls) == 1 else f"{len(urls)} URLs"
             logger.info(f"[{name}] Checking {url} at {pincode}")
+            heartbeat = asyncio.create_task(keep_leased(work_queue, item["id"], owner))
             
             try:
                 # Scrape Availability
-                products = await scraper.scrape_availability(url, pincode)
-                
-                if products:
-                    await result_queue.put(products)
+                products = await scraper.check_availability(urls, pincode)
+
+                errors = [p for p in products if p.get("error")]
+                if products and len(errors) > MAX_UNIT_ERROR_FRACTION * len(products):
+                    outcome = work_queue.release(item["id"], owner, error=f"{len(errors)}/{len(products)} URLs failed: {errors[0]['error']}")
+                    logger.warning(f"[{name}] {len(errors)}/{len(products)} URLs failed at {pincode}; unit {outcome} (attempt {item['attempts']})")
+                    # Out of attempts: keep what we have, error rows included
+                    if outcome == "failed":
+                        await result_queue.put(products)
                 else:
-                    logger.warning(f"[{name}] No data for {url}")
+                    if products:
+                        await result_queue.put(products)
+                    else:
+                        logger.warning(f"[{name}] No data for {url}")
+                    work_queue.ack(item["id"], owner)
                 
             except Exception as e:
                 logger.error(f"[{name}] Failed {url}: {e}")
-                
-            item_queue.task_done()
+                outcome = work_queue.release(item["id"], owner, error=str(e))
+                logger.info(f"[{name}] {url} at {pincode} {outcome} (attempt {item['attempts']})")
+            finally:
+                heartbeat.cancel()
             
             # Delay
             await scraper.human_delay(1, 3)
@@ -99,12 +132,11 @@ async def worker(name: str, item_queue: asyncio.Queue, result_queue: asyncio.Que
         await scraper.stop()
         logger.info(f"Worker {name} retired.")
 
-async def main():
+def load_items() -> list:
     if not os.path.exists(INPUT_FILE):
         logger.error(f"Input file {INPUT_FILE} not found.")
-        return
+        return None
 
-    # 1. Read Inputs
     try:
         df = pd.read_excel(INPUT_FILE)
         # Expecting 'url' and 'pincode' columns (case insensitive cleanup)
@@ -121,7 +153,7 @@ async def main():
 
         if 'url' not in df.columns:
             logger.error("Input file must have 'url' or 'link' column")
-            return
+            return None
 
         items = []
         for _, row in df.iterrows():
@@ -131,32 +163,65 @@ async def main():
                 items.append((u, p))
         
         logger.info(f"Loaded {len(items)} URL/Pincode pairs.")
+        return items
         
     except Exception as e:
         logger.error(f"Failed to read input: {e}")
-        return
+        return None
+
+def availability_units(items: list) -> list:
+    """(url, pincode) pairs -> units of up to URLS_PER_UNIT URLs sharing a pincode."""
+    by_pincode = {}
+    for u, p in items:
+        by_pincode.setdefault(p, []).append(u)
+    units = []
+    for p, urls in by_pincode.items():
+        for i in range(0, len(urls), URLS_PER_UNIT):
+            units.append({"kind": "availability", "pincode": p, "urls": urls[i:i + URLS_PER_UNIT]})
+    return units
+
+async def main():
+    # 1. Read Inputs (worker nodes take their units from the coordinator's queue)
+    coordinator = QUEUE_ROLE != "worker"
+    items = []
+    if coordinator:
+        items = load_items()
+        if not items:
+            return
 
     # 2. Setup Queues
-    item_queue = asyncio.Queue()
+    work_queue = open_work_queue(WORK_QUEUE_URL, WORK_QUEUE_NAME, visibility_timeout=LEASE_SECONDS, max_attempts=MAX_ITEM_ATTEMPTS)
     result_queue = asyncio.Queue()
     
-    for i in items:
-        item_queue.put_nowait(i)
+    if coordinator:
+        work_queue.reset()
+        work_queue.put_many(availability_units(items))
+    logger.info(f"Work queue {WORK_QUEUE_URL} ({WORK_QUEUE_NAME}), running as {'coordinator' if coordinator else 'worker node'}")
 
     # 3. Launch Writer
     writer = asyncio.create_task(writer_task(result_queue, OUTPUT_FILE))
 
-    # 4. Launch Workers
+    # 4. Launch Workers: one browser, a context per worker warmed up front
     workers = []
-    actual_workers = min(MAX_WORKERS, len(items))
-    
-    for i in range(actual_workers):
-        w = asyncio.create_task(worker(f"W-{i+1}", item_queue, result_queue))
-        workers.append(w)
-        await asyncio.sleep(random.uniform(1, 2))
+    actual_workers = min(MAX_WORKERS, len(items)) if coordinator else MAX_WORKERS
+    browser_pool = await BrowserPool(size=actual_workers, headless=True).start()
 
-    # Wait for workers
-    await asyncio.gather(*workers)
+    try:
+        for i in range(actual_workers):
+            w = asyncio.create_task(worker(f"W-{i+1}", work_queue, result_queue, coordinator, browser_pool))
+            workers.append(w)
+            # Slight jitter so the workers' first requests don't land at the same instant
+            await asyncio.sleep(random.uniform(0, 0.3))
+
+        # Wait for workers
+        await asyncio.gather(*workers)
+    finally:
+        await browser_pool.close()
+    if coordinator:
+        work_queue.close()
+    counts = work_queue.counts()
+    if counts["failed"]:
+        logger.error(f"{counts['failed']} URL/Pincode pairs failed after {MAX_ITEM_ATTEMPTS} attempts.")
     
     # Signal writer to stop
     await result_queue.put(None)
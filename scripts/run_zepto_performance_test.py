@@ -1,190 +1,288 @@
 
 import asyncio
+import argparse
+import csv
 import logging
-import random
 import os
 import json
+import tempfile
+import threading
 import time
 import pandas as pd
+import psutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import sys
-import os
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from scrapers.zepto import ZeptoScraper
+from scrapers.records import PRODUCT_CSV_FIELDS
+from metrics import Histogram
 
-# Configuration
 # Configuration
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 INPUT_DIR = os.path.join(DATA_DIR, "input")
 OUTPUT_DIR = os.path.join(DATA_DIR, "output")
+FIXTURES_DIR = os.path.join(DATA_DIR, "fixtures")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 INPUT_FILE = os.path.join(INPUT_DIR, "pin_codes.xlsx")
-METRICS_FILE = os.path.join(OUTPUT_DIR, "performance_metrics.json")
-MAX_WORKERS = 4 
-TEST_LIMIT = 5 # Limit to 5 pincodes for dry run
+METRICS_FILE = os.path.join(OUTPUT_DIR, f"load_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+TEST_LIMIT = 5 # Limit to 5 pincodes for live dry runs
+
+# Sweep defaults: every combination is run and compared
+DEFAULT_WORKER_COUNTS = [1, 2, 4]
+DEFAULT_PAGE_CONCURRENCY = [1, 4]
+PHASES = ["launch", "set_location", "category_discovery", "category_fetch", "parse", "write"]
+RSS_SAMPLE_INTERVAL = 0.5
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("Zepto_Perf_Test")
 
-async def worker(name: str, pin_queue: asyncio.Queue, results: list):
-    """
-    Worker that tracks performance metrics.
-    """
-    logger.info(f"Worker {name} starting...")
-    scraper = ZeptoScraper(headless=True)
-    
+class ResourceSampler:
+    """Samples CPU time and RSS of this process plus its browser children in a background thread."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.proc = psutil.Process()
+        self.interval = interval
+        self.peak_rss = 0
+        self.cpu_sec = 0.0
+        self._child_cpu = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        procs = [self.proc]
+        try:
+            procs += self.proc.children(recursive=True)
+        except psutil.Error:
+            pass
+        rss = 0
+        for p in procs:
+            try:
+                rss += p.memory_info().rss
+                t = p.cpu_times()
+                self._child_cpu[p.pid] = t.user + t.system
+            except psutil.Error:
+                pass
+        self.peak_rss = max(self.peak_rss, rss)
+        # Exited children keep their last reading, so the total stays monotonic
+        self.cpu_sec = sum(self._child_cpu.values())
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+async def run_units(worker_id: str, pincodes: list, categories: list, config: dict, hists: dict, totals: dict):
+    """One worker: launch a browser, then set_location -> categories -> fetch/parse -> write per pincode."""
+    scraper = ZeptoScraper(headless=True, replay_dir=config.get("replay_dir"))
+    scraper.page_concurrency = config["page_concurrency"]
+    if config.get("replay_dir"):
+        scraper.delay_scale = 0
+
+    out_path = os.path.join(tempfile.gettempdir(), f"zepto_load_{worker_id}_{os.getpid()}.csv")
     try:
+        start = time.perf_counter()
         await scraper.start()
-        
-        while True:
-            try:
-                pincode = pin_queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
-            
-            logger.info(f"[{name}] Starting Pincode: {pincode}")
-            start_time = time.time()
-            item_count = 0
-            category_count = 0
-            status = "Success"
-            error_msg = ""
-            
-            try:
-                # 1. Set Location
-                await scraper.set_location(pincode)
-                
-                # 2. Get Categories
-                categories = await scraper.get_all_categories()
-                category_count = len(categories)
-                
-                # 3. Scrape Categories (Limit to 3 categories for speed in dry run, or all?)
-                # User said "dry run for the pin codes for performance metrics"
-                # If we limit categories, metrics are skewed. Let's do ALL but maybe for fewer pincodes.
-                # We already stuck to TEST_LIMIT pincodes.
-                
-                for cat_url in categories:
-                    try:
-                        # USE FAST MODE
+        hists["launch"].observe(time.perf_counter() - start)
+        totals["scrape_start"] = time.time()
+
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            writer = None
+            for pincode in pincodes:
+                try:
+                    start = time.perf_counter()
+                    await scraper.set_location(pincode)
+                    hists["set_location"].observe(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    found = await scraper.get_all_categories()
+                    hists["category_discovery"].observe(time.perf_counter() - start)
+
+                    for cat_url in (categories or found):
                         products = await scraper.scrape_assortment_fast(cat_url, pincode=pincode)
-                        item_count += len(products)
-                        # Minimal delay for API internal throttling if needed, but fetch is resilient
-                        await asyncio.sleep(0.1) 
-                    except Exception as e:
-                        logger.error(f"[{name}] Failed category {cat_url}: {e}")
-                
-            except Exception as e:
-                logger.error(f"[{name}] Failed processing {pincode}: {e}")
-                status = "Failed"
-                error_msg = str(e)
-                
-            duration = time.time() - start_time
-            
-            # Record Metric for this pincode
-            metric = {
-                "pincode": pincode,
-                "worker": name,
-                "duration_seconds": round(duration, 2),
-                "items_scraped": item_count,
-                "categories_found": category_count,
-                "status": status,
-                "error": error_msg,
-                "timestamp": datetime.now().isoformat()
-            }
-            results.append(metric)
-            
-            pin_queue.task_done()
-            
-            delay = random.uniform(2, 5)
-            await asyncio.sleep(delay)
-                
-    except Exception as e:
-        logger.error(f"[{name}] Crashed: {e}")
+                        hists["category_fetch"].observe(scraper.last_timings.get("fetch", 0))
+                        hists["parse"].observe(scraper.last_timings.get("parse", 0))
+
+                        start = time.perf_counter()
+                        if products:
+                            if writer is None:
+                                writer = csv.DictWriter(f, fieldnames=PRODUCT_CSV_FIELDS)
+                                writer.writeheader()
+                            writer.writerows(products.to_rows())
+                            f.flush()
+                        hists["write"].observe(time.perf_counter() - start)
+
+                        totals["items"] += len(products)
+                        totals["categories"] += 1
+                    totals["pincodes"] += 1
+                except Exception as e:
+                    logger.error(f"[{worker_id}] Failed processing {pincode}: {e}")
+                    totals["errors"] += 1
+        totals["scrape_end"] = time.time()
     finally:
         await scraper.stop()
+        if os.path.exists(out_path):
+            os.remove(out_path)
 
-async def main():
-    if not os.path.exists(INPUT_FILE):
-        logger.error(f"Input file {INPUT_FILE} not found.")
-        return
+def worker_process(worker_id: str, pincodes: list, categories: list, config: dict) -> dict:
+    """Entry point of one worker OS process; returns serialisable metrics."""
+    hists = {phase: Histogram() for phase in PHASES}
+    totals = {"items": 0, "categories": 0, "pincodes": 0, "errors": 0, "scrape_start": None, "scrape_end": None}
+    wall_start = time.time()
 
-    # 1. Read Inputs
-    try:
-        df = pd.read_excel(INPUT_FILE)
-        col = next((c for c in df.columns if c.lower() == 'pincode'), None)
-        if not col:
-            logger.error("Input file must have 'Pincode' column")
+    with ResourceSampler() as sampler:
+        try:
+            asyncio.run(run_units(worker_id, pincodes, categories, config, hists, totals))
+        except Exception as e:
+            logger.error(f"[{worker_id}] Crashed: {e}")
+            totals["errors"] += 1
+
+    return {
+        "worker": worker_id,
+        "wall_sec": round(time.time() - wall_start, 3),
+        "cpu_sec": round(sampler.cpu_sec, 3),
+        "peak_rss_mb": round(sampler.peak_rss / 1e6, 1),
+        "totals": totals,
+        "histograms": {phase: h.to_dict() for phase, h in hists.items()},
+    }
+
+def run_config(pincodes: list, categories: list, workers: int, page_concurrency: int, replay_dir: str) -> dict:
+    """Runs one sweep point with `workers` processes and aggregates their metrics."""
+    config = {"workers": workers, "page_concurrency": page_concurrency, "replay_dir": replay_dir}
+    shards = [pincodes[i::workers] for i in range(workers)]
+    shards = [s for s in shards if s]
+    logger.info(f"▶ Config workers={workers} page_concurrency={page_concurrency} ({len(pincodes)} units)")
+
+    wall_start = time.time()
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        futures = [pool.submit(worker_process, f"W-{i+1}", shard, categories, config) for i, shard in enumerate(shards)]
+        results = [f.result() for f in futures]
+    wall = time.time() - wall_start
+
+    hists = {phase: Histogram() for phase in PHASES}
+    for r in results:
+        for phase, data in r["histograms"].items():
+            hists[phase].merge(Histogram.from_dict(data))
+
+    items = sum(r["totals"]["items"] for r in results)
+    starts = [r["totals"]["scrape_start"] for r in results if r["totals"]["scrape_start"]]
+    ends = [r["totals"]["scrape_end"] for r in results if r["totals"]["scrape_end"]]
+    # Steady-state window: first worker ready -> last worker done (launch excluded)
+    scrape_window = (max(ends) - min(starts)) if starts and ends else wall
+
+    return {
+        "config": {"workers": workers, "page_concurrency": page_concurrency},
+        "wall_clock_sec": round(wall, 2),
+        "scrape_window_sec": round(scrape_window, 2),
+        "items": items,
+        "errors": sum(r["totals"]["errors"] for r in results),
+        "throughput_items_per_min": round(items / (scrape_window / 60), 1) if scrape_window > 0 else 0,
+        "wall_throughput_items_per_min": round(items / (wall / 60), 1) if wall > 0 else 0,
+        "total_cpu_sec": round(sum(r["cpu_sec"] for r in results), 2),
+        "peak_rss_mb_per_worker": max((r["peak_rss_mb"] for r in results), default=0),
+        "phases": {phase: h.summary() for phase, h in hists.items()},
+        "workers_detail": [{k: v for k, v in r.items() if k != "histograms"} for r in results],
+    }
+
+def pick_best(runs: list) -> dict:
+    """Highest steady-state throughput; ties broken by lower CPU per item."""
+    def key(r):
+        cpu_per_item = r["total_cpu_sec"] / r["items"] if r["items"] else float("inf")
+        return (r["errors"] == 0, r["throughput_items_per_min"], -cpu_per_item)
+    return max(runs, key=key)
+
+def load_pincodes() -> list:
+    df = pd.read_excel(INPUT_FILE)
+    col = next((c for c in df.columns if c.lower() == 'pincode'), None)
+    if not col:
+        raise ValueError("Input file must have 'Pincode' column")
+
+    raw_pincodes = df[col].dropna().astype(str).tolist()
+    pincodes = []
+    for p in raw_pincodes:
+         parts = [x.strip() for x in p.split(',')]
+         for part in parts:
+            clean_p = part.split('.')[0].strip()
+            if clean_p.isdigit() and len(clean_p) == 6:
+                pincodes.append(clean_p)
+
+    return sorted(list(set(pincodes)))[:TEST_LIMIT]
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test sweep over worker counts and page concurrency")
+    parser.add_argument("--fixture", type=str, default="default", help="Replay fixture in data/fixtures (see benchmark_replay.py record)")
+    parser.add_argument("--live", action="store_true", help=f"Hit live zepto.com with pincodes from {INPUT_FILE} instead of replaying")
+    parser.add_argument("--units", type=int, default=8, help="Pincode units per sweep point in replay mode")
+    parser.add_argument("--workers", type=int, nargs="+", default=DEFAULT_WORKER_COUNTS)
+    parser.add_argument("--page-concurrency", type=int, nargs="+", default=DEFAULT_PAGE_CONCURRENCY)
+    args = parser.parse_args()
+
+    # 1. Inputs
+    if args.live:
+        if not os.path.exists(INPUT_FILE):
+            logger.error(f"Input file {INPUT_FILE} not found.")
             return
-            
-        raw_pincodes = df[col].dropna().astype(str).tolist()
-        pincodes = []
-        for p in raw_pincodes:
-             parts = [x.strip() for x in p.split(',')]
-             for part in parts:
-                clean_p = part.split('.')[0].strip()
-                if clean_p.isdigit() and len(clean_p) == 6:
-                    pincodes.append(clean_p)
-        
-        pincodes = sorted(list(set(pincodes)))
-        
-        # Limit for Dry Run
-        pincodes = pincodes[:TEST_LIMIT]
-        logger.info(f"Loaded {len(pincodes)} pincodes for DRY RUN.")
-        
-    except Exception as e:
-        logger.error(f"Failed to read input: {e}")
-        return
-
-    # 2. Setup Queue & Results
-    pin_queue = asyncio.Queue()
-    results = [] # Shared list (not thread safe but okay for coroutines if just appending?)
-    # Asyncio is single threaded so append is safe.
-    
-    for p in pincodes:
-        pin_queue.put_nowait(p)
-
-    # 3. Launch Workers
-    start_total = time.time()
-    workers = []
-    actual_workers = min(MAX_WORKERS, len(pincodes))
-    
-    for i in range(actual_workers):
-        w = asyncio.create_task(worker(f"W-{i+1}", pin_queue, results))
-        workers.append(w)
-        await asyncio.sleep(1)
-
-    # Wait for workers
-    await asyncio.gather(*workers)
-    
-    total_duration = time.time() - start_total
-    
-    # 4. Calculate Aggregate Metrics
-    total_items = sum(r['items_scraped'] for r in results)
-    successful_pins = sum(1 for r in results if r['status'] == 'Success')
-    avg_time = total_duration / len(pincodes) if pincodes else 0
-    throughput = (total_items / (total_duration / 60)) if total_duration > 0 else 0
-    
+        pincodes, categories, replay_dir = load_pincodes(), [], None
+    else:
+        replay_dir = os.path.join(FIXTURES_DIR, args.fixture)
+        session_file = os.path.join(replay_dir, "session.json")
+        if not os.path.exists(session_file):
+            logger.error(f"No recorded session at {session_file}. Run: python scripts/benchmark_replay.py record --name {args.fixture}")
+            return
+        with open(session_file, "r", encoding="utf-8") as f:
+            session = json.load(f)
+        pincodes, categories = [session["pincode"]] * args.units, session["categories"]
+    logger.info(f"Loaded {len(pincodes)} pincode units ({'live' if args.live else 'replay: ' + args.fixture}).")
+
+    # 2. Sweep
+    runs = []
+    for workers in args.workers:
+        for page_concurrency in args.page_concurrency:
+            run = run_config(pincodes, categories, min(workers, len(pincodes)), page_concurrency, replay_dir)
+            runs.append(run)
+            logger.info(f"  -> {run['throughput_items_per_min']} items/min, {run['total_cpu_sec']}s CPU, "
+                        f"{run['peak_rss_mb_per_worker']} MB peak RSS/worker, {run['errors']} errors")
+
+    best = pick_best(runs)
+
+    # 3. Report
     final_report = {
         "test_timestamp": datetime.now().isoformat(),
-        "total_duration_sec": round(total_duration, 2),
-        "total_pincodes_attempted": len(pincodes),
-        "successful_pincodes": successful_pins,
-        "total_items_scraped": total_items,
-        "average_time_per_pincode_sec": round(avg_time, 2),
-        "throughput_items_per_min": round(throughput, 2),
-        "details": results
+        "mode": "live" if args.live else "replay",
+        "fixture": None if args.live else args.fixture,
+        "units": len(pincodes),
+        "host_cpus": os.cpu_count(),
+        "best_config": best["config"],
+        "best_throughput_items_per_min": best["throughput_items_per_min"],
+        "runs": runs,
     }
-    
+
     # Save to JSON
     with open(METRICS_FILE, "w", encoding="utf-8") as f:
         json.dump(final_report, f, indent=2)
-        
-    logger.info(f"Performance Test Complete. Metrics saved to {METRICS_FILE}")
-    print(json.dumps(final_report, indent=2))
+
+    print(f"\n{'workers':>8}{'page_conc':>10}{'items':>8}{'items/min':>12}{'cpu s':>9}{'rss MB':>9}{'p50 fetch':>11}{'p90 fetch':>11}")
+    for r in runs:
+        fetch = r["phases"]["category_fetch"]
+        print(f"{r['config']['workers']:>8}{r['config']['page_concurrency']:>10}{r['items']:>8}"
+              f"{r['throughput_items_per_min']:>12}{r['total_cpu_sec']:>9}{r['peak_rss_mb_per_worker']:>9}"
+              f"{fetch.get('p50_sec', 0):>11}{fetch.get('p90_sec', 0):>11}")
+    print(f"\nBest: {best['config']} at {best['throughput_items_per_min']} items/min")
+    logger.info(f"Load test complete. Report saved to {METRICS_FILE}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
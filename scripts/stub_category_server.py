@@ -0,0 +1,101 @@
+import asyncio
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from scrapers.pagination import PaginationEngine
+from scrapers.zepto import extract_cards
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("Zepto_Stub_Server")
+
+def make_card(i: int) -> dict:
+    """Synthetic cardData in the shape scrape_assortment_fast expects."""
+    return {
+        "id": f"00000000-0000-0000-0000-{i:012d}",
+        "product": {"name": f"Stub Product {i}", "brand": "Stub"},
+        "productVariant": {"formattedPacksize": "500 g", "mrp": 5000, "shelfLifeInHours": 72},
+        "sellingPrice": 4500,
+        "mrp": 5000,
+        "availableQuantity": i % 7,
+    }
+
+def render_page(page: int, page_size: int, total: int) -> str:
+    """One RSC-style page: a line per card, each `<row id>:<json>`."""
+    start = (page - 1) * page_size
+    lines = []
+    for i in range(start, min(start + page_size, total)):
+        lines.append(f"{i:x}:" + json.dumps({"cardData": make_card(i), "totalCount": total}))
+    return "\n".join(lines)
+
+def make_handler(page_size: int, total: int):
+    class PagedCategoryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            page = int(query.get("page", ["1"])[0])
+            body = render_page(page, page_size, total).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/x-component")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PagedCategoryHandler
+
+def start_server(port: int, page_size: int, total: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(page_size, total))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def check(port: int, total: int, concurrency: int):
+    """Runs PaginationEngine against the stub and reports expected vs captured."""
+    template = f"http://127.0.0.1:{port}/cn/stub/stub/cid/1/scid/2?page={{page}}"
+
+    async def fetch_page(n):
+        def _get():
+            with urllib.request.urlopen(template.format(page=n), timeout=10) as resp:
+                return resp.read().decode("utf-8")
+        return await asyncio.to_thread(_get)
+
+    products = {}
+    engine = PaginationEngine(fetch_page, extract_cards, concurrency=concurrency, max_pages=1000)
+    result = await engine.run(products)
+    logger.info(f"Expected {result['expected']}, captured {len(products)} in {result['pages']} pages (exhausted={result['exhausted']})")
+    return len(products) == total
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve paged Zepto-style category fixtures for offline pagination runs")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--page-size", type=int, default=24)
+    parser.add_argument("--total", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--check", action="store_true", help="Run the pagination engine against the stub and exit")
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.page_size, args.total)
+    logger.info(f"Serving {args.total} products in pages of {args.page_size} on http://127.0.0.1:{args.port}/?page=N")
+
+    try:
+        if args.check:
+            ok = asyncio.run(check(args.port, args.total, args.concurrency))
+            sys.exit(0 if ok else 1)
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
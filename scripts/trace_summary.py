@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+BAR_WIDTH = 40
+
+def load_spans(path: str) -> list:
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+def build_tree(spans: list):
+    by_id = {s["span_id"]: s for s in spans}
+    children = defaultdict(list)
+    roots = []
+    for s in spans:
+        parent = s.get("parent_span_id")
+        if parent and parent in by_id:
+            children[parent].append(s)
+        else:
+            roots.append(s)
+    for kids in children.values():
+        kids.sort(key=lambda s: s["start_time_unix_nano"])
+    roots.sort(key=lambda s: s["start_time_unix_nano"])
+    return roots, children
+
+def self_times(spans: list, children: dict) -> dict:
+    """Total and self (exclusive) milliseconds per span name: the flame-graph view."""
+    totals = defaultdict(lambda: {"calls": 0, "total_ms": 0.0, "self_ms": 0.0})
+    for s in spans:
+        child_ms = sum(c["duration_ms"] for c in children.get(s["span_id"], []))
+        row = totals[s["name"]]
+        row["calls"] += 1
+        row["total_ms"] += s["duration_ms"]
+        # Concurrent children can exceed the parent; clamp instead of going negative
+        row["self_ms"] += max(0.0, s["duration_ms"] - child_ms)
+    return totals
+
+def print_waterfall(root: dict, children: dict, max_depth: int):
+    t0 = root["start_time_unix_nano"]
+    total_ns = max(root["end_time_unix_nano"] - t0, 1)
+
+    def walk(s, depth):
+        if depth > max_depth:
+            return
+        start = (s["start_time_unix_nano"] - t0) / total_ns
+        width = max((s["end_time_unix_nano"] - s["start_time_unix_nano"]) / total_ns, 1 / BAR_WIDTH)
+        bar = " " * int(start * BAR_WIDTH) + "█" * max(1, int(width * BAR_WIDTH))
+        label = ("  " * depth + s["name"])[:48]
+        flag = " !" if s.get("status") == "ERROR" else ""
+        print(f"{label:<48} {(s['start_time_unix_nano'] - t0) / 1e6:>10.0f} {s['duration_ms']:>10.0f}  |{bar:<{BAR_WIDTH}}|{flag}")
+        for c in children.get(s["span_id"], []):
+            walk(c, depth + 1)
+
+    walk(root, 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Waterfall and self-time summary of a span JSONL file, per pincode")
+    parser.add_argument("files", type=str, nargs="+", help="Span files written with ZEPTO_TRACING=1 (the runner's and one per worker process)")
+    parser.add_argument("--pincode", type=str, default=None, help="Only show this pincode")
+    parser.add_argument("--depth", type=int, default=3, help="Waterfall depth")
+    parser.add_argument("--top", type=int, default=15, help="Rows in the self-time table")
+    args = parser.parse_args()
+
+    spans = []
+    for path in args.files:
+        if not os.path.exists(path):
+            print(f"File {path} does not exist.")
+            sys.exit(1)
+        spans.extend(load_spans(path))
+    roots, children = build_tree(spans)
+
+    by_pincode = defaultdict(list)
+    for s in spans:
+        by_pincode[s.get("attributes", {}).get("pincode", "(none)")].append(s)
+
+    for pincode in sorted(by_pincode):
+        if args.pincode and pincode != args.pincode:
+            continue
+        pin_spans = by_pincode[pincode]
+        pin_roots = [r for r in roots if r.get("attributes", {}).get("pincode", "(none)") == pincode]
+
+        print("=" * 100)
+        print(f" Pincode {pincode}: {len(pin_spans)} spans")
+        print("=" * 100)
+        print(f"{'span':<48} {'start ms':>10} {'dur ms':>10}")
+        for root in pin_roots:
+            if root["name"].startswith("runner.") or len(pin_roots) <= 5:
+                print_waterfall(root, children, args.depth)
+
+        print(f"\n{'self time by span':<48} {'calls':>7} {'self ms':>12} {'total ms':>12}")
+        rows = sorted(self_times(pin_spans, children).items(), key=lambda kv: kv[1]["self_ms"], reverse=True)
+        for name, row in rows[:args.top]:
+            print(f"{name:<48} {row['calls']:>7} {row['self_ms']:>12.0f} {row['total_ms']:>12.0f}")
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,12 @@
 
 import asyncio
-import csv
 import argparse
 import os
 import logging
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
-from database import Database
+from normalize import DEFAULT_CHUNK_ROWS, iter_db_batches, read_frames, to_db_columns
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -17,6 +16,9 @@ def clean_csv_keys(row: dict) -> dict:
     """
     Cleans CSV row keys to match Supabase schema if necessary.
     Converts numeric strings to proper types.
+
+    Per-row version, kept for reference; uploads go through
+    normalize.normalize_frame / to_db_records.
     """
     cleaned = dict(row)
     
@@ -42,7 +44,8 @@ def clean_csv_keys(row: dict) -> dict:
     # We keep: name, brand, mrp, price, pack_size, category, subcategory, availability, inventory, store_id, base_product_id, shelf_life_in_hours, scraped_at, pincode_input
     
     # Type conversion
-    numeric_fields = ['price', 'mrp', 'inventory']
+    # prev_* columns only appear in change-log files (zepto_assortment_changes)
+    numeric_fields = ['price', 'mrp', 'inventory', 'prev_price', 'prev_mrp', 'prev_inventory']
     for key in numeric_fields:
         if key in cleaned:
             val = cleaned[key]
@@ -51,7 +54,7 @@ def clean_csv_keys(row: dict) -> dict:
                 # Special handling for inventory "N/A" -> None
             else:
                 try:
-                    if key in ['price', 'mrp']:
+                    if key in ['price', 'mrp', 'prev_price', 'prev_mrp']:
                         cleaned[key] = float(val)
                     else:
                         cleaned[key] = int(float(val))
@@ -67,52 +70,73 @@ def clean_csv_keys(row: dict) -> dict:
             
     return cleaned
 
+def upload_file(db, path: str, table: str, batch_size: int = 100, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+    """
+    Uploads a CSV/Parquet file; returns (uploaded, failed, batches). With the
+    COPY loader `uploaded` counts rows actually inserted, so rows already in
+    the table (a reload) are neither uploaded nor failed.
+    """
+    uploaded = failed = batches = 0
+    if db.loader == "copy":
+        # One COPY per chunk, fed straight from the typed columns (no per-row dicts)
+        for frame in read_frames(path, chunk_rows):
+            batches += 1
+            names, values = to_db_columns(frame)
+            inserted = db.copy_rows(names, zip(*values), table_name=table)
+            if inserted is None:
+                failed += len(frame)
+            else:
+                uploaded += inserted
+                if inserted < len(frame):
+                    logger.info(f"Batch {batches}: {len(frame) - inserted} of {len(frame)} rows were already loaded.")
+        return uploaded, failed, batches
+
+    # Chunks are read and typed column-wise; only one chunk's records are held at a time
+    for batch in iter_db_batches(path, batch_size, chunk_rows):
+        batches += 1
+        if db.save_products(batch, table_name=table):
+            uploaded += len(batch)
+            logger.info(f"Batch {batches} uploaded ({uploaded} records so far).")
+        else:
+            failed += len(batch)
+            logger.error(f"Batch {batches} failed.")
+    return uploaded, failed, batches
+
 def main():
+    # Imported here so benchmarks can use clean_csv_keys without the Supabase client installed
+    from database import Database
+
     parser = argparse.ArgumentParser(description="Upload Zepto CSV Data to Supabase")
-    parser.add_argument("file", type=str, help="Path to the CSV file to upload")
+    parser.add_argument("file", type=str, help="Path to the CSV (or .parquet) file to upload")
     parser.add_argument("--table", type=str, default="zepto_assortment", help="Target Supabase table name")
+    parser.add_argument("--batch-size", type=int, default=100, help="Records per insert request (REST loader)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows read and normalized at a time")
+    parser.add_argument("--loader", choices=["rest", "copy"], default=None, help="Override ZEPTO_DB_LOADER")
     args = parser.parse_args()
 
     if not os.path.exists(args.file):
         logger.error(f"File {args.file} does not exist.")
         return
 
-    db = Database()
-    if not db.client:
+    db = Database(loader=args.loader)
+    if not db.connected:
         logger.error("Database connection failed. Check .env file.")
         return
 
-    records = []
     logger.info(f"Reading {args.file}...")
     
     try:
-        with open(args.file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                records.append(clean_csv_keys(row))
-                
-        if not records:
-            logger.warning("No records found in CSV.")
+        uploaded, failed, batches = upload_file(db, args.file, args.table, args.batch_size, args.chunk_rows)
+        if not batches:
+            logger.warning("No records found in file.")
             return
-
-        # Upload in batches of 100
-        batch_size = 100
-        total_batches = (len(records) + batch_size - 1) // batch_size
-        
-        logger.info(f"Found {len(records)} records. Uploading in {total_batches} batches...")
-        
-        for i in range(total_batches):
-            batch = records[i*batch_size : (i+1)*batch_size]
-            success = db.save_products(batch, table_name=args.table)
-            if success:
-                logger.info(f"Batch {i+1}/{total_batches} uploaded.")
-            else:
-                logger.error(f"Batch {i+1}/{total_batches} failed.")
-                
+        logger.info(f"Uploaded {uploaded} records in {batches} batches ({failed} failed).")
         logger.info("Upload process completed.")
         
     except Exception as e:
         logger.error(f"Error processing file: {e}")
+    finally:
+        db.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,247 @@
+import csv
+import gzip
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("ChangeDetection")
+
+# Columns compared between runs. Everything else (timestamp, label, ETA) is
+# expected to drift and is not treated as a change.
+PRICE_FIELDS = ["Price", "Mrp"]
+STOCK_FIELDS = ["availability", "inventory"]
+
+CHANGE_FIELDS = ["change_type", "prev_price", "prev_mrp", "prev_inventory", "prev_availability"]
+
+def snapshot_key(row: dict) -> Tuple[str, str, str]:
+    """Identity of a SKU listing: (pincode, store_id, base_product_id)."""
+    return (
+        str(row.get("pincode_input", "")),
+        str(row.get("store_id", "")),
+        str(row.get("base_product_id", "")),
+    )
+
+def unit_key(row: dict) -> Tuple[str, str, str]:
+    """The scrape unit a SKU row came from: (pincode, category, subcategory)."""
+    return (
+        str(row.get("pincode_input", "")),
+        str(row.get("Category", "")),
+        str(row.get("Subcategory", "")),
+    )
+
+def _num(val) -> Optional[float]:
+    if val is None or val == "" or val == "N/A":
+        return None
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+def _in_stock(row: dict) -> bool:
+    return row.get("availability") == "In Stock"
+
+def classify_change(prev: Optional[dict], curr: Optional[dict]) -> List[str]:
+    """
+    Returns the change types between two versions of the same SKU row.
+    An empty list means the row is unchanged.
+    """
+    if prev is None and curr is None:
+        return []
+    if prev is None:
+        return ["new"]
+    if curr is None:
+        return ["delisted"]
+
+    changes = []
+    if any(_num(prev.get(f)) != _num(curr.get(f)) for f in PRICE_FIELDS):
+        changes.append("price_change")
+
+    was_in, now_in = _in_stock(prev), _in_stock(curr)
+    if was_in and not now_in:
+        changes.append("stock_out")
+    elif now_in and not was_in:
+        changes.append("stock_in")
+    elif _num(prev.get("inventory")) != _num(curr.get("inventory")):
+        changes.append("inventory_change")
+
+    return changes
+
+class ChangeDetector:
+    """
+    Diffs a run's output CSV against the previous snapshot of the same
+    (pincode, store_id, base_product_id) listings.
+
+    State lives in two files under `state_dir`:
+      - `<name>_snapshot.csv`: the latest known row for every listing
+      - `<name>_meta.json`: bookkeeping (last full snapshot time, run count)
+
+    A listing missing from the run is only reported as delisted when its
+    (pincode, category, subcategory) unit was scraped to completion (see
+    `process`), so a failed or truncated category does not mark its SKUs as
+    delisted; without that information, pincodes present in the run are
+    taken as complete.
+    """
+
+    def __init__(self, state_dir: str, name: str = "zepto_assortment", full_snapshot_every_hours: float = 24):
+        self.state_dir = state_dir
+        self.snapshot_file = os.path.join(state_dir, f"{name}_snapshot.csv")
+        self.meta_file = os.path.join(state_dir, f"{name}_meta.json")
+        self.archive_dir = os.path.join(state_dir, f"{name}_runs")
+        self.full_snapshot_every_hours = full_snapshot_every_hours
+        os.makedirs(state_dir, exist_ok=True)
+
+    def load_snapshot(self) -> Dict[Tuple[str, str, str], dict]:
+        snapshot = {}
+        if not os.path.exists(self.snapshot_file):
+            return snapshot
+        with open(self.snapshot_file, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                snapshot[snapshot_key(row)] = row
+        return snapshot
+
+    def load_meta(self) -> dict:
+        if not os.path.exists(self.meta_file):
+            return {}
+        try:
+            with open(self.meta_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read change detection meta: {e}")
+            return {}
+
+    def full_snapshot_due(self, now: Optional[datetime] = None) -> bool:
+        """True when no snapshot exists yet or the last full one is older than the interval."""
+        meta = self.load_meta()
+        last = meta.get("last_full_snapshot")
+        if not last or not os.path.exists(self.snapshot_file):
+            return True
+        now = now or datetime.now()
+        age_hours = (now - datetime.fromisoformat(last)).total_seconds() / 3600
+        return age_hours >= self.full_snapshot_every_hours
+
+    def _covered(self, current_rows: List[dict], completed: Optional[Set[Tuple[str, str, str]]]):
+        """Predicate: was this previous row's unit fully scraped in this run?"""
+        if completed is None:
+            scraped_pincodes = {str(r.get("pincode_input", "")) for r in current_rows}
+            return lambda row: str(row.get("pincode_input", "")) in scraped_pincodes
+        return lambda row: unit_key(row) in completed
+
+    def diff(self, previous: Dict[Tuple, dict], current_rows: List[dict],
+             completed: Optional[Set[Tuple[str, str, str]]] = None) -> List[dict]:
+        """
+        Builds the change log for `current_rows` against `previous`. Listings
+        missing from the run are delisted only if their unit is in `completed`.
+        """
+        current = {}
+        for row in current_rows:
+            current[snapshot_key(row)] = row
+
+        covered = self._covered(current_rows, completed)
+        changes = []
+
+        for key, row in current.items():
+            prev = previous.get(key)
+            for change_type in classify_change(prev, row):
+                changes.append(self._change_row(change_type, row, prev))
+
+        for key, prev in previous.items():
+            if key not in current and covered(prev):
+                delisted = dict(prev)
+                delisted["availability"] = "Delisted"
+                changes.append(self._change_row("delisted", delisted, prev))
+
+        return changes
+
+    def _change_row(self, change_type: str, row: dict, prev: Optional[dict]) -> dict:
+        out = dict(row)
+        prev = prev or {}
+        out["change_type"] = change_type
+        out["prev_price"] = prev.get("Price", "")
+        out["prev_mrp"] = prev.get("Mrp", "")
+        out["prev_inventory"] = prev.get("inventory", "")
+        out["prev_availability"] = prev.get("availability", "")
+        return out
+
+    def process(self, output_file: str, changes_file: str, completed: Optional[Set[Tuple[str, str, str]]] = None,
+                full_snapshot: Optional[bool] = None) -> dict:
+        """
+        Diffs `output_file` against the stored snapshot, writes the change log
+        to `changes_file` and rolls the snapshot forward.
+
+        `completed` holds the (pincode, category, subcategory) units the run
+        scraped to completion (None: every pincode in the output).
+        `full_snapshot` overrides `full_snapshot_due()`, for a runner that
+        decided it at start (to know whether to stream the full rows).
+
+        Returns a summary dict with counts per change type and whether this run
+        is a full snapshot (and so should be stored/uploaded in full).
+        """
+        with open(output_file, "r", newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fieldnames = list(reader.fieldnames or [])
+            current_rows = list(reader)
+
+        is_full = self.full_snapshot_due() if full_snapshot is None else full_snapshot
+        previous = self.load_snapshot()
+        changes = self.diff(previous, current_rows, completed)
+
+        counts: Dict[str, int] = {}
+        for c in changes:
+            counts[c["change_type"]] = counts.get(c["change_type"], 0) + 1
+
+        if changes:
+            with open(changes_file, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames + CHANGE_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(changes)
+
+        self._roll_snapshot(previous, current_rows, fieldnames, is_full, completed)
+
+        summary = {
+            "rows": len(current_rows),
+            "changes": len(changes),
+            "by_type": counts,
+            "full_snapshot": is_full,
+            "changes_file": changes_file if changes else None,
+        }
+        logger.info(f"Change detection: {len(changes)} changes out of {len(current_rows)} rows {counts} (full_snapshot={is_full})")
+        return summary
+
+    def archive(self, output_file: str) -> str:
+        """Gzips a run's full output into `archive_dir` and removes the original; returns the archive path."""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive_file = os.path.join(self.archive_dir, os.path.basename(output_file) + ".gz")
+        with open(output_file, "rb") as src, gzip.open(archive_file + ".tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(archive_file + ".tmp", archive_file)
+        os.remove(output_file)
+        return archive_file
+
+    def _roll_snapshot(self, previous: Dict[Tuple, dict], current_rows: List[dict], fieldnames: List[str], is_full: bool,
+                       completed: Optional[Set[Tuple[str, str, str]]] = None):
+        # Listings of units this run did not finish keep their last known row
+        covered = self._covered(current_rows, completed)
+        merged = {k: v for k, v in previous.items() if not covered(v)}
+        for row in current_rows:
+            merged[snapshot_key(row)] = row
+
+        if not fieldnames and merged:
+            fieldnames = list(next(iter(merged.values())).keys())
+
+        tmp_file = self.snapshot_file + ".tmp"
+        with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(merged.values())
+        os.replace(tmp_file, self.snapshot_file)
+
+        meta = self.load_meta()
+        meta["runs"] = meta.get("runs", 0) + 1
+        meta["last_run"] = datetime.now().isoformat()
+        if is_full:
+            meta["last_full_snapshot"] = meta["last_run"]
+        with open(self.meta_file, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
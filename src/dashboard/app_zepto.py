@@ -10,6 +10,7 @@ import subprocess
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database import Database
+from normalize import normalize_rows, with_rupees
 
 st.set_page_config(page_title="Zepto Analytics Dashboard", layout="wide")
 
@@ -31,21 +32,15 @@ def load_data():
     data = db.fetch_products(table_name="zepto_assortment", limit=5000)
     if not data:
         return pd.DataFrame()
-    df = pd.DataFrame(data)
-    
-    # Ensure numeric columns
-    for col in ['price', 'mrp', 'inventory']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    # Typed once here (paise/Int64/datetimes); rupee columns are only for display
+    df = with_rupees(normalize_rows(data))
             
     # Process Dates
     if 'scraped_at' in df.columns:
-        df['scraped_at'] = pd.to_datetime(df['scraped_at'])
         df['scrape_time_str'] = df['scraped_at'].dt.strftime('%d-%m-%Y %H:%M:%S')
         df['date'] = df['scraped_at'].dt.date
 
     if 'created_at' in df.columns:
-        df['created_at'] = pd.to_datetime(df['created_at'])
         try:
             # Convert UTC to IST
             if df['created_at'].dt.tz is None:
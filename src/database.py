@@ -1,6 +1,8 @@
+import asyncio
 import os
 import logging
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Iterable, Optional, Sequence
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
@@ -10,11 +12,29 @@ load_dotenv()
 # Configure logging
 logger = logging.getLogger("Database")
 
+# How save_products writes: "rest" (Supabase client, JSON batches) or "copy"
+# (COPY into a staging table over a direct Postgres connection, then merge).
+DB_LOADER = os.environ.get("ZEPTO_DB_LOADER", "rest")
+# Direct connection string for the "copy" loader, e.g. Supabase's
+# postgresql://postgres:<password>@db.<project>.supabase.co:5432/postgres
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+# Rows identical on these columns are the same observation; merging skips them
+# so loading the same file twice does not duplicate it. A product listed under
+# several (sub)categories is one row per listing, as the REST loader keeps it.
+MERGE_KEY = ["scraped_at", "pincode_input", "store_id", "base_product_id", "category", "subcategory"]
+
 class Database:
-    def __init__(self):
+    def __init__(self, loader: Optional[str] = None):
         self.url = os.environ.get("SUPABASE_URL")
         self.key = os.environ.get("SUPABASE_KEY")
         self.client: Client = None
+        self.loader = loader or DB_LOADER
+        self.database_url = DATABASE_URL
+        self._pg = None
+        # copy_rows may be called from several threads (AsyncDatabase); psycopg
+        # connections run one transaction at a time
+        self._pg_lock = threading.Lock()
         
         if self.url and self.key:
             try:
@@ -25,10 +45,24 @@ class Database:
         else:
             logger.warning("SUPABASE_URL or SUPABASE_KEY not found in environment variables. Database features will be disabled.")
 
+        if self.loader == "copy" and not self.database_url:
+            logger.warning("ZEPTO_DB_LOADER=copy needs DATABASE_URL. Falling back to the REST loader.")
+            self.loader = "rest"
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.client) or self.loader == "copy"
+
     def save_products(self, products: List[Dict[str, Any]], table_name: str = "zepto_assortment"):
         """
         Upserts a list of products into the specified table.
         """
+        if self.loader == "copy":
+            if not products:
+                return True
+            columns = list(dict.fromkeys(k for p in products for k in p))
+            return self.copy_rows(columns, ([p.get(c) for c in columns] for p in products), table_name) is not None
+
         if not self.client:
             logger.warning("Supabase client not active. Skipping upload.")
             return False
@@ -55,3 +89,165 @@ class Database:
         except Exception as e:
             logger.error(f"Failed to fetch data: {e}")
             return []
+
+    # --- Bulk loading over a direct Postgres connection ---
+
+    def _pg_connection(self):
+        if self._pg is None or self._pg.closed:
+            import psycopg  # only needed for the "copy" loader
+            self._pg = psycopg.connect(self.database_url, autocommit=True)
+        return self._pg
+
+    def copy_rows(self, columns: Sequence[str], rows: Iterable[Sequence[Any]], table_name: str = "zepto_assortment") -> Optional[int]:
+        """
+        Streams `rows` (values in `columns` order) with COPY into a temporary
+        staging table shaped like `table_name`, then inserts the rows whose
+        MERGE_KEY is not in the table yet, all in one transaction. Returns
+        the number of rows inserted (duplicates excluded), or None on failure.
+
+        The connection is shared, so loads from several threads run one at a time.
+        """
+        from psycopg import sql
+
+        stage = sql.Identifier(f"{table_name}_stage")
+        target = sql.Identifier(table_name)
+        cols = sql.SQL(", ").join(sql.Identifier(c) for c in columns)
+        key = [c for c in MERGE_KEY if c in columns]
+        try:
+            with self._pg_lock:
+                conn = self._pg_connection()
+                with conn.transaction(), conn.cursor() as cur:
+                    cur.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(stage, target))
+                    staged = 0
+                    with cur.copy(sql.SQL("COPY {} ({}) FROM STDIN").format(stage, cols)) as copy:
+                        for row in rows:
+                            copy.write_row(row)
+                            staged += 1
+
+                    if key:
+                        # DISTINCT ON drops repeats inside the load; NOT EXISTS drops rows already loaded
+                        key_cols = sql.SQL(", ").join(sql.Identifier(c) for c in key)
+                        # `=` on the leading key column keeps the index usable; NULL-safe on the rest
+                        matches = sql.SQL(" AND ").join(
+                            sql.SQL("t.{c} = s.{c}" if i == 0 else "t.{c} IS NOT DISTINCT FROM s.{c}").format(c=sql.Identifier(c))
+                            for i, c in enumerate(key))
+                        merge = sql.SQL(
+                            "INSERT INTO {target} ({cols}) "
+                            "SELECT DISTINCT ON ({key}) {cols} FROM {stage} s "
+                            "WHERE NOT EXISTS (SELECT 1 FROM {target} t WHERE {matches})"
+                        ).format(target=target, cols=cols, key=key_cols, stage=stage, matches=matches)
+                    else:
+                        merge = sql.SQL("INSERT INTO {} ({}) SELECT {} FROM {}").format(target, cols, cols, stage)
+                    cur.execute(merge)
+                    inserted = cur.rowcount
+            logger.info(f"Loaded {staged} rows into {table_name} via COPY ({inserted} new).")
+            return inserted
+        except Exception as e:
+            logger.error(f"COPY load into {table_name} failed: {e}")
+            if self._pg is not None and self._pg.broken:
+                self._pg = None
+            return None
+
+    def close(self):
+        if self._pg is not None:
+            self._pg.close()
+            self._pg = None
+
+# AsyncDatabase: requests in flight at once, and per-request timeout (seconds)
+DB_CONCURRENCY = int(os.environ.get("ZEPTO_DB_CONCURRENCY", "4"))
+DB_TIMEOUT = float(os.environ.get("ZEPTO_DB_TIMEOUT", "30"))
+
+class AsyncDatabase:
+    """
+    Async counterpart of `Database` for the runners: the same
+    `save_products` / `fetch_products` surface, awaited, over one pooled
+    httpx client talking to Supabase's REST endpoint (HTTP/2 when the `h2`
+    package is installed, keep-alive otherwise). At most `concurrency`
+    requests are in flight; the rest wait for a slot.
+
+    With `ZEPTO_DB_LOADER=copy`, saves go through `Database.copy_rows` in a
+    thread instead, within the same slots; they share one Postgres
+    connection, so the COPY loads themselves run one at a time.
+    """
+
+    def __init__(self, concurrency: int = DB_CONCURRENCY, timeout: float = DB_TIMEOUT, loader: Optional[str] = None):
+        import httpx
+
+        self.url = os.environ.get("SUPABASE_URL")
+        self.key = os.environ.get("SUPABASE_KEY")
+        self.loader = loader or DB_LOADER
+        self._sync = Database(loader="copy") if self.loader == "copy" else None
+        if self._sync is not None and self._sync.loader != "copy":
+            self.loader = "rest"
+            self._sync = None
+        self._slots = asyncio.Semaphore(concurrency)
+        self.client = None
+
+        if not (self.url and self.key):
+            logger.warning("SUPABASE_URL or SUPABASE_KEY not found in environment variables. Database features will be disabled.")
+            return
+        try:
+            import h2  # noqa: F401  (httpx only negotiates HTTP/2 when it is installed)
+            http2 = True
+        except ImportError:
+            http2 = False
+        self.client = httpx.AsyncClient(
+            base_url=self.url.rstrip("/") + "/rest/v1",
+            headers={"apikey": self.key, "Authorization": f"Bearer {self.key}"},
+            http2=http2,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency, keepalive_expiry=60),
+        )
+        logger.info(f"Async Supabase client initialized ({'HTTP/2' if http2 else 'HTTP/1.1 keep-alive'}, {concurrency} connections).")
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.client) or self._sync is not None
+
+    async def save_products(self, products: List[Dict[str, Any]], table_name: str = "zepto_assortment") -> bool:
+        """Inserts a list of products into the specified table."""
+        if not products:
+            return True
+        if self._sync is not None:
+            # Same in-flight cap as REST; copy_rows itself serializes on the shared connection
+            async with self._slots:
+                return await asyncio.to_thread(self._sync.save_products, products, table_name)
+        if not self.client:
+            logger.warning("Supabase client not active. Skipping upload.")
+            return False
+
+        try:
+            async with self._slots:
+                response = await self.client.post(f"/{table_name}", json=products, headers={"Prefer": "return=minimal"})
+            response.raise_for_status()
+            logger.info(f"Successfully uploaded {len(products)} records to {table_name}.")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to upload data to {table_name}: {e}")
+            return False
+
+    async def fetch_products(self, table_name: str = "zepto_assortment", limit: int = 1000):
+        if not self.client:
+            return []
+
+        try:
+            async with self._slots:
+                response = await self.client.get(f"/{table_name}", params={"select": "*", "order": "created_at.desc", "limit": str(limit)})
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Failed to fetch data: {e}")
+            return []
+
+    async def aclose(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+        if self._sync is not None:
+            self._sync.close()
+
+    async def __aenter__(self) -> "AsyncDatabase":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
@@ -0,0 +1,187 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+from metrics import registry
+from normalize import batch_to_frame, normalize_rows, to_db_records
+from tracing import span
+
+logger = logging.getLogger("DatabaseSink")
+
+class DatabaseSink:
+    """
+    Uploads product rows to the database in the background while a run is
+    still scraping, so the dashboard fills up as stores finish and no
+    post-run upload is needed.
+
+    `put()` takes a `ProductBatch` (typed straight from its records) or a
+    list of CSV-schema dicts, and never blocks the scrape. Rows are sent in
+    batches of `batch_rows`, or after `flush_interval` seconds. A batch the
+    database rejects (or can't be reached for) is written to `spool_dir` as
+    one JSONL file, and spooled files are retried every `retry_interval`
+    seconds, when the sink closes, and at the start of the next run.
+    A backlog over `max_pending_rows` also goes to the spool instead of memory.
+
+    `db` is a `Database` (called in a thread) or an `AsyncDatabase`.
+    """
+
+    def __init__(self, db, table: str, spool_dir: str, batch_rows: int = 500, flush_interval: float = 5.0,
+                 retry_interval: float = 30.0, max_pending_rows: int = 50_000):
+        self.db = db
+        self.table = table
+        self.spool_dir = spool_dir
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_pending_rows = max_pending_rows
+
+        self.buffers: Dict[str, List[dict]] = {}
+        self.pending_rows = 0
+        self.uploaded = 0
+        self.spooled = 0
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+        self._next_retry = 0.0
+        self._spool_seq = 0
+        os.makedirs(spool_dir, exist_ok=True)
+
+        self.uploaded_total = registry.counter("zepto_db_rows_uploaded_total", "Rows the database sink uploaded")
+        self.spooled_total = registry.counter("zepto_db_rows_spooled_total", "Rows written to the local spool instead of the database")
+        registry.gauge("zepto_db_sink_backlog_rows", "Rows buffered in memory for upload", fn=lambda: self.pending_rows)
+        registry.gauge("zepto_db_spool_files", "Batches waiting in the local spool", fn=lambda: len(self._spool_files()))
+
+    def start(self) -> "DatabaseSink":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def put(self, batch, table: Optional[str] = None):
+        """Queues a ProductBatch, or a list of CSV-schema row dicts, for upload to `table`."""
+        if not batch:
+            return
+        if isinstance(batch, list):
+            records = to_db_records(normalize_rows(batch))
+        else:
+            records = to_db_records(batch_to_frame(batch))
+        self.put_records(records, table)
+
+    def put_records(self, records: List[dict], table: Optional[str] = None):
+        """Queues records already in database form (see normalize.to_db_records)."""
+        table = table or self.table
+        if self.pending_rows + len(records) > self.max_pending_rows:
+            self._spool(table, records)
+            return
+        self.buffers.setdefault(table, []).extend(records)
+        self.pending_rows += len(records)
+        if len(self.buffers[table]) >= self.batch_rows:
+            self._wakeup.set()
+
+    async def close(self):
+        """Uploads what is buffered, retries the spool once, and stops."""
+        self._closing = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+        if hasattr(self.db, "aclose"):
+            await self.db.aclose()
+        logger.info(f"Database sink: {self.uploaded} rows uploaded, {self.spooled} spooled"
+                    f"{f' ({len(self._spool_files())} batches left in {self.spool_dir})' if self._spool_files() else ''}.")
+
+    async def _run(self):
+        # Leftovers from an earlier run go first
+        await self._drain_spool()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            await self._flush(partial=True)
+            if time.monotonic() >= self._next_retry:
+                await self._drain_spool()
+            if self._closing:
+                await self._flush(partial=True)
+                await self._drain_spool(force=True)
+                return
+
+    async def _flush(self, partial: bool):
+        """Uploads full batches (and the remainder when `partial`)."""
+        chunks = []
+        for table in list(self.buffers):
+            rows = self.buffers[table]
+            while rows and (partial or len(rows) >= self.batch_rows):
+                chunk, rows = rows[:self.batch_rows], rows[self.batch_rows:]
+                self.buffers[table] = rows
+                self.pending_rows -= len(chunk)
+                chunks.append((table, chunk))
+        if not chunks:
+            return
+        if asyncio.iscoroutinefunction(self.db.save_products):
+            # AsyncDatabase bounds how many of these are actually in flight
+            results = await asyncio.gather(*(self._upload(table, chunk) for table, chunk in chunks))
+        else:
+            results = [await self._upload(table, chunk) for table, chunk in chunks]
+        for (table, chunk), ok in zip(chunks, results):
+            if not ok:
+                self._spool(table, chunk)
+
+    async def _upload(self, table: str, records: List[dict]) -> bool:
+        with span("db_sink.upload", table=table, rows=len(records)):
+            try:
+                if asyncio.iscoroutinefunction(self.db.save_products):
+                    ok = await self.db.save_products(records, table)
+                else:
+                    ok = await asyncio.to_thread(self.db.save_products, records, table)
+            except Exception as e:
+                logger.error(f"Upload of {len(records)} rows to {table} failed: {e}")
+                ok = False
+        if ok:
+            self.uploaded += len(records)
+            self.uploaded_total.inc(len(records))
+        else:
+            # Don't hammer a database that just failed; the spool is retried later
+            self._next_retry = time.monotonic() + self.retry_interval
+        return ok
+
+    # --- Spool ---
+
+    def _spool_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.spool_dir, "*.jsonl")))
+
+    def _spool(self, table: str, records: List[dict]):
+        self._spool_seq += 1
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{self._spool_seq:06d}.jsonl"
+        path = os.path.join(self.spool_dir, name)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(json.dumps({"table": table}) + "\n")
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+            os.replace(path + ".tmp", path)
+            self.spooled += len(records)
+            self.spooled_total.inc(len(records))
+        except Exception as e:
+            logger.error(f"Could not spool {len(records)} rows for {table} ({path}): {e}")
+
+    async def _drain_spool(self, force: bool = False):
+        """Re-uploads spooled batches oldest first; stops at the first failure."""
+        if not force and time.monotonic() < self._next_retry:
+            return
+        for path in self._spool_files():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    table = json.loads(f.readline())["table"]
+                    records = [json.loads(line) for line in f if line.strip()]
+            except Exception as e:
+                logger.error(f"Unreadable spool file {path}, leaving it for inspection: {e}")
+                os.rename(path, path + ".bad")
+                continue
+            if not await self._upload(table, records):
+                return
+            os.remove(path)
+            logger.info(f"Uploaded {len(records)} spooled rows to {table} from {os.path.basename(path)}")
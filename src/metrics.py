@@ -0,0 +1,326 @@
+import asyncio
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger("Metrics")
+
+# Latency buckets in seconds (upper bounds), roughly Prometheus' defaults
+# stretched for page loads and whole-category scrapes.
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+class Histogram:
+    """
+    Latency histogram with cumulative buckets plus the raw samples, so it can
+    report both a bucketed distribution and exact percentiles. Long-lived
+    registry histograms pass `keep_samples=False` and only keep buckets.
+    """
+
+    def __init__(self, buckets: Optional[List[float]] = None, keep_samples: bool = True):
+        self.buckets = sorted(buckets or DEFAULT_BUCKETS)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.samples: List[float] = []
+        self.keep_samples = keep_samples
+        self.sum = 0.0
+        self.total = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        if self.keep_samples:
+            self.samples.append(value)
+        self.sum += value
+        self.total += 1
+
+    def merge(self, other: "Histogram"):
+        for v in other.samples:
+            self.observe(v)
+
+    @property
+    def count(self) -> int:
+        return self.total
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile, `q` in [0, 100]."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+    def summary(self) -> dict:
+        if not self.total:
+            return {"count": 0}
+        if not self.samples:
+            return {"count": self.count, "sum_sec": round(self.sum, 4),
+                    "mean_sec": round(self.sum / self.count, 4), "buckets": self.bucket_counts()}
+        return {
+            "count": self.count,
+            "sum_sec": round(self.sum, 4),
+            "mean_sec": round(self.sum / self.count, 4),
+            "p50_sec": round(self.percentile(50), 4),
+            "p90_sec": round(self.percentile(90), 4),
+            "p99_sec": round(self.percentile(99), 4),
+            "max_sec": round(max(self.samples), 4),
+            "buckets": self.bucket_counts(),
+        }
+
+    def bucket_counts(self) -> Dict[str, int]:
+        """Cumulative counts per upper bound, Prometheus style."""
+        out = {}
+        running = 0
+        for bound, n in zip(self.buckets + [float("inf")], self.counts):
+            running += n
+            out["+Inf" if bound == float("inf") else str(bound)] = running
+        return out
+
+    def to_dict(self) -> dict:
+        return {"buckets": self.buckets, "samples": self.samples}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        h = cls(data.get("buckets"))
+        for v in data.get("samples", []):
+            h.observe(v)
+        return h
+
+
+class Counter:
+    """Monotonic counter. Increments are cheap enough for per-response use."""
+
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+class Gauge:
+    """Point-in-time value, either set explicitly or read from `fn` at scrape time (e.g. a queue's qsize)."""
+
+    def __init__(self, name: str, help_text: str = "", fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        if self.fn is not None:
+            try:
+                return float(self.fn())
+            except Exception:
+                return float("nan")
+        return self._value
+
+class MetricsRegistry:
+    """
+    In-process registry of counters, gauges and histograms for a running
+    scrape job. Rendered in the Prometheus text format by `MetricsServer`
+    and summarised periodically by `snapshot_task`.
+
+    Worker processes have their own registry: they send `take_updates()`
+    to the parent, which folds them in with `merge_worker()` and renders
+    them as `{worker="..."}` series next to its own.
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, Counter] = {}
+        self.gauges: Dict[str, Gauge] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.help: Dict[str, str] = {}
+        # Merged from worker processes: {metric name: {worker: value}}
+        self.worker_counters: Dict[str, Dict[str, float]] = {}
+        self.worker_gauges: Dict[str, Dict[str, float]] = {}
+        # Counter values already handed out by take_updates()
+        self._reported: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        c = self.counters.get(name)
+        if c is None:
+            with self._lock:
+                c = self.counters.setdefault(name, Counter(name, help_text))
+        return c
+
+    def gauge(self, name: str, help_text: str = "", fn: Optional[Callable[[], float]] = None) -> Gauge:
+        with self._lock:
+            g = self.gauges.get(name)
+            if g is None:
+                g = self.gauges[name] = Gauge(name, help_text, fn)
+            elif fn is not None:
+                g.fn = fn
+        return g
+
+    def histogram(self, name: str, help_text: str = "", buckets: Optional[List[float]] = None) -> Histogram:
+        h = self.histograms.get(name)
+        if h is None:
+            with self._lock:
+                if name not in self.histograms:
+                    self.histograms[name] = Histogram(buckets, keep_samples=False)
+                    self.help[name] = help_text
+                h = self.histograms[name]
+        return h
+
+    def take_updates(self) -> dict:
+        """
+        Counter increments since the last call and current gauge values, as
+        {"counters": {name: [help, delta]}, "gauges": {name: [help, value]}}
+        (empty when nothing changed). Sent by worker processes to the parent.
+        """
+        with self._lock:
+            counters = list(self.counters.values())
+            gauges = list(self.gauges.values())
+        updates = {}
+        for c in counters:
+            value = c.value
+            delta = value - self._reported.get(c.name, 0.0)
+            if delta:
+                self._reported[c.name] = value
+                updates.setdefault("counters", {})[c.name] = [c.help, delta]
+        for g in gauges:
+            value = g.value
+            if not math.isnan(value):
+                updates.setdefault("gauges", {})[g.name] = [g.help, value]
+        return updates
+
+    def merge_worker(self, worker: str, updates: dict):
+        """Folds a worker's `take_updates()` into its `worker` series (counters add up, gauges are replaced)."""
+        with self._lock:
+            for name, (help_text, delta) in (updates.get("counters") or {}).items():
+                series = self.worker_counters.setdefault(name, {})
+                series[worker] = series.get(worker, 0.0) + delta
+                if help_text:
+                    self.help.setdefault(name, help_text)
+            for name, (help_text, value) in (updates.get("gauges") or {}).items():
+                self.worker_gauges.setdefault(name, {})[worker] = value
+                if help_text:
+                    self.help.setdefault(name, help_text)
+
+    def snapshot(self) -> dict:
+        """Counters summed over this process and its workers; gauges and per-worker values as reported."""
+        with self._lock:
+            counters = list(self.counters.values())
+            gauges = list(self.gauges.values())
+            histograms = list(self.histograms.items())
+            worker_counters = {name: dict(series) for name, series in self.worker_counters.items()}
+            worker_gauges = {name: dict(series) for name, series in self.worker_gauges.items()}
+        totals = {c.name: c.value for c in counters}
+        for name, series in worker_counters.items():
+            totals[name] = totals.get(name, 0.0) + sum(series.values())
+        snap = {
+            "counters": totals,
+            "gauges": {g.name: g.value for g in gauges},
+            "histograms": {name: h.summary() for name, h in histograms},
+        }
+        if worker_counters or worker_gauges:
+            snap["workers"] = {"counters": worker_counters, "gauges": worker_gauges}
+        return snap
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            counters = {c.name: c for c in self.counters.values()}
+            gauges = {g.name: g for g in self.gauges.values()}
+            histograms = list(self.histograms.items())
+            worker_counters = {name: dict(series) for name, series in self.worker_counters.items()}
+            worker_gauges = {name: dict(series) for name, series in self.worker_gauges.items()}
+
+        lines = []
+        for kind, own, workers in (("counter", counters, worker_counters), ("gauge", gauges, worker_gauges)):
+            for name in list(own) + [n for n in workers if n not in own]:
+                help_text = own[name].help if name in own and own[name].help else self.help.get(name)
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if name in own:
+                    lines.append(f"{name} {own[name].value}")
+                for worker, value in sorted(workers.get(name, {}).items()):
+                    lines.append(f'{name}{{worker="{worker}"}} {value}')
+        for name, h in histograms:
+            if self.help.get(name):
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for bound, count in h.bucket_counts().items():
+                lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{name}_sum {h.sum}")
+            lines.append(f"{name}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry used by the scrapers and runners
+registry = MetricsRegistry()
+
+class MetricsServer:
+    """Serves `registry` on http://<host>:<port>/metrics from a daemon thread."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1", metrics: MetricsRegistry = registry):
+        metrics_registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = metrics_registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self) -> "MetricsServer":
+        self.thread.start()
+        host, port = self.httpd.server_address[:2]
+        logger.info(f"Metrics endpoint on http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+async def snapshot_task(path: Optional[str], interval: float = 30, metrics: MetricsRegistry = registry,
+                        rate_counter: str = "zepto_products_total"):
+    """
+    Every `interval` seconds, appends a JSON snapshot to `path` (if given) and
+    logs a one-line summary with the products/sec rate since the last tick.
+    Warns when the rate drops to zero, which during a run usually means a stall.
+    """
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    last_value = metrics.counter(rate_counter).value
+    last_time = time.monotonic()
+
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        snap = metrics.snapshot()
+        value = snap["counters"].get(rate_counter, 0)
+        rate = (value - last_value) / (now - last_time) if now > last_time else 0.0
+        last_value, last_time = value, now
+
+        snap["timestamp"] = time.time()
+        snap["rates"] = {f"{rate_counter}_per_sec": round(rate, 2)}
+        if path:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snap, default=str) + "\n")
+
+        gauges = ", ".join(f"{k}={v:g}" for k, v in snap["gauges"].items())
+        if rate == 0 and value > 0:
+            logger.warning(f"📈 No products in the last {interval:.0f}s (total {value:.0f}; {gauges}). Possible stall.")
+        else:
+            logger.info(f"📈 {rate:.1f} products/s (total {value:.0f}; {gauges})")
@@ -0,0 +1,196 @@
+"""
+Typed normalization of scraped products, shared by the writer, the uploader
+and the dashboard.
+
+Scrapers emit rows in the CSV schema ("Item Name", "Mrp" as a rupee string
+or "N/A", ...). `normalize_frame` turns a whole frame of those (or of rows
+read back from the database) into typed columns in one pass:
+
+- column names follow the database (`name`, `pack_size`, `eta`, `scraped_at`),
+- money is in paise as nullable ints (`mrp_paise`, `price_paise`, and the
+  `prev_*` columns of change logs), so comparisons never hit float noise,
+- `inventory` is a nullable int (unknown stays <NA>, not 0),
+- `scraped_at` / `created_at` are datetimes,
+- everything else is a text (object) column with blanks as None.
+
+`to_db_records` is the inverse for uploads (paise back to rupees, NA to None).
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# CSV header -> database column. Columns not listed keep their name.
+CSV_TO_COLUMN: Dict[str, str] = {
+    "Item Name": "name",
+    "Brand": "brand",
+    "Mrp": "mrp",
+    "Price": "price",
+    "Weight/pack_size": "pack_size",
+    "Category": "category",
+    "Subcategory": "subcategory",
+    "Delivery ETA": "eta",
+    "timestamp": "scraped_at",
+}
+COLUMN_TO_CSV: Dict[str, str] = {v: k for k, v in CSV_TO_COLUMN.items()}
+
+# Rupee amounts, stored as `<name>_paise`
+MONEY_COLUMNS = ["mrp", "price", "prev_mrp", "prev_price"]
+INT_COLUMNS = ["inventory", "prev_inventory"]
+TIME_COLUMNS = ["scraped_at", "created_at"]
+# Text columns where "N/A" means unknown rather than a literal value
+NULLABLE_TEXT_COLUMNS = ["shelf_life_in_hours"]
+
+# Text values that mean "unknown" in numeric columns
+MISSING_VALUES = ["", "N/A", "None", "nan"]
+
+def paise_column(name: str) -> str:
+    return f"{name}_paise"
+
+def _as_object(series: pd.Series) -> pd.Series:
+    # Numeric parsing of pandas' "str" columns pays for NA checks per call; object arrays don't
+    if pd.api.types.is_string_dtype(series) and series.dtype != object:
+        return pd.Series(series.to_numpy(dtype=object), index=series.index)
+    return series
+
+def _money_to_paise(series: pd.Series) -> pd.Series:
+    # "N/A" and blanks coerce to NaN
+    rupees = pd.to_numeric(_as_object(series), errors="coerce")
+    return (rupees * 100).round().astype("Int64")
+
+def _to_int(series: pd.Series) -> pd.Series:
+    # "10+" (availability pages) counts as its lower bound
+    if series.dtype == object or pd.api.types.is_string_dtype(series):
+        series = _as_object(series).str.rstrip("+")
+    return pd.to_numeric(series, errors="coerce").round().astype("Int64")
+
+def _to_text(series: pd.Series) -> pd.Series:
+    # Plain object columns with None: pandas' "string" dtype is several times slower to NA-check
+    values = series.to_numpy(dtype=object)
+    # None/NaN/"" (NaN is the only value not equal to itself)
+    missing = (values == None) | (values != values) | (values == "")  # noqa: E711
+    return pd.Series(np.where(missing, None, values), index=series.index, dtype=object)
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Raw CSV-schema (or database) frame -> typed frame. Unknown columns become text."""
+    df = df.rename(columns=CSV_TO_COLUMN)
+    out = {}
+    for col in df.columns:
+        if col in MONEY_COLUMNS:
+            out[paise_column(col)] = _money_to_paise(df[col])
+        elif col in INT_COLUMNS:
+            out[col] = _to_int(df[col])
+        elif col in TIME_COLUMNS:
+            # ISO8601, not inferred from the first value: Supabase mixes values with and without fractional seconds
+            out[col] = pd.to_datetime(df[col].replace(MISSING_VALUES, None), errors="coerce", format="ISO8601")
+        elif col in NULLABLE_TEXT_COLUMNS:
+            text = _to_text(df[col])
+            out[col] = text.where(text != "N/A", None)
+        else:
+            out[col] = _to_text(df[col])
+    return pd.DataFrame(out, index=df.index)
+
+def normalize_rows(rows: Iterable[dict]) -> pd.DataFrame:
+    return normalize_frame(pd.DataFrame(list(rows)))
+
+def batch_to_frame(batch) -> pd.DataFrame:
+    """
+    Typed frame straight from a `ProductBatch`: its records already hold
+    numbers, so only the header constants are broadcast.
+    """
+    header = batch.header
+    records = batch.records
+    frame = pd.DataFrame({
+        "category": header.category,
+        "subcategory": header.subcategory,
+        "name": [r.name for r in records],
+        "brand": [r.brand for r in records],
+        "mrp_paise": pd.array([None if r.mrp is None else round(r.mrp * 100) for r in records], dtype="Int64"),
+        "price_paise": pd.array([None if r.price is None else round(r.price * 100) for r in records], dtype="Int64"),
+        "pack_size": [r.pack_size for r in records],
+        "eta": header.delivery_eta,
+        "inventory": pd.array([r.inventory for r in records], dtype="Int64"),
+        "store_id": [r.store_id or header.store_id for r in records],
+        "base_product_id": [r.base_product_id for r in records],
+        "shelf_life_in_hours": [None if r.shelf_life is None else str(r.shelf_life) for r in records],
+        "scraped_at": pd.to_datetime(header.timestamp),
+        "pincode_input": header.pincode_input,
+        "clicked_label": header.clicked_label,
+    }, index=pd.RangeIndex(len(records)))
+    frame["availability"] = (frame["inventory"].fillna(0) > 0).map({True: "In Stock", False: "Out of Stock"})
+    for col in ("category", "subcategory", "name", "brand", "pack_size", "eta", "availability", "store_id",
+                "base_product_id", "shelf_life_in_hours", "pincode_input", "clicked_label"):
+        frame[col] = _to_text(frame[col])
+    return frame
+
+def with_rupees(frame: pd.DataFrame) -> pd.DataFrame:
+    """Adds float rupee columns (`mrp`, `price`, ...) next to the paise ones, for display."""
+    frame = frame.copy()
+    for col in MONEY_COLUMNS:
+        if paise_column(col) in frame.columns:
+            frame[col] = frame[paise_column(col)].astype("Float64") / 100
+    return frame
+
+def _column_values(series: pd.Series) -> list:
+    """Column -> list of plain Python values with None for NA."""
+    if series.dtype == object:
+        return series.tolist()  # text columns already hold None
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def _iso_values(series: pd.Series) -> list:
+    # A file holds few distinct scrape times: format each once, then fan out
+    codes, uniques = pd.factorize(series)
+    formatted = [ts.isoformat() for ts in uniques]
+    return [formatted[c] if c >= 0 else None for c in codes]
+
+def to_db_columns(frame: pd.DataFrame, columns: Optional[List[str]] = None) -> Tuple[List[str], List[list]]:
+    """Typed frame -> (database column names, per-column lists of JSON-ready values)."""
+    names, values = [], []
+    for col in frame.columns:
+        series = frame[col]
+        if col.endswith("_paise") and col[:-len("_paise")] in MONEY_COLUMNS:
+            names.append(col[:-len("_paise")])
+            values.append(_column_values(series.astype("Float64") / 100))
+        elif col in TIME_COLUMNS:
+            names.append(col)
+            values.append(_iso_values(series))
+        else:
+            names.append(col)
+            values.append(_column_values(series))
+    if columns is not None:
+        keep = [i for i, name in enumerate(names) if name in columns]
+        names, values = [names[i] for i in keep], [values[i] for i in keep]
+    return names, values
+
+def to_db_records(frame: pd.DataFrame, columns: Optional[List[str]] = None) -> List[dict]:
+    """Typed frame -> JSON-ready dicts for the database (rupees, ISO timestamps, None for NA)."""
+    names, values = to_db_columns(frame, columns)
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+# Rows per chunk when reading files; bounds memory regardless of file size
+DEFAULT_CHUNK_ROWS = 50_000
+
+def read_frames(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Normalized frames of at most `chunk_rows` rows from a CSV or Parquet file.
+    CSV cells are read as text (blanks stay ""), so one odd value only nulls
+    that cell instead of failing the chunk. Parquet needs pyarrow.
+    """
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Reading Parquet needs pyarrow (pip install pyarrow)")
+        for record_batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield normalize_frame(record_batch.to_pandas())
+        return
+
+    for chunk in pd.read_csv(path, dtype=object, keep_default_na=False, encoding="utf-8", chunksize=chunk_rows):
+        yield normalize_frame(chunk)
+
+def iter_db_batches(path: str, batch_size: int = 100, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[List[dict]]:
+    """Upload-ready lists of at most `batch_size` records from a CSV/Parquet file."""
+    for frame in read_frames(path, chunk_rows):
+        records = to_db_records(frame)
+        for i in range(0, len(records), batch_size):
+            yield records[i:i + batch_size]
@@ -27,3 +27,43 @@ alter table public.zepto_assortment enable row level security;
 -- Create policy to allow all actions for now (or customize as needed)
 create policy "Enable all access for all users" on public.zepto_assortment
 for all using (true) with check (true);
+
+-- Change log between runs (see src/change_detection.py).
+-- Incremental runs upload only these rows; full snapshots go to zepto_assortment.
+create table public.zepto_assortment_changes (
+  id bigint generated by default as identity primary key,
+  created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+  scraped_at timestamp with time zone,
+  change_type text not null,
+  name text,
+  brand text,
+  mrp numeric,
+  price numeric,
+  prev_mrp numeric,
+  prev_price numeric,
+  pack_size text,
+  category text,
+  subcategory text,
+  availability text,
+  prev_availability text,
+  inventory integer,
+  prev_inventory integer,
+  store_id text,
+  base_product_id text,
+  shelf_life_in_hours text,
+  eta text,
+  pincode_input text,
+  clicked_label text
+);
+
+alter table public.zepto_assortment_changes enable row level security;
+
+create policy "Enable all access for all users" on public.zepto_assortment_changes
+for all using (true) with check (true);
+
+-- Natural key of an observation; the COPY loader (database.Database.copy_rows)
+-- merges staged rows against it so reloading a file does not duplicate rows.
+create index zepto_assortment_observation_idx
+  on public.zepto_assortment (scraped_at, pincode_input, store_id, base_product_id, category, subcategory);
+create index zepto_assortment_changes_observation_idx
+  on public.zepto_assortment_changes (scraped_at, pincode_input, store_id, base_product_id, category, subcategory);
@@ -3,24 +3,40 @@ from playwright.async_api import async_playwright
 from abc import ABC, abstractmethod
 import logging
 import random
+from typing import Tuple
+from .browser_pool import launch_browser, new_stealth_context
+from .replay import ResponseStore
+from tracing import traced
+from metrics import registry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class BaseScraper(ABC):
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, record_dir=None, replay_dir=None, browser_pool=None):
         self.headless = headless
+        # Shared BrowserPool to take a warm context from (otherwise start() launches its own browser)
+        self.browser_pool = browser_pool
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
+        # Offline fixtures: record every response of the run, or serve a previous recording
+        self.record_dir = record_dir
+        self.replay_dir = replay_dir
+        self.response_store = None
+        self.starts = 0
+        # Multiplier for human-like delays (0 disables them, e.g. for replay benchmarks)
+        self.delay_scale = 1.0
 
+    @traced("BaseScraper.human_delay")
     async def human_delay(self, min_seconds=1.0, max_seconds=3.0):
         """Random delay to simulate human reaction time."""
-        delay = random.uniform(min_seconds, max_seconds)
+        delay = random.uniform(min_seconds, max_seconds) * self.delay_scale
         # logger.debug(f"Sleeping for {delay:.2f}s")
         await asyncio.sleep(delay)
 
+    @traced("BaseScraper.human_scroll")
     async def human_scroll(self):
         """Scrolls down and back up slightly to trigger lazy loading."""
         try:
@@ -35,65 +51,85 @@ class BaseScraper(ABC):
         except:
             pass
             
+    @traced("BaseScraper.scroll_until_exhausted")
+    async def scroll_until_exhausted(self, count_fn, max_scrolls: int = 30, idle_rounds: int = 2, settle_timeout: int = 5000) -> Tuple[int, bool]:
+        """
+        Scrolls to the bottom repeatedly until `count_fn()` stops growing for
+        `idle_rounds` consecutive scrolls (infinite-scroll lists are exhausted)
+        or `max_scrolls` is hit. Returns (scrolls performed, whether the list
+        went idle) — False means it stopped at `max_scrolls` or on an error,
+        so the list may not be complete.
+        """
+        last_count = count_fn()
+        idle = 0
+        scrolls = 0
+        while scrolls < max_scrolls and idle < idle_rounds:
+            try:
+                await self.page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                scrolls += 1
+                try:
+                    await self.page.wait_for_load_state("networkidle", timeout=settle_timeout)
+                except:
+                    pass
+                await self.human_delay(0.3, 0.8)
+            except Exception as e:
+                logger.warning(f"Scroll failed: {e}")
+                break
+
+            count = count_fn()
+            idle = idle + 1 if count <= last_count else 0
+            last_count = count
+        return scrolls, idle >= idle_rounds
+
+    @traced("BaseScraper.human_type")
     async def human_type(self, selector: str, text: str):
         """Types text with random delays between keystrokes."""
         await self.page.focus(selector)
         for char in text:
             await self.page.keyboard.type(char)
             # Random typing speed: 50ms to 200ms usually
-            await asyncio.sleep(random.uniform(0.05, 0.2))
+            await asyncio.sleep(random.uniform(0.05, 0.2) * self.delay_scale)
         await self.human_delay(0.5, 1.0)
 
+    @traced("BaseScraper.start")
     async def start(self):
-        self.playwright = await async_playwright().start()
-        
-        # Try to launch system edge, then chrome, then bundled chromium
-        browsers_to_try = [
-            {'channel': 'msedge'},
-            {'channel': 'chrome'},
-            {}, # Default bundled as fallback
-        ]
-        
-        # Anti-detection arguments
-        stealth_args = [
-            '--disable-blink-features=AutomationControlled',
-            '--disable-infobars',
-            '--no-sandbox',
-            '--disable-dev-shm-usage',
-            '--disable-extensions',
-            '--disable-remote-fonts',
-            '--disable-gpu' # Often helpful in headless
-        ]
+        if self.starts:
+            registry.counter("zepto_browser_restarts_total", "Browsers relaunched by an existing scraper").inc()
+        self.starts += 1
+        registry.counter("zepto_browser_starts_total").inc()
+        if self.browser_pool:
+            # Warm context from the shared browser: stealth script applied, first page open
+            self.context = await self.browser_pool.acquire()
+            self.browser = self.browser_pool.browser
+        else:
+            self.playwright = await async_playwright().start()
+            self.browser = await launch_browser(self.playwright, self.headless)
+            self.context = await new_stealth_context(self.browser)
 
-        for browser_kwargs in browsers_to_try:
-            # Merge stealth args
-            browser_kwargs['args'] = browser_kwargs.get('args', []) + stealth_args
-            
-            try:
-                self.browser = await self.playwright.chromium.launch(headless=self.headless, **browser_kwargs)
-                logger.info(f"Launched browser with kwargs: {browser_kwargs}")
-                break
-            except Exception as e:
-                logger.warning(f"Failed to launch browser with {browser_kwargs}: {e}")
-        
-        if not self.browser:
-            raise Exception("Could not launch any browser (Chromium, Chrome, or Edge)")
-
-        self.context = await self.browser.new_context(
-             viewport={'width': 1920, 'height': 1080},
-             user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
-        )
-        
-        # KEY STEALTH SCRIPT: Remove navigator.webdriver property
-        await self.context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-        """)
+        if self.replay_dir:
+            self.response_store = ResponseStore(self.replay_dir)
+            await self.context.route("**/*", self.response_store.fulfill_route)
+            logger.info(f"Replaying {len(self.response_store.index)} recorded requests from {self.replay_dir}")
+        elif self.record_dir:
+            self.response_store = ResponseStore(self.record_dir)
+            self.context.on("response", self.response_store.record_response)
+            logger.info(f"Recording responses to {self.record_dir}")
         
-        self.page = await self.context.new_page()
+        self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
 
+    @traced("BaseScraper.stop")
     async def stop(self):
+        if self.record_dir and self.response_store and not self.replay_dir:
+            await self.response_store.flush()
+            self.response_store.save()
+        elif self.replay_dir and self.response_store:
+            logger.info(f"Replay served {self.response_store.hits} responses, {self.response_store.misses} unrecorded requests aborted")
+        if self.browser_pool:
+            # The browser belongs to the pool; only this scraper's context goes
+            if self.context:
+                await self.browser_pool.release(self.context)
+            self.context = self.page = None
+            return
         if self.context:
             await self.context.close()
         if self.browser:
@@ -0,0 +1,218 @@
+"""
+Browser launch and warm browser contexts.
+
+`launch_browser` remembers which channel (Edge, Chrome or the bundled
+Chromium) launched on this host, in memory and in `ZEPTO_BROWSER_CACHE`
+(default data/state/browser_channel.json), and tries it first next time
+instead of failing through the channels that aren't installed.
+`ZEPTO_BROWSER_CHANNEL` (msedge, chrome or chromium) skips probing entirely.
+
+`BrowserPool` keeps one browser and a few ready contexts (stealth script
+applied, first page open) so scrapers handed one start immediately:
+
+    pool = await BrowserPool(size=4, headless=True).start()   # 4 contexts warmed at once
+    scraper = ZeptoScraper(headless=True, browser_pool=pool)
+    await scraper.start()   # takes a warm context
+    await scraper.stop()    # closes it; the pool opens a fresh one
+    await pool.close()
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import List, Optional
+
+from playwright.async_api import async_playwright
+
+from metrics import registry
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+BROWSER_CACHE_FILE = os.environ.get(
+    "ZEPTO_BROWSER_CACHE",
+    os.path.join(os.path.dirname(__file__), "..", "..", "data", "state", "browser_channel.json"),
+)
+BROWSER_CHANNEL = os.environ.get("ZEPTO_BROWSER_CHANNEL")
+
+# Try to launch system edge, then chrome, then bundled chromium ("chromium" = no channel)
+CHANNELS = ["msedge", "chrome", "chromium"]
+
+# Anti-detection arguments
+STEALTH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-infobars',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-extensions',
+    '--disable-remote-fonts',
+    '--disable-gpu' # Often helpful in headless
+]
+
+CONTEXT_OPTIONS = {
+    "viewport": {'width': 1920, 'height': 1080},
+    "user_agent": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+}
+
+# KEY STEALTH SCRIPT: Remove navigator.webdriver property
+STEALTH_INIT_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+"""
+
+# Channel that launched last in this process (saves re-reading the cache file on restarts)
+_known_channel: Optional[str] = None
+
+def load_cached_channel(path: Optional[str] = None) -> Optional[str]:
+    path = path or BROWSER_CACHE_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            channel = json.load(f).get("channel")
+        return channel if channel in CHANNELS else None
+    except Exception:
+        return None
+
+def save_cached_channel(channel: str, path: Optional[str] = None):
+    path = path or BROWSER_CACHE_FILE
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"channel": channel}, f)
+        os.replace(path + ".tmp", path)
+    except Exception as e:
+        logger.warning(f"Could not save browser channel to {path}: {e}")
+
+def channel_order() -> List[str]:
+    """Channels to try, the one known to work on this host first."""
+    if BROWSER_CHANNEL:
+        return [BROWSER_CHANNEL]
+    first = _known_channel or load_cached_channel()
+    return ([first] if first else []) + [c for c in CHANNELS if c != first]
+
+async def launch_browser(playwright, headless: bool):
+    """Launches Chromium-family browser with the stealth args, trying the cached channel first."""
+    global _known_channel
+    with span("browser.launch") as s:
+        for channel in channel_order():
+            kwargs = {'args': list(STEALTH_ARGS)}
+            if channel != "chromium":
+                kwargs['channel'] = channel
+            try:
+                browser = await playwright.chromium.launch(headless=headless, **kwargs)
+            except Exception as e:
+                registry.counter("zepto_browser_launch_failures_total", "Browser channels that failed to launch").inc()
+                logger.warning(f"Failed to launch browser with {kwargs}: {e}")
+                continue
+            logger.info(f"Launched browser with kwargs: {kwargs}")
+            s.set_attribute("channel", channel)
+            if channel != _known_channel:
+                _known_channel = channel
+                if not BROWSER_CHANNEL and channel != load_cached_channel():
+                    save_cached_channel(channel)
+            return browser
+    raise Exception("Could not launch any browser (Chromium, Chrome, or Edge)")
+
+async def new_stealth_context(browser):
+    """A context with the scraper's viewport, user agent and stealth script, and its first page open."""
+    context = await browser.new_context(**CONTEXT_OPTIONS)
+    await context.add_init_script(STEALTH_INIT_SCRIPT)
+    await context.new_page()
+    return context
+
+class BrowserPool:
+    """
+    One browser with `size` contexts warmed in parallel at start, e.g. one
+    per worker. `acquire()` hands out a warm context (or opens one if none is
+    ready) and tops the pool back up to `spare` ready contexts in the
+    background, for restarts. `release()` closes a used context, since
+    cookies and location state are not meant to carry over between scrapers.
+    """
+
+    def __init__(self, size: int = 4, headless: bool = True, spare: int = 1):
+        self.size = size
+        self.spare = spare
+        self.headless = headless
+        self.playwright = None
+        self.browser = None
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._warming = 0
+        self._refills = set()
+        self._relaunch_lock = asyncio.Lock()
+
+    async def start(self) -> "BrowserPool":
+        self.playwright = await async_playwright().start()
+        self.browser = await launch_browser(self.playwright, self.headless)
+        with span("browser_pool.warm", contexts=self.size):
+            await asyncio.gather(*(self._warm_one() for _ in range(self.size)))
+        logger.info(f"Browser pool ready with {self._ready.qsize()} contexts")
+        return self
+
+    @property
+    def ready(self) -> int:
+        return self._ready.qsize()
+
+    async def acquire(self):
+        """A ready context (stealth script applied, one page open)."""
+        async with self._relaunch_lock:
+            if not self.browser.is_connected():
+                await self._relaunch()
+        context = None
+        while not self._ready.empty():
+            candidate = self._ready.get_nowait()
+            if candidate.browser and candidate.browser.is_connected():
+                context = candidate
+                break
+        if context is None:
+            registry.counter("zepto_browser_pool_misses_total", "Contexts opened on demand because none was warm").inc()
+            context = await new_stealth_context(self.browser)
+        self._refill()
+        return context
+
+    async def release(self, context):
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"Closing pooled context failed: {e}")
+        self._refill()
+
+    async def close(self):
+        for task in list(self._refills):
+            task.cancel()
+        while not self._ready.empty():
+            try:
+                await self._ready.get_nowait().close()
+            except Exception:
+                pass
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+    def _refill(self):
+        missing = self.spare - self._ready.qsize() - self._warming
+        for _ in range(max(0, missing)):
+            task = asyncio.create_task(self._warm_one())
+            self._refills.add(task)
+            task.add_done_callback(self._refills.discard)
+
+    async def _warm_one(self):
+        self._warming += 1
+        try:
+            self._ready.put_nowait(await new_stealth_context(self.browser))
+        except Exception as e:
+            logger.warning(f"Could not warm a browser context: {e}")
+        finally:
+            self._warming -= 1
+
+    async def _relaunch(self):
+        """The browser crashed or was closed: start a new one (warm contexts died with it)."""
+        registry.counter("zepto_browser_restarts_total", "Browsers relaunched by an existing scraper").inc()
+        logger.warning("Pooled browser disconnected, relaunching")
+        while not self._ready.empty():
+            self._ready.get_nowait()
+        try:
+            await self.browser.close()
+        except Exception:
+            pass
+        self.browser = await launch_browser(self.playwright, self.headless)
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, TypedDict
+
+logger = logging.getLogger(__name__)
+
+# /cn/<category-slug>/<subcategory-slug>/cid/<cid>/scid/<scid>
+CATEGORY_URL_RE = re.compile(r'/cn/([^/?#]+)/([^/?#]+)/cid/([^/?#]+)(?:/scid/([^/?#]+))?')
+
+# Runs in the page: a cheap rolling hash over the category links so the
+# href list itself only crosses the wire when something changed.
+FINGERPRINT_JS = """
+    () => {
+        const hrefs = Array.from(document.querySelectorAll('a'))
+            .map(a => a.href)
+            .filter(href => href.includes('/cn/') && href.includes('/cid/'));
+        const unique = Array.from(new Set(hrefs)).sort();
+        let h = 0;
+        for (const s of unique) {
+            for (let i = 0; i < s.length; i++) {
+                h = (Math.imul(31, h) + s.charCodeAt(i)) | 0;
+            }
+        }
+        return unique.length + ':' + (h >>> 0).toString(16);
+    }
+"""
+
+CATEGORY_HREFS_JS = """
+    () => {
+        return Array.from(document.querySelectorAll('a'))
+            .map(a => a.href)
+            .filter(href => href.includes('/cn/') && href.includes('/cid/'))
+    }
+"""
+
+class CategoryEntry(TypedDict):
+    id: str             # stable key: "<cid>/<scid>" (or "<cid>" for top-level links)
+    order: int          # stable position, kept across refreshes
+    url: str
+    cn_slug: str
+    sub_slug: str
+    cid: str
+    scid: Optional[str]
+    parent: Optional[str]  # cid of the parent category for subcategory links
+
+def parse_category_url(url: str) -> Optional[dict]:
+    match = CATEGORY_URL_RE.search(url)
+    if not match:
+        return None
+    cn_slug, sub_slug, cid, scid = match.groups()
+    return {
+        "id": f"{cid}/{scid}" if scid else cid,
+        "url": url,
+        "cn_slug": cn_slug,
+        "sub_slug": sub_slug,
+        "cid": cid,
+        "scid": scid,
+        "parent": cid if scid else None,
+    }
+
+def ordered_unique(hrefs: List[str]) -> List[str]:
+    """De-duplicates while keeping first-seen (page) order."""
+    return list(dict.fromkeys(hrefs))
+
+class CategoryRegistry:
+    """
+    Per-store cache of the category tree discovered on the Zepto home page.
+
+    A store's entry is reused while it is younger than `ttl_hours` and the
+    home page fingerprint is unchanged. On refresh, known categories keep
+    their `order`/`id`; new ones are appended and vanished ones dropped, so
+    downstream batching sees a stable sequence.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_hours: float = 24):
+        self.path = path
+        self.ttl_hours = ttl_hours
+        self.stores: Dict[str, dict] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.stores = json.load(f)
+            except Exception as e:
+                logger.warning(f"Could not read category registry {path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.stores, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def is_valid(self, store_id: str, fingerprint: str, now: Optional[datetime] = None) -> bool:
+        cached = self.stores.get(store_id)
+        if not cached or cached.get("fingerprint") != fingerprint:
+            return False
+        try:
+            fetched_at = datetime.fromisoformat(cached["fetched_at"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        now = now or datetime.now()
+        return (now - fetched_at).total_seconds() < self.ttl_hours * 3600
+
+    def entries(self, store_id: str) -> List[CategoryEntry]:
+        cached = self.stores.get(store_id)
+        if not cached:
+            return []
+        return sorted(cached["categories"], key=lambda c: c["order"])
+
+    def urls(self, store_id: str) -> List[str]:
+        return [c["url"] for c in self.entries(store_id)]
+
+    def update(self, store_id: str, fingerprint: str, hrefs: List[str]) -> List[CategoryEntry]:
+        """Merges freshly discovered `hrefs` into the store's tree, keeping existing order/IDs."""
+        previous = {c["id"]: c for c in self.stores.get(store_id, {}).get("categories", [])}
+        next_order = max((c["order"] for c in previous.values()), default=-1) + 1
+
+        categories = []
+        seen = set()
+        for href in ordered_unique(hrefs):
+            parsed = parse_category_url(href)
+            if not parsed or parsed["id"] in seen:
+                continue
+            seen.add(parsed["id"])
+            if parsed["id"] in previous:
+                parsed["order"] = previous[parsed["id"]]["order"]
+            else:
+                parsed["order"] = next_order
+                next_order += 1
+            categories.append(parsed)
+
+        added = len(seen - set(previous))
+        removed = len(set(previous) - seen)
+        if previous:
+            logger.info(f"Category tree for store {store_id} changed: +{added} / -{removed}")
+
+        self.stores[store_id] = {
+            "fingerprint": fingerprint,
+            "fetched_at": datetime.now().isoformat(),
+            "categories": categories,
+        }
+        return self.entries(store_id)
@@ -0,0 +1,159 @@
+"""
+Regexes and CSS selectors the Zepto scraper extracts with, in one place.
+
+Patterns are compiled once per rules version, not per item. Both sets can be
+overridden without a deploy by a JSON file (`ZEPTO_RULES_FILE`, default
+data/config/zepto_rules.json):
+
+    {
+      "version": "2026-10-19.1",
+      "patterns": {"link_price": "<td>(₹[\\d.]+)</td>",
+                   "eta_text": {"pattern": "(\\d+\\s*mins?)", "flags": ["IGNORECASE"]}},
+      "selectors": {"eta": ["div[data-testid='eta-container']", "span[class*='eta']"]}
+    }
+
+Entries not in the file keep their defaults. The file is re-checked (by
+mtime) at most every `check_interval` seconds via `refresh()`; a file with a
+bad pattern is rejected as a whole and the current rules stay in effect.
+"""
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RULES_FILE = os.environ.get(
+    "ZEPTO_RULES_FILE",
+    os.path.join(os.path.dirname(__file__), "..", "..", "data", "config", "zepto_rules.json"),
+)
+
+DEFAULT_VERSION = "builtin-1"
+
+DEFAULT_PATTERNS: Dict[str, object] = {
+    # Flight (RSC) payloads: JSON with escaped quotes
+    "flight_id": r'\\\"id\\\":\\\"([a-f0-9\-]+)\\\"',
+    "flight_available_quantity": r'\\\"availableQuantity\\\":(\d+)',
+    "flight_shelf_life": r'\\\"shelfLifeInHours\\\":\\\"([^\"]+)\\\"',
+    "flight_packsize": r'\\\"packsize\\\":(\d+)',
+    # Product links in SSR HTML / Flight strings
+    "product_link": r'href=\"(/pn/[^\"]+)\"',
+    "link_name": r'>([^<]+)</a>',
+    "name_index_prefix": r'^\d+\.\s*',
+    "pack_size_in_name": {"pattern": r'(\d+(?:\.\d+)?\s*(?:g|kg|ml|l|litres|pc|pcs|unit|bunch|pack|bunches)\b)',
+                          "flags": ["IGNORECASE"]},
+    "link_price": r'<td>(₹\d+)</td>',
+    # Location metadata in page text
+    "eta_text": {"pattern": r'(\d+\s*mins?)', "flags": ["IGNORECASE"]},
+    "store_id_json": r'\"storeId\":\"([^\"]+)\"',
+    "store_id_loose": {"pattern": r'store_?id\W+([a-zA-Z0-9\-]+)', "flags": ["IGNORECASE"]},
+    # Location metadata in API / RSC responses (quotes may be escaped in Flight rows)
+    "location_store_id": r'\\?"(?:storeId|primaryStoreId)\\?":\s*\\?"([0-9A-Za-z\-]{8,})',
+    "location_eta_minutes": r'\\?"eta(?:InMins|InMinutes|Minutes)?\\?":\s*\\?"?(\d+)',
+    "location_latitude": r'\\?"(?:latitude|lat)\\?":\s*\\?"?(-?\d{1,2}\.\d+)',
+    "location_longitude": r'\\?"(?:longitude|lng|lon)\\?":\s*\\?"?(-?\d{1,3}\.\d+)',
+}
+
+# Each entry is tried in order (or joined into one selector list where noted)
+DEFAULT_SELECTORS: Dict[str, List[str]] = {
+    "location_trigger": ["button[aria-label='Select Location']"],
+    "location_modal_input": ["input[type='text']"],
+    "location_input": [
+        "input[placeholder*='Search a new address']",
+        "input[placeholder*='Search']",
+        "input[type='text']",
+    ],
+    # Joined: any of these means results are showing
+    "location_results_wait": [
+        "div[data-testid='location-search-item']",
+        "[data-testid='prediction-item']",
+        "div[class*='prediction']",
+        "div[class*='search-result']",
+    ],
+    # Joined, then the fallback group if nothing matched
+    "location_results": [
+        "div[data-testid='address-search-item']",
+        "[data-testid='location-search-item']",
+        "[data-testid='prediction-item']",
+    ],
+    "location_results_fallback": ["div[class*='prediction']", "div[class*='search-result']"],
+    "eta": ["div[data-testid='eta-container']", "p[class*='eta']"],
+    "category_link": ["a[href*='/cn/']"],
+    "product_title": ["h1"],
+    "product_price": ["[data-testid='product-price']"],
+    "product_mrp": ["[data-testid='product-mrp']"],
+    "product_out_of_stock": ["text=Out of Stock"],
+    "product_add_button": ["button[aria-label='Add to cart']"],
+    "product_quantity": ["[data-testid='product-quantity']"],
+}
+
+def _compile(spec) -> re.Pattern:
+    if isinstance(spec, str):
+        return re.compile(spec)
+    flags = 0
+    for name in spec.get("flags", []):
+        flags |= getattr(re, name)
+    return re.compile(spec["pattern"], flags)
+
+class ExtractionRules:
+    """
+    Current patterns (`rules.patterns[name]`, compiled) and selectors
+    (`rules.selectors[name]`, lists). Swapped as a whole on reload, so a
+    caller holding `rules.patterns` for a loop sees one consistent version.
+    """
+
+    def __init__(self, path: Optional[str] = RULES_FILE, check_interval: float = 30.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = DEFAULT_VERSION
+        self._default_patterns = {name: _compile(spec) for name, spec in DEFAULT_PATTERNS.items()}
+        self.patterns: Dict[str, re.Pattern] = dict(self._default_patterns)
+        self.selectors: Dict[str, List[str]] = {name: list(sels) for name, sels in DEFAULT_SELECTORS.items()}
+        self._mtime = None
+        self._checked_at = 0.0
+        self.refresh(force=True)
+
+    def css(self, name: str) -> str:
+        """The selectors of `name` joined into one CSS selector list."""
+        return ", ".join(self.selectors[name])
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reloads the rules file if it changed. Returns True when new rules were applied."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            with open(self.path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            patterns = dict(self._default_patterns)
+            patterns.update({name: _compile(spec) for name, spec in config.get("patterns", {}).items()})
+            selectors = {name: list(sels) for name, sels in DEFAULT_SELECTORS.items()}
+            selectors.update({name: list(sels) for name, sels in config.get("selectors", {}).items()})
+        except Exception as e:
+            logger.error(f"Rejected extraction rules {self.path}, keeping version {self.version}: {e}")
+            return False
+
+        self.patterns, self.selectors = patterns, selectors
+        self.version = str(config.get("version", f"file@{int(mtime)}"))
+        logger.info(f"Extraction rules version {self.version} loaded from {self.path}")
+        return True
+
+    def to_dict(self) -> dict:
+        """The active rules in the file format (e.g. to start a config file from)."""
+        def spec(p: re.Pattern):
+            flags = [name for name in ("IGNORECASE", "MULTILINE", "DOTALL") if p.flags & getattr(re, name)]
+            return {"pattern": p.pattern, "flags": flags} if flags else p.pattern
+        return {"version": self.version, "patterns": {n: spec(p) for n, p in self.patterns.items()},
+                "selectors": self.selectors}
+
+# Process-wide rules used by the scraper
+rules = ExtractionRules()
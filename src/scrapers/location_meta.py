@@ -0,0 +1,85 @@
+import re
+from typing import Dict, Optional
+
+from .extraction_rules import rules
+
+# Response bodies larger than this are not location API calls; skip them
+MAX_LOCATION_BODY_BYTES = 2 * 1024 * 1024
+
+# Content types that can carry location metadata (API JSON, RSC/Flight rows)
+LOCATION_CONTENT_TYPES = ("json", "x-component", "text/plain")
+
+# URL fragments of the endpoints that resolve a location to a store (preferred over other responses)
+LOCATION_URL_RE = re.compile(r'location|address|serviceab|store', re.IGNORECASE)
+
+# Runs in the page: everything set_location needs in one evaluate, as a few
+# short strings instead of a full page.content() serialization. The regexes
+# come from the extraction rules (see location_meta_args).
+LOCATION_META_JS = """
+    (args) => {
+        const re = ([source, flags]) => new RegExp(source, flags);
+        const out = {};
+        for (const sel of args.eta) {
+            const el = document.querySelector(sel);
+            const text = el && el.innerText ? el.innerText.trim() : '';
+            if (text) { out.eta = text; break; }
+        }
+        if (!out.eta && document.body) {
+            const m = document.body.innerText.match(re(args.etaText));
+            if (m) out.eta = m[1];
+        }
+        const html = document.documentElement.innerHTML;
+        for (const p of args.storeId) {
+            const m = html.match(re(p));
+            if (m) { out.store_id = m[1]; break; }
+        }
+        const lat = html.match(re(args.latitude));
+        const lng = html.match(re(args.longitude));
+        if (lat && lng) { out.latitude = lat[1]; out.longitude = lng[1]; }
+        return out;
+    }
+"""
+
+def _js_regex(pattern: re.Pattern) -> list:
+    return [pattern.pattern, "i" if pattern.flags & re.IGNORECASE else ""]
+
+def location_meta_args() -> dict:
+    """Argument for LOCATION_META_JS from the current rules."""
+    patterns = rules.patterns
+    return {
+        "eta": rules.selectors["eta"],
+        "etaText": _js_regex(patterns["eta_text"]),
+        "storeId": [_js_regex(patterns[name]) for name in ("location_store_id", "store_id_json", "store_id_loose")],
+        "latitude": _js_regex(patterns["location_latitude"]),
+        "longitude": _js_regex(patterns["location_longitude"]),
+    }
+
+def extract_location_meta(text: str) -> Dict[str, str]:
+    """
+    Store id, ETA and coordinates found in one response body (JSON or RSC
+    rows), as {"store_id", "eta", "latitude", "longitude"} with only the
+    keys that were present.
+    """
+    patterns = rules.patterns
+    meta = {}
+    store_match = patterns["location_store_id"].search(text)
+    if store_match:
+        meta["store_id"] = store_match.group(1)
+    eta_match = patterns["location_eta_minutes"].search(text)
+    if eta_match:
+        meta["eta"] = f"{eta_match.group(1)} mins"
+    lat_match = patterns["location_latitude"].search(text)
+    lng_match = patterns["location_longitude"].search(text)
+    if lat_match and lng_match:
+        meta["latitude"] = lat_match.group(1)
+        meta["longitude"] = lng_match.group(1)
+    return meta
+
+def is_location_candidate(content_type: str, size: Optional[int]) -> bool:
+    ct = content_type.lower()
+    if size and size > MAX_LOCATION_BODY_BYTES:
+        return False
+    return any(t in ct for t in LOCATION_CONTENT_TYPES)
+
+def is_location_url(url: str) -> bool:
+    return bool(LOCATION_URL_RE.search(url.split("?", 1)[0]))
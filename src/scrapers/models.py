@@ -1,36 +1,52 @@
 from typing import TypedDict, Optional, List
 
-class ProductItem(TypedDict):
-    platform: str
+# A product row as the scrapers emit it (CSV schema, see records.PRODUCT_CSV_FIELDS).
+# Prices are rupee strings/floats or "N/A"; `normalize.normalize_frame` types them.
+ProductItem = TypedDict("ProductItem", {
+    "Category": str,
+    "Subcategory": str,
+    "Item Name": str,
+    "Brand": str,
+    "Mrp": object,
+    "Price": object,
+    "Weight/pack_size": str,
+    "Delivery ETA": str,
+    "availability": str,
+    "inventory": object,
+    "store_id": str,
+    "base_product_id": str,
+    "shelf_life_in_hours": object,
+    "timestamp": str,
+    "pincode_input": str,
+    "clicked_label": str,
+})
+
+class NormalizedProduct(TypedDict):
+    """One row of `normalize.normalize_frame` output (database column names)."""
     category: str
     subcategory: str
-    clicked_label: str
     name: str
     brand: str
-    base_product_id: str
-    product_id: str
-    group_id: Optional[str]
-    merchant_type: Optional[str]
-    mrp: float
-    price: float
-    weight: str
-    shelf_life_in_hours: Optional[int]
+    mrp_paise: Optional[int]
+    price_paise: Optional[int]
+    pack_size: Optional[str]
     eta: str
     availability: str
     inventory: Optional[int]
     store_id: str
-    product_url: str
-    image_url: str
-    scraped_at: str
+    base_product_id: str
+    shelf_life_in_hours: Optional[str]
+    scraped_at: object  # pandas Timestamp
     pincode_input: str
+    clicked_label: Optional[str]
 
 class AvailabilityResult(TypedDict):
     input_pincode: str
     url: str
     platform: str
     name: str
-    price: float
-    mrp: float
+    price: Optional[float]
+    mrp: Optional[float]
     availability: str
     seller_details: Optional[str]
     manufacturer_details: Optional[str]
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import re
+from typing import Dict, Optional, TypedDict
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Path segments that vary per request (UUIDs, hex digests, numbers) collapse to "*"
+VARIABLE_SEGMENT_RE = re.compile(r'^(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,}|\d+)$', re.IGNORECASE)
+
+# Content types never worth reading for product data
+ASSET_TYPES = ("image", "font", "css", "javascript")
+
+def url_pattern(url: str) -> str:
+    """`https://host/a/<uuid>/b?x=1` -> `host/a/*/b` (query dropped)."""
+    parts = urlsplit(url)
+    segments = ["*" if VARIABLE_SEGMENT_RE.match(seg) else seg for seg in parts.path.split("/")]
+    return parts.netloc + "/".join(segments)
+
+def is_asset(content_type: str) -> bool:
+    ct = content_type.lower()
+    return any(t in ct for t in ASSET_TYPES)
+
+def content_length(headers: dict) -> int:
+    try:
+        return int(headers.get("content-length", 0))
+    except (TypeError, ValueError):
+        return 0
+
+class CategoryNetworkStats(TypedDict):
+    category_url: str
+    requests: int
+    bytes_transferred: int   # Content-Length, or body size when we read it
+    bodies_read: int
+    bodies_skipped: int      # skipped thanks to the allowlist
+    bytes_read: int
+    bytes_kept: int          # bodies that actually carried product data
+    data_url: Optional[str]  # the response with the most products
+    data_products: int
+    bodies_oversized: int    # over the scraper's max_body_bytes, not read
+    peak_capture_bytes: int  # most body bytes held for parsing at once
+    bodies_throttled: int    # waited for the capture budget before reading
+    bodies_dropped: int      # budget still full after the wait, not read
+
+def new_category_stats(category_url: str) -> CategoryNetworkStats:
+    return {
+        "category_url": category_url,
+        "requests": 0,
+        "bytes_transferred": 0,
+        "bodies_read": 0,
+        "bodies_skipped": 0,
+        "bytes_read": 0,
+        "bytes_kept": 0,
+        "data_url": None,
+        "data_products": 0,
+        "bodies_oversized": 0,
+        "peak_capture_bytes": 0,
+        "bodies_throttled": 0,
+        "bodies_dropped": 0,
+    }
+
+class PayloadAllowlist:
+    """
+    Learns which URL patterns carry product data (`cardData`, product lists).
+
+    A pattern is read while it is still being learned (fewer than
+    `min_observations` bodies seen) and whenever it has produced data before.
+    Patterns seen often without ever carrying data are skipped, except for
+    one read in every `explore_every` so a site change can be picked up again.
+    """
+
+    def __init__(self, path: Optional[str] = None, min_observations: int = 5, explore_every: int = 50):
+        self.path = path
+        self.min_observations = min_observations
+        self.explore_every = explore_every
+        self.patterns: Dict[str, dict] = {}
+        self._skips: Dict[str, int] = {}
+        # Observations since the last take_updates(), for merging across worker processes
+        self._updates: Dict[str, dict] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.patterns = json.load(f)
+                logger.info(f"Loaded {len(self.patterns)} learned URL patterns ({len(self.data_patterns())} data-bearing)")
+            except Exception as e:
+                logger.warning(f"Could not read payload allowlist {path}: {e}")
+
+    def data_patterns(self) -> list:
+        return [p for p, s in self.patterns.items() if s.get("hits", 0) > 0]
+
+    def should_read(self, url: str) -> bool:
+        pattern = url_pattern(url)
+        stats = self.patterns.get(pattern)
+        if not stats or stats.get("seen", 0) < self.min_observations or stats.get("hits", 0) > 0:
+            return True
+        skipped = self._skips.get(pattern, 0) + 1
+        self._skips[pattern] = skipped
+        return skipped % self.explore_every == 0
+
+    def record(self, url: str, had_data: bool):
+        pattern = url_pattern(url)
+        for counts in (self.patterns, self._updates):
+            stats = counts.setdefault(pattern, {"seen": 0, "hits": 0})
+            stats["seen"] += 1
+            if had_data:
+                stats["hits"] += 1
+
+    def take_updates(self) -> Dict[str, dict]:
+        updates, self._updates = self._updates, {}
+        return updates
+
+    def merge(self, updates: Dict[str, dict]):
+        """Adds observations made by another process (see `take_updates`)."""
+        for pattern, counts in updates.items():
+            stats = self.patterns.setdefault(pattern, {"seen": 0, "hits": 0})
+            stats["seen"] += counts.get("seen", 0)
+            stats["hits"] += counts.get("hits", 0)
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.patterns, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
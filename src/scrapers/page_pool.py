@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+class PagePool:
+    """
+    Up to `size` pages of one browser context, each used by one caller at a
+    time. Pages share the context's cookies and storage, so they all see the
+    location set on any of them. Pages are opened on demand; a page that
+    crashed or was closed is dropped and replaced by a fresh one.
+
+    `seed_pages` (e.g. the scraper's main page) count towards `size` and are
+    never closed by the pool.
+    """
+
+    def __init__(self, context, size: int, seed_pages: Optional[List] = None):
+        self.context = context
+        self.size = max(1, size)
+        self.seed_pages = list(seed_pages or [])
+        self.pages = list(self.seed_pages)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for page in self.seed_pages:
+            self._idle.put_nowait(page)
+        self._opening = 0
+
+    async def acquire(self):
+        while True:
+            if self._idle.empty() and len(self.pages) + self._opening < self.size:
+                self._opening += 1
+                try:
+                    page = await self.context.new_page()
+                finally:
+                    self._opening -= 1
+                self.pages.append(page)
+                return page
+            page = await self._idle.get()
+            if page is None:
+                # A page was dropped; there is room to open another
+                continue
+            if not page.is_closed():
+                return page
+            self._discard(page)
+
+    def release(self, page, broken: bool = False):
+        if broken or page.is_closed():
+            self._discard(page)
+            if not page.is_closed() and page not in self.seed_pages:
+                asyncio.create_task(self._close(page))
+            # Wakes a caller waiting in acquire() so it opens a replacement
+            self._idle.put_nowait(None)
+            return
+        self._idle.put_nowait(page)
+
+    @asynccontextmanager
+    async def page(self):
+        """`async with pool.page() as page:` — a page exclusively for the block."""
+        page = await self.acquire()
+        broken = False
+        try:
+            yield page
+        except Exception:
+            broken = page.is_closed()
+            raise
+        finally:
+            self.release(page, broken=broken)
+
+    async def close(self):
+        """Closes the pages the pool opened (seed pages stay open)."""
+        for page in list(self.pages):
+            if page not in self.seed_pages:
+                await self._close(page)
+        self.pages = list(self.seed_pages)
+
+    def _discard(self, page):
+        if page in self.pages:
+            self.pages.remove(page)
+            registry.counter("zepto_page_pool_replaced_total", "Pool pages dropped after crashing or closing").inc()
+
+    async def _close(self, page):
+        try:
+            await page.close()
+        except Exception as e:
+            logger.debug(f"Closing pool page failed: {e}")
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import re
+from typing import Awaitable, Callable, Dict, Optional, TypedDict
+
+logger = logging.getLogger(__name__)
+
+# Query parameters Zepto (and most listing APIs) use for the page index
+PAGE_PARAM_RE = re.compile(r'([?&](?:page|pageNumber|page_number|pageNo)=)(\d+)')
+
+# Total counts advertised by listing payloads, in either raw or Flight-escaped JSON
+EXPECTED_TOTAL_RE = re.compile(r'\\?"(?:totalCount|totalProducts|totalItems|productCount|total)\\?":\s*(\d+)')
+
+class CategoryCoverage(TypedDict):
+    category_url: str
+    mode: str                 # "paged", "scroll" or "single"
+    expected: Optional[int]   # count advertised by the payload, if any
+    captured: int
+    pages: int
+    exhausted: bool           # True if we stopped because the source ran dry
+
+def page_url_template(url: str) -> Optional[str]:
+    """Turns an observed paged request URL into a template with a `{page}` slot."""
+    match = PAGE_PARAM_RE.search(url)
+    if not match:
+        return None
+    return url[:match.start(2)] + "{page}" + url[match.end(2):]
+
+def page_number(url: str) -> Optional[int]:
+    match = PAGE_PARAM_RE.search(url)
+    return int(match.group(2)) if match else None
+
+def find_expected_total(text: str) -> Optional[int]:
+    """Largest advertised total in a payload (nested lists often carry smaller counts)."""
+    totals = [int(m) for m in EXPECTED_TOTAL_RE.findall(text)]
+    return max(totals) if totals else None
+
+class PaginationEngine:
+    """
+    Drives a paged listing API until it is exhausted.
+
+    `fetch_page(n)` returns the raw body of page `n` (or None on failure) and
+    `parse_page(body)` returns the products on it keyed by product id. Pages
+    are fetched in waves of `concurrency`; the engine stops at the first page
+    that adds nothing new, once the advertised total has been reached, or at
+    `max_pages`. Set `concurrency=1` for APIs that need pages in order.
+    """
+
+    def __init__(self, fetch_page: Callable[[int], Awaitable[Optional[str]]],
+                 parse_page: Callable[[str], Dict[str, dict]],
+                 concurrency: int = 4, max_pages: int = 50, start_page: int = 1):
+        self.fetch_page = fetch_page
+        self.parse_page = parse_page
+        self.concurrency = max(1, concurrency)
+        self.max_pages = max_pages
+        self.start_page = start_page
+
+    async def run(self, products: Dict[str, dict], expected: Optional[int] = None) -> dict:
+        """
+        Fetches pages into `products` (updated in place, keyed by id).
+        Returns {"pages": n, "expected": total_or_None, "exhausted": bool}.
+        """
+        pages_fetched = 0
+        exhausted = False
+        stopped = False
+        next_page = self.start_page
+        last_page = self.start_page + self.max_pages - 1
+
+        while next_page <= last_page and not (exhausted or stopped):
+            if expected is not None and len(products) >= expected:
+                exhausted = True
+                break
+
+            wave = list(range(next_page, min(next_page + self.concurrency, last_page + 1)))
+            bodies = await asyncio.gather(*(self.fetch_page(n) for n in wave), return_exceptions=True)
+            next_page = wave[-1] + 1
+
+            # Merge in page order so "first empty page" is well-defined
+            for n, body in zip(wave, bodies):
+                if isinstance(body, Exception) or body is None:
+                    logger.warning(f"Page {n} failed, stopping pagination: {body}")
+                    stopped = True
+                    break
+                if not body.strip():
+                    exhausted = True
+                    break
+
+                pages_fetched += 1
+                if expected is None:
+                    expected = find_expected_total(body)
+
+                page_products = self.parse_page(body)
+                new_ids = [pid for pid in page_products if pid not in products]
+                products.update(page_products)
+                if not new_ids:
+                    exhausted = True
+                    break
+
+        return {"pages": pages_fetched, "expected": expected, "exhausted": exhausted}
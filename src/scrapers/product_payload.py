@@ -0,0 +1,291 @@
+import json
+import logging
+import re
+from typing import Dict, List, Optional, TypedDict
+
+from .extraction_rules import rules
+
+logger = logging.getLogger(__name__)
+
+PVID_RE = re.compile(r'/pvid/([0-9A-Za-z\-]+)')
+
+# Next.js inlines the RSC payload of a full HTML response as string chunks
+NEXT_F_CHUNK_RE = re.compile(r'self\.__next_f\.push\(\[1,("(?:[^"\\]|\\.)*")\]\)')
+
+# Only payload lines containing one of these (case-insensitive) are sent back from the page
+PRODUCT_LINE_MARKERS = ["productvariant", "seller", "manufacture", "markete"]
+
+# Seller / manufacturer / marketer details: dict keys, or the label of a
+# {label, value} attribute row, compared lower-case without spaces/punctuation
+DETAIL_KEYS = {
+    "seller_details": {"sellerdetails", "sellername", "seller", "soldby"},
+    "manufacturer_details": {"manufacturerdetails", "manufacturername", "manufacturer", "manufacturedby"},
+    "marketer_details": {"marketerdetails", "marketername", "marketer", "marketedby"},
+}
+DETAIL_LABEL_KEYS = ("title", "label", "key", "name")
+DETAIL_VALUE_KEYS = ("value", "description", "content", "text")
+
+# Price keys of a product node, in order of preference (paise)
+PRICE_KEYS = ("sellingPrice", "discountedSellingPrice")
+
+# Fetches many product URLs from inside the page (cookies and location
+# included), `concurrency` at a time, and keeps only the payload lines that
+# can carry product data so little crosses back to Python.
+PRODUCT_FETCH_JS = """
+    async ([urls, headers, concurrency, markers]) => {
+        const results = new Array(urls.length);
+        let next = 0;
+        const worker = async () => {
+            while (next < urls.length) {
+                const i = next++;
+                try {
+                    const response = await fetch(urls[i], { headers, credentials: 'include' });
+                    if (!response.ok) { results[i] = { status: response.status, body: null }; continue; }
+                    const text = await response.text();
+                    const lines = text.split('\\n').filter(line => {
+                        const lower = line.toLowerCase();
+                        return markers.some(m => lower.includes(m));
+                    });
+                    results[i] = { status: response.status, body: lines.join('\\n') };
+                } catch (e) {
+                    results[i] = { status: 0, body: null, error: String(e) };
+                }
+            }
+        };
+        await Promise.all(Array.from({ length: Math.min(concurrency, urls.length) }, worker));
+        return results;
+    }
+"""
+
+# Every product-page field in one evaluate (selectors from the extraction
+# rules; Playwright "text=" selectors become a case-insensitive text search),
+# plus the page's inline RSC payload so parse_product_payload can read it.
+PRODUCT_DOM_JS = """
+    (args) => {
+        const bodyText = document.body ? document.body.innerText.toLowerCase() : '';
+        const pick = (sels) => {
+            for (const sel of sels) {
+                if (sel.startsWith('text=')) continue;
+                const el = document.querySelector(sel);
+                if (el && el.innerText) return el.innerText.trim();
+            }
+            return null;
+        };
+        const has = (sels) => sels.some(sel => sel.startsWith('text=')
+            ? bodyText.includes(sel.slice(5).toLowerCase())
+            : !!document.querySelector(sel));
+        return {
+            name: pick(args.title),
+            price: pick(args.price),
+            mrp: pick(args.mrp),
+            pack_size: pick(args.quantity),
+            out_of_stock: has(args.outOfStock),
+            add_button: has(args.addButton),
+            payload: Array.from(document.scripts)
+                .map(s => s.textContent)
+                .filter(t => t && t.includes('self.__next_f'))
+                .join('\\n'),
+        };
+    }
+"""
+
+class ProductAvailability(TypedDict):
+    """What one product payload says about a product at the current location."""
+    pvid: Optional[str]
+    name: str
+    brand: str
+    price: Optional[float]
+    mrp: Optional[float]
+    pack_size: str
+    inventory: Optional[int]
+    in_stock: bool
+    variant_count: int
+    variant_in_stock_count: int
+    shelf_life_in_hours: Optional[str]
+    store_id: Optional[str]
+    seller_details: Optional[str]
+    manufacturer_details: Optional[str]
+    marketer_details: Optional[str]
+
+def product_dom_args() -> dict:
+    """Argument for PRODUCT_DOM_JS from the current rules."""
+    selectors = rules.selectors
+    return {
+        "title": selectors["product_title"],
+        "price": selectors["product_price"],
+        "mrp": selectors["product_mrp"],
+        "quantity": selectors["product_quantity"],
+        "outOfStock": selectors["product_out_of_stock"],
+        "addButton": selectors["product_add_button"],
+    }
+
+def pvid_from_url(url: str) -> Optional[str]:
+    match = PVID_RE.search(url)
+    return match.group(1) if match else None
+
+def flight_text(body: str) -> str:
+    """The RSC rows of a payload, unwrapping them first if it is a full HTML page."""
+    if "self.__next_f.push" not in body:
+        return body
+    chunks = []
+    for match in NEXT_F_CHUNK_RE.finditer(body):
+        try:
+            chunks.append(json.loads(match.group(1)))
+        except ValueError:
+            continue
+    return "".join(chunks)
+
+def find_product_nodes(obj, found: Optional[list] = None) -> list:
+    """Dicts in decoded RSC/JSON that describe a sellable variant (a productVariant plus a price)."""
+    if found is None:
+        found = []
+    if isinstance(obj, dict):
+        if isinstance(obj.get("productVariant"), dict) and any(k in obj for k in PRICE_KEYS + ("mrp",)):
+            found.append(obj)
+        for v in obj.values():
+            find_product_nodes(v, found)
+    elif isinstance(obj, list):
+        for item in obj:
+            find_product_nodes(item, found)
+    return found
+
+def _paise_to_rupees(value) -> Optional[float]:
+    try:
+        return float(value) / 100.0
+    except (TypeError, ValueError):
+        return None
+
+def price_to_float(text: Optional[str]) -> Optional[float]:
+    """"₹1,299" -> 1299.0 (None when there is no number)."""
+    match = re.search(r'\d[\d,]*(?:\.\d+)?', text or "")
+    return float(match.group(0).replace(",", "")) if match else None
+
+def _quantity(node: dict) -> Optional[int]:
+    try:
+        return int(node["availableQuantity"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _in_stock(node: dict) -> bool:
+    if node.get("outOfStock") is True:
+        return False
+    qty = _quantity(node)
+    return qty is None or qty > 0
+
+def decode_rows(body: str) -> list:
+    """Decoded JSON of each payload row that mentions a product or its details."""
+    rows = []
+    for line in flight_text(body).split("\n"):
+        lower = line.lower()
+        if not any(m in lower for m in PRODUCT_LINE_MARKERS):
+            continue
+        # Same row handling as extract_cards: "ID:JSON", or a plain JSON body
+        parts = line.split(":", 1)
+        try:
+            rows.append(json.loads(parts[1] if len(parts) > 1 else line))
+        except ValueError:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    return rows
+
+def _norm_key(key) -> str:
+    return re.sub(r'[^a-z]', '', str(key).lower())
+
+def _detail_text(value) -> Optional[str]:
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, dict):
+        parts = [_detail_text(v) for v in value.values() if isinstance(v, (str, dict, list))]
+    elif isinstance(value, list):
+        parts = [_detail_text(v) for v in value]
+    else:
+        return None
+    return ", ".join(p for p in parts if p) or None
+
+def find_details(obj, found: Optional[dict] = None) -> Dict[str, str]:
+    """First value found for each DETAIL_KEYS field, as text."""
+    if found is None:
+        found = {}
+    if len(found) == len(DETAIL_KEYS):
+        return found
+    if isinstance(obj, dict):
+        label = next((obj[k] for k in DETAIL_LABEL_KEYS if isinstance(obj.get(k), str)), None)
+        value = next((obj[k] for k in DETAIL_VALUE_KEYS if k in obj), None)
+        for field, keys in DETAIL_KEYS.items():
+            if field in found:
+                continue
+            text = None
+            if label is not None and value is not None and _norm_key(label) in keys:
+                text = _detail_text(value)
+            if text is None:
+                for k, v in obj.items():
+                    if _norm_key(k) in keys and not isinstance(v, (bool, int, float)):
+                        text = _detail_text(v)
+                        if text:
+                            break
+            if text:
+                found[field] = text
+        for v in obj.values():
+            if isinstance(v, (dict, list)):
+                find_details(v, found)
+    elif isinstance(obj, list):
+        for item in obj:
+            find_details(item, found)
+    return found
+
+def parse_product_payload(body: str, url: str) -> Optional[ProductAvailability]:
+    """
+    Availability of the product at `url` from its RSC/JSON payload (or the
+    filtered lines of one), or None when the payload has no product data or,
+    for a URL with a pvid, no node for that variant.
+    """
+    rows = decode_rows(body)
+    nodes = []
+    for row in rows:
+        find_product_nodes(row, nodes)
+    if not nodes:
+        return None
+
+    pvid = pvid_from_url(url)
+    if pvid:
+        # Never fall back to another node: it may be a recommendation or a sibling product
+        target = next((n for n in nodes if n["productVariant"].get("id") == pvid or n.get("id") == pvid), None)
+        if target is None:
+            return None
+    else:
+        target = nodes[0]
+
+    product = target.get("product") or {}
+    variant = target["productVariant"]
+
+    # Other variants of the same product, once each
+    product_id = product.get("id")
+    variants: Dict[str, dict] = {}
+    for node in (nodes if product_id else [target]):
+        if node is not target and (node.get("product") or {}).get("id") != product_id:
+            continue
+        key = node["productVariant"].get("id") or node.get("id") or str(len(variants))
+        variants.setdefault(key, node)
+
+    price = next((_paise_to_rupees(target[k]) for k in PRICE_KEYS if k in target), None)
+    mrp = _paise_to_rupees(target.get("mrp", variant.get("mrp")))
+    shelf_life = variant.get("shelfLifeInHours")
+    return {
+        "pvid": variant.get("id") or pvid,
+        "name": product.get("name") or variant.get("name") or "Unknown",
+        "brand": product.get("brand") or "Unknown",
+        "price": price if price is not None else mrp,
+        "mrp": mrp,
+        "pack_size": variant.get("formattedPacksize") or "N/A",
+        "inventory": _quantity(target),
+        "in_stock": _in_stock(target),
+        "variant_count": len(variants),
+        "variant_in_stock_count": sum(1 for n in variants.values() if _in_stock(n)),
+        "shelf_life_in_hours": str(shelf_life) if shelf_life is not None else None,
+        "store_id": target.get("storeId"),
+        # The product's own node first, then the rest of the payload (attribute lists etc.)
+        **{field: None for field in DETAIL_KEYS},
+        **find_details(rows, find_details(target)),
+    }
@@ -0,0 +1,152 @@
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+
+# Column order of the assortment CSV (and the zepto_assortment upload)
+PRODUCT_CSV_FIELDS = [
+    "Category", "Subcategory", "Item Name", "Brand", "Mrp", "Price", "Weight/pack_size",
+    "Delivery ETA", "availability", "inventory", "store_id", "base_product_id",
+    "shelf_life_in_hours", "timestamp", "pincode_input", "clicked_label",
+]
+
+def intern_str(value):
+    """Interns short strings that repeat across thousands of products (brands, pack sizes)."""
+    if isinstance(value, str) and len(value) <= 64:
+        return sys.intern(value)
+    return value
+
+def _number(value, cast=float):
+    """CSV cell -> number, or None for blanks and "N/A"."""
+    if value is None or value == "" or value == "N/A":
+        return None
+    try:
+        return cast(float(value)) if cast is int else cast(value)
+    except (TypeError, ValueError):
+        return None
+
+class BatchHeader:
+    """Values shared by every product of one category scrape at one location."""
+
+    __slots__ = ("category", "subcategory", "delivery_eta", "store_id", "pincode_input", "clicked_label", "timestamp")
+
+    def __init__(self, category: str, subcategory: str, delivery_eta: str, store_id: str,
+                 pincode_input: str, clicked_label: str, timestamp: Optional[str] = None):
+        self.category = intern_str(category)
+        self.subcategory = intern_str(subcategory)
+        self.delivery_eta = intern_str(delivery_eta)
+        self.store_id = intern_str(store_id)
+        self.pincode_input = intern_str(pincode_input)
+        self.clicked_label = clicked_label
+        self.timestamp = timestamp or time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def relocated(self, pincode_input: str, delivery_eta: str, clicked_label: str) -> "BatchHeader":
+        return BatchHeader(self.category, self.subcategory, delivery_eta, self.store_id,
+                           pincode_input, clicked_label, self.timestamp)
+
+    def __reduce__(self):
+        return (BatchHeader, (self.category, self.subcategory, self.delivery_eta, self.store_id,
+                              self.pincode_input, self.clicked_label, self.timestamp))
+
+class ProductRecord:
+    """
+    One product without the per-batch constants. `mrp`/`price`/`inventory`
+    are None when unknown; `store_id` is None when it equals the header's.
+    """
+
+    __slots__ = ("name", "brand", "mrp", "price", "pack_size", "inventory", "base_product_id", "shelf_life", "store_id")
+
+    def __init__(self, name: str, brand: str, mrp: Optional[float], price: Optional[float], pack_size: str,
+                 inventory: Optional[int], base_product_id: str, shelf_life=None, store_id: Optional[str] = None):
+        self.name = name
+        self.brand = intern_str(brand)
+        self.mrp = mrp
+        self.price = price
+        self.pack_size = intern_str(pack_size)
+        self.inventory = inventory
+        self.base_product_id = base_product_id
+        self.shelf_life = intern_str(shelf_life)
+        self.store_id = intern_str(store_id)
+
+    def __reduce__(self):
+        return (ProductRecord, (self.name, self.brand, self.mrp, self.price, self.pack_size, self.inventory,
+                                self.base_product_id, self.shelf_life, self.store_id))
+
+    def to_row(self, header: BatchHeader) -> dict:
+        """The record in the current CSV schema (see PRODUCT_CSV_FIELDS)."""
+        return {
+            "Category": header.category,
+            "Subcategory": header.subcategory,
+            "Item Name": self.name,
+            "Brand": self.brand,
+            "Mrp": self.mrp if self.mrp is not None else "N/A",
+            "Price": self.price if self.price is not None else "N/A",
+            "Weight/pack_size": self.pack_size,
+            "Delivery ETA": header.delivery_eta,
+            "availability": "In Stock" if (self.inventory and self.inventory > 0) else "Out of Stock",
+            "inventory": self.inventory if self.inventory is not None else "N/A",
+            "store_id": self.store_id or header.store_id,
+            "base_product_id": self.base_product_id,
+            "shelf_life_in_hours": self.shelf_life if self.shelf_life is not None else "N/A",
+            "timestamp": header.timestamp,
+            "pincode_input": header.pincode_input,
+            "clicked_label": header.clicked_label,
+        }
+
+class ProductBatch:
+    """
+    Products of one category scrape: a shared header plus slotted records.
+    Iterating yields records; `to_rows()` yields CSV dicts. Fan-out to other
+    pincodes of the same store (`relocated`) shares the records.
+    """
+
+    __slots__ = ("header", "records")
+
+    def __init__(self, header: BatchHeader, records: Optional[List[ProductRecord]] = None):
+        self.header = header
+        self.records = records if records is not None else []
+
+    def __reduce__(self):
+        return (ProductBatch, (self.header, self.records))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[ProductRecord]:
+        return iter(self.records)
+
+    def __bool__(self) -> bool:
+        return bool(self.records)
+
+    def append(self, record: ProductRecord):
+        self.records.append(record)
+
+    def relocated(self, pincode_input: str, delivery_eta: str, clicked_label: str) -> "ProductBatch":
+        return ProductBatch(self.header.relocated(pincode_input, delivery_eta, clicked_label), self.records)
+
+    def to_rows(self) -> Iterator[Dict]:
+        header = self.header
+        for record in self.records:
+            yield record.to_row(header)
+
+    @classmethod
+    def from_rows(cls, rows: List[dict]) -> "ProductBatch":
+        """Packs CSV-schema dicts of a single category/location (e.g. a replayed CSV) into a batch."""
+        if not rows:
+            return cls(BatchHeader("N/A", "N/A", "N/A", "N/A", "N/A", "N/A"))
+        first = rows[0]
+        header = BatchHeader(first.get("Category"), first.get("Subcategory"), first.get("Delivery ETA"),
+                             first.get("store_id"), first.get("pincode_input"), first.get("clicked_label"),
+                             first.get("timestamp"))
+        records = []
+        for row in rows:
+            records.append(ProductRecord(
+                row.get("Item Name"), row.get("Brand"),
+                _number(row.get("Mrp")),
+                _number(row.get("Price")),
+                row.get("Weight/pack_size"),
+                _number(row.get("inventory"), int),
+                row.get("base_product_id"),
+                None if row.get("shelf_life_in_hours") in (None, "N/A") else row.get("shelf_life_in_hours"),
+                None if row.get("store_id") == header.store_id else row.get("store_id"),
+            ))
+        return cls(header, records)
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Headers that describe the wire encoding, not the body we store
+DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+def request_key(method: str, url: str, post_data: Optional[str] = None) -> str:
+    key = f"{method.upper()} {url}"
+    if post_data:
+        key += " #" + hashlib.sha1(post_data.encode("utf-8", "ignore")).hexdigest()[:12]
+    return key
+
+def path_key(method: str, url: str) -> str:
+    """Looser key (no query/body) used when the exact request was not recorded."""
+    parts = urlsplit(url)
+    return f"{method.upper()} {parts.scheme}://{parts.netloc}{parts.path}"
+
+class ResponseStore:
+    """
+    Compact per-URL response store for offline runs.
+
+    Layout under `root`:
+      - `index.json`: {request key: [{status, headers, body, path_key}, ...]}
+      - `bodies/<sha1>`: raw response bodies, de-duplicated by content
+
+    A key can hold several responses (e.g. the same RSC endpoint hit twice);
+    replay serves them in order and then keeps serving the last one.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.bodies_dir = os.path.join(root, "bodies")
+        self.index_file = os.path.join(root, "index.json")
+        self.index: Dict[str, List[dict]] = {}
+        self.by_path: Dict[str, List[str]] = {}
+        self.served: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        # Recording tasks not finished yet
+        self.pending = set()
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+            for key, entries in self.index.items():
+                for entry in entries:
+                    self.by_path.setdefault(entry["path_key"], []).append(key)
+
+    # --- Recording ---
+
+    def add(self, method: str, url: str, status: int, headers: dict, body: bytes, post_data: Optional[str] = None):
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        digest = hashlib.sha1(body).hexdigest()
+        body_path = os.path.join(self.bodies_dir, digest)
+        if not os.path.exists(body_path):
+            with open(body_path, "wb") as f:
+                f.write(body)
+
+        key = request_key(method, url, post_data)
+        entry = {
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in DROP_HEADERS},
+            "body": digest,
+            "path_key": path_key(method, url),
+        }
+        self.index.setdefault(key, []).append(entry)
+        self.by_path.setdefault(entry["path_key"], []).append(key)
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_file, self.index_file)
+        logger.info(f"Saved {len(self.index)} recorded requests to {self.root}")
+
+    def record_response(self, response):
+        """`response` event handler for a Playwright context (body read in a tracked task, see flush)."""
+        task = asyncio.create_task(self._record(response))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def flush(self, timeout: float = 30.0):
+        """Waits for responses still being recorded (call before save)."""
+        if self.pending:
+            done, not_done = await asyncio.wait(list(self.pending), timeout=timeout)
+            if not_done:
+                logger.warning(f"{len(not_done)} responses were still being recorded after {timeout:.0f}s")
+
+    async def _record(self, response):
+        try:
+            if response.status >= 300 and response.status < 400:
+                return  # redirects have no body; the target is recorded separately
+            body = await response.body()
+            request = response.request
+            self.add(request.method, response.url, response.status, await response.all_headers(), body, request.post_data)
+        except Exception as e:
+            logger.debug(f"Could not record {response.url}: {e}")
+
+    # --- Replay ---
+
+    def lookup(self, method: str, url: str, post_data: Optional[str] = None) -> Optional[dict]:
+        key = request_key(method, url, post_data)
+        if key not in self.index:
+            candidates = self.by_path.get(path_key(method, url))
+            if not candidates:
+                self.misses += 1
+                return None
+            key = candidates[0]
+
+        entries = self.index[key]
+        n = self.served.get(key, 0)
+        self.served[key] = n + 1
+        self.hits += 1
+        return entries[min(n, len(entries) - 1)]
+
+    def read_body(self, entry: dict) -> bytes:
+        with open(os.path.join(self.bodies_dir, entry["body"]), "rb") as f:
+            return f.read()
+
+    async def fulfill_route(self, route):
+        """`context.route` handler: serve recorded responses, abort anything unknown."""
+        request = route.request
+        entry = self.lookup(request.method, request.url, request.post_data)
+        if entry is None:
+            await route.abort()
+            return
+        await route.fulfill(status=entry["status"], headers=entry["headers"], body=self.read_body(entry))
@@ -3,32 +3,223 @@ import asyncio
 from datetime import datetime
 import logging
 import json
-import re
+import os
 import time
-from typing import List, Optional
+from typing import Dict, List, Optional
 from .base import BaseScraper
-from .models import ProductItem
+from tracing import traced, span
+from metrics import registry
+from .models import AvailabilityResult, ProductItem
+from .records import BatchHeader, ProductBatch, ProductRecord
+from .category_registry import CategoryRegistry, FINGERPRINT_JS, CATEGORY_HREFS_JS, ordered_unique
+from .network_stats import PayloadAllowlist, CategoryNetworkStats, new_category_stats, is_asset, content_length
+from .extraction_rules import rules
+from .location_meta import LOCATION_META_JS, MAX_LOCATION_BODY_BYTES, extract_location_meta, is_location_candidate, is_location_url, location_meta_args
+from .product_payload import (PRODUCT_DOM_JS, PRODUCT_FETCH_JS, PRODUCT_LINE_MARKERS, ProductAvailability,
+                              parse_product_payload, price_to_float, product_dom_args)
+from .page_pool import PagePool
+from .pagination import PaginationEngine, CategoryCoverage, page_url_template, page_number, find_expected_total
 from urllib.parse import quote
 
 logger = logging.getLogger(__name__)
 
+def find_cards(obj) -> list:
+    """Recursive search for cardData blocks in decoded RSC/JSON."""
+    cards = []
+    if isinstance(obj, dict):
+        if "cardData" in obj:
+            cards.append(obj["cardData"])
+        for k, v in obj.items():
+            cards.extend(find_cards(v))
+    elif isinstance(obj, list):
+        for item in obj:
+            cards.extend(find_cards(item))
+    return cards
+
+def extract_cards(text: str) -> dict:
+    """
+    Parses a JSON or RSC (Flight) body into {product_id: cardData}.
+    Strategy: Split by lines (RSC) or just parse JSON.
+    """
+    cards_by_id = {}
+    # Optimization: check if line likely contains product data before heavy parsing
+    if '"cardData":' not in text:
+        return cards_by_id
+
+    for line in text.split('\n'):
+        if '"cardData":' in line:
+            # Try to strip RSC prefix (ID:JSON) if present
+            parts = line.split(':', 1)
+            json_part = parts[1] if len(parts) > 1 else line
+
+            try:
+                data = json.loads(json_part)
+            except:
+                # Plain JSON body whose first key happens to contain a colon split
+                try:
+                    data = json.loads(line)
+                except:
+                    registry.counter("zepto_parse_errors_total", "Payload lines or cards that failed to parse").inc()
+                    continue
+
+            for card in find_cards(data):
+                if isinstance(card, dict) and "id" in card:
+                    cards_by_id[card["id"]] = card
+    return cards_by_id
+
+def build_flight_details_map(content: str) -> dict:
+    """
+    First pass over Flight data: map of product details from JSON blocks
+    (Inventory, Shelf Life, Pack Size). Key = PVID (id in JSON).
+    """
+    product_details_map = {}
+    try:
+        # Find all "id":"UUID" occurrences in the Flight data (escaped quotes)
+        # We capture a window around it to find other properties
+        # The properties usually follow or precede closely in the same object
+
+        # Pattern look for id with some context
+        # Flight data is messy, but usually "id" is close to "availableQuantity"
+        # We iterate over all matches of id="UUID"
+        patterns = rules.patterns
+        qty_re = patterns["flight_available_quantity"]
+        shelf_life_re = patterns["flight_shelf_life"]
+        packsize_re = patterns["flight_packsize"]
+        content_len = len(content)
+
+        for match in patterns["flight_id"].finditer(content):
+            pvid_key = match.group(1)
+            # Window around the id, searched in place (pos/endpos) rather than sliced out
+            start = max(0, match.start() - 1000)
+            end = min(content_len, match.end() + 1000)
+
+            # To ensure we are in the same object, we should ideally parse syntax
+            # But for now, we look for tight proximity or "availableQuantity"
+            # Warning: Window might overlap multiple objects. 
+            # We try to find the "closest" value. 
+            # Actually, looking at debug data, "availableQuantity" comes BEFORE "id" sometimes.
+            # {"availableQuantity":12,"baseProductId":...,"id":"..."}
+
+            details = {}
+
+            # Inventory
+            qty_match = qty_re.search(content, start, end)
+            if qty_match: 
+                # Check if this quantity is "closer" to this ID than another?
+                # For now, take it. Most blocks are distinct.
+                details['inventory'] = qty_match.group(1)
+
+            # Shelf Life
+            sl_match = shelf_life_re.search(content, start, end)
+            if sl_match: details['shelf_life'] = sl_match.group(1)
+
+            # Pack Size (raw from store)
+            ps_match = packsize_re.search(content, start, end)
+            if ps_match: details['pack_size_raw'] = ps_match.group(1)
+
+            # Update map
+            if details:
+                if pvid_key not in product_details_map:
+                    product_details_map[pvid_key] = {}
+                product_details_map[pvid_key].update(details)
+
+        logger.info(f"Built details map with {len(product_details_map)} items")
+
+    except Exception as e:
+        logger.warning(f"Error building details map: {e}")
+    return product_details_map
+
+def category_names(category_url: str):
+    """Extract Category/Sub from URL if possible."""
+    cat_name = "Unknown"
+    sub_name = "Unknown"
+    try:
+        if "/cn/" in category_url:
+            parts = category_url.split("/cn/")[1].split("/")
+            if len(parts) >= 2:
+                cat_name = parts[0].replace("-", " ").title()
+                sub_name = parts[1].replace("-", " ").title()
+    except: pass
+    return cat_name, sub_name
+
 class ZeptoScraper(BaseScraper):
-    def __init__(self, headless=False):
-        super().__init__(headless)
+    def __init__(self, headless=False, category_registry: Optional[CategoryRegistry] = None,
+                 record_dir: Optional[str] = None, replay_dir: Optional[str] = None,
+                 payload_allowlist: Optional[PayloadAllowlist] = None, browser_pool=None):
+        super().__init__(headless, record_dir=record_dir, replay_dir=replay_dir, browser_pool=browser_pool)
         self.base_url = "https://www.zepto.com/"
         self.delivery_eta = "N/A"
         self.store_id = "N/A"
+        self.latitude = None
+        self.longitude = None
         self.clicked_location_label = "N/A"
+        # Pincode the page is currently located at (set_location is skipped when unchanged)
+        self.location_pincode = None
+        # Availability checks: product payloads fetched in-page, this many at a time
+        self.fast_availability = True
+        self.availability_concurrency = 8
+        # Pages (main page included) rendering availability fallbacks side by side
+        self.availability_pages = 4
+        self.page_pool: Optional[PagePool] = None
+        # Shared across workers so each store's category tree is discovered once
+        self.category_registry = category_registry
+        # Pagination for large categories (see scrape_assortment_fast)
+        self.page_concurrency = 4
+        self.max_pages = 30
+        self.category_coverage: Dict[str, CategoryCoverage] = {}
+        # Wall time (seconds) of the last scrape_assortment_fast call, split into fetch/parse
+        self.last_timings: Dict[str, float] = {}
+        # Per-category request/byte accounting, and the learned data-bearing URL patterns
+        self.network_stats: Dict[str, CategoryNetworkStats] = {}
+        self.payload_allowlist = payload_allowlist
+        # Bodies are parsed as they arrive and dropped; larger ones are skipped outright
+        self.max_body_bytes = 32 * 1024 * 1024
+        # Total body bytes held at once across concurrent handlers; a read waits up to
+        # capture_wait_seconds for room, then the body is dropped
+        self.max_capture_bytes = int(os.environ.get("ZEPTO_CAPTURE_BUDGET_MB", "96")) * 1024 * 1024
+        self.capture_wait_seconds = 10.0
+        self.capture_bytes = 0
+        self._capture_released = asyncio.Event()
 
+    # Request headers replayed on paged fetches so the server returns the same RSC/JSON format
+    PAGED_FETCH_HEADERS = {"accept", "rsc", "next-router-state-tree", "next-url", "x-requested-with"}
+
+    @traced("ZeptoScraper.set_location", attrs=("pincode",))
     async def set_location(self, pincode: str):
         logger.info(f"Setting location to {pincode}")
+        # Until this location is confirmed, the next check must set it again
+        self.location_pincode = None
+        rules.refresh()
+        selectors = rules.selectors
+        # Store id / ETA / coordinates from the responses that follow picking the location,
+        # as (url, task) in the order the responses arrived
+        pending_meta: List[tuple] = []
+        capture = {"on": False}
+
+        async def read_location_meta(response) -> Dict[str, str]:
+            try:
+                body = await response.body()
+                if len(body) <= MAX_LOCATION_BODY_BYTES:
+                    return extract_location_meta(body.decode("utf-8", errors="ignore"))
+            except Exception:
+                pass
+            return {}
+
+        def handle_response(response):
+            if not capture["on"]:
+                return
+            headers = response.headers
+            if is_location_candidate(headers.get("content-type", ""), content_length(headers)):
+                pending_meta.append((response.url, asyncio.create_task(read_location_meta(response))))
+
+        self.page.on("response", handle_response)
         try:
             await self.page.goto(self.base_url, timeout=60000, wait_until='domcontentloaded')
             await self.human_delay()
 
             # Location interaction logic
             try:
-                trigger_selector = "button[aria-label='Select Location']"
+                trigger_selector = selectors["location_trigger"][0]
                 try:
                     await self.page.wait_for_selector(trigger_selector, timeout=10000)
                     await self.page.hover(trigger_selector)
@@ -39,7 +230,7 @@ class ZeptoScraper(BaseScraper):
                      logger.warning("Standard click failed, trying JS click...")
                      await self.page.evaluate(f"document.querySelector(\"{trigger_selector}\").click()")
 
-                await self.page.wait_for_selector("input[type='text']", timeout=10000)
+                await self.page.wait_for_selector(rules.css("location_modal_input"), timeout=10000)
                 logger.info("Modal/Input appeared")
                 
             except Exception as e:
@@ -49,14 +240,8 @@ class ZeptoScraper(BaseScraper):
             await self.human_delay()
             
             # Type Pincode
-            input_selectors = [
-                 "input[placeholder*='Search a new address']", 
-                 "input[placeholder*='Search']",
-                 "input[type='text']"
-            ]
-            
             found_input = False
-            for sel in input_selectors:
+            for sel in selectors["location_input"]:
                 if await self.page.is_visible(sel):
                      input_selector = sel
                      found_input = True
@@ -78,15 +263,15 @@ class ZeptoScraper(BaseScraper):
 
                     # Wait for results to appear
                     try:
-                        await self.page.wait_for_selector("div[data-testid='location-search-item'], [data-testid='prediction-item'], div[class*='prediction'], div[class*='search-result']", timeout=5000)
+                        await self.page.wait_for_selector(rules.css("location_results_wait"), timeout=5000)
                     except: pass
                     
                     # Click first result
-                    if await self.page.is_visible("input[type='text']"):
+                    if await self.page.is_visible(rules.css("location_modal_input")):
                         # specific selectors for location results
-                        results = await self.page.query_selector_all("div[data-testid='address-search-item'], [data-testid='location-search-item'], [data-testid='prediction-item']")
+                        results = await self.page.query_selector_all(rules.css("location_results"))
                         if not results:
-                             results = await self.page.query_selector_all("div[class*='prediction'], div[class*='search-result']")
+                             results = await self.page.query_selector_all(rules.css("location_results_fallback"))
                              
                         if results:
                             # Capture the text of the prediction before clicking
@@ -99,6 +284,7 @@ class ZeptoScraper(BaseScraper):
                             except:
                                 logger.warning("Could not capture clicked label text")
 
+                            capture["on"] = True
                             await results[0].click(force=True)
                             logger.info("Clicked first prediction result (force=True)")
                         else:
@@ -108,6 +294,7 @@ class ZeptoScraper(BaseScraper):
                              #    f.write(content)
                              # logger.info("Dumped HTML to debug_location_results.html")
                              
+                             capture["on"] = True
                              await self.page.keyboard.press("Enter")
                              logger.info("Fallback: Pressed Enter")
                 except Exception as e:
@@ -118,87 +305,142 @@ class ZeptoScraper(BaseScraper):
 
             await self.human_delay()
             
-            # Extract ETA
-            try:
-                # Try multiple selectors
-                eta_el = await self.page.query_selector("div[data-testid='eta-container']")
-                if not eta_el:
-                     eta_el = await self.page.query_selector("p[class*='eta']")
-                     
-                if eta_el:
-                    self.delivery_eta = await eta_el.inner_text()
-                    logger.info(f"Captured ETA: {self.delivery_eta}")
-                else:
-                    # Fallback text search
-                    content = await self.page.content()
-                    eta_match = re.search(r'(\d+\s*mins?)', content, re.IGNORECASE)
-                    if eta_match:
-                         self.delivery_eta = eta_match.group(1)
-                         logger.info(f"Captured ETA via regex: {self.delivery_eta}")
-
-            except:
-                logger.warning("Could not capture ETA")
-
-            # Extract Store ID from page content
-            try:
-                content = await self.page.content()
-                # storeId":"b4dc8d65-..."
-                store_match = re.search(r'\"storeId\":\"([^\"]+)\"', content)
-                if store_match:
-                    self.store_id = store_match.group(1)
-                    logger.info(f"Captured Store ID: {self.store_id}")
-                else:
-                    # Fallback
-                    store_match_2 = re.search(r'store_?id\W+([a-zA-Z0-9\-]+)', content, re.IGNORECASE)
-                    if store_match_2:
-                         self.store_id = store_match_2.group(1)
-                         logger.info(f"Captured Store ID via regex 2: {self.store_id}")
-            except Exception as e:
-                 logger.warning(f"Could not capture Store ID: {e}")
+            if await self.apply_location_meta(pending_meta):
+                self.location_pincode = pincode
+            else:
+                logger.warning(f"Location {pincode} not confirmed (no store id); it will be set again on the next check")
 
         except Exception as e:
             logger.error(f"Error setting location: {e}")
+        finally:
+            self.page.remove_listener("response", handle_response)
 
+    async def apply_location_meta(self, pending: List[tuple]) -> bool:
+        """
+        Sets store id, ETA and coordinates from what the location responses
+        carried, filling the gaps with one in-page evaluate instead of
+        serializing the whole page. Values that can't be found are left as they were.
+
+        `pending` is (url, task) per response; the first value of each key
+        wins, taking location endpoints first and the rest in arrival order,
+        so a later unrelated response can't replace the store id.
+        Returns whether a store id was found, i.e. the location took effect.
+        """
+        with span("set_location.metadata") as s:
+            location_meta: Dict[str, str] = {}
+            tasks = [task for _, task in pending]
+            if tasks:
+                await asyncio.wait(tasks, timeout=5)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            ordered = sorted(enumerate(pending), key=lambda p: (not is_location_url(p[1][0]), p[0]))
+            for _, (url, task) in ordered:
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    for key, value in task.result().items():
+                        location_meta.setdefault(key, value)
+            meta = dict(location_meta)
+            source = "network" if meta else "none"
+            if "store_id" not in meta or "eta" not in meta:
+                try:
+                    dom_meta = await self.page.evaluate(LOCATION_META_JS, location_meta_args())
+                    for key, value in (dom_meta or {}).items():
+                        meta.setdefault(key, value)
+                    source = "network+dom" if location_meta else "dom"
+                except Exception as e:
+                    logger.warning(f"Could not read location metadata from the page: {e}")
+            s.set_attribute("source", source)
+            if location_meta:
+                registry.counter("zepto_location_meta_network_total", "Locations whose metadata came from network responses").inc()
+            if source.endswith("dom"):
+                registry.counter("zepto_location_meta_dom_total", "Locations that needed the in-page metadata fallback").inc()
+
+        if meta.get("eta"):
+            self.delivery_eta = meta["eta"]
+            logger.info(f"Captured ETA: {self.delivery_eta}")
+        else:
+            logger.warning("Could not capture ETA")
+        if meta.get("store_id"):
+            self.store_id = meta["store_id"]
+            logger.info(f"Captured Store ID: {self.store_id} ({source})")
+        else:
+            logger.warning("Could not capture Store ID")
+        if meta.get("latitude") and meta.get("longitude"):
+            self.latitude, self.longitude = meta["latitude"], meta["longitude"]
+        return bool(meta.get("store_id"))
+
+    @traced("ZeptoScraper.get_all_categories")
     async def get_all_categories(self) -> List[str]:
         logger.info("Extracting category links...")
         try:
-            await self.page.wait_for_selector("a[href*='/cn/']", timeout=10000)
-            hrefs = await self.page.evaluate("""
-                () => {
-                    return Array.from(document.querySelectorAll('a'))
-                        .map(a => a.href)
-                        .filter(href => href.includes('/cn/') && href.includes('/cid/'))
-                }
-            """)
-            categories = list(set(hrefs))
+            await self.page.wait_for_selector(rules.css("category_link"), timeout=10000)
+
+            cat_registry = self.category_registry
+            if cat_registry is not None and self.store_id != "N/A":
+                fingerprint = await self.page.evaluate(FINGERPRINT_JS)
+                if cat_registry.is_valid(self.store_id, fingerprint):
+                    categories = cat_registry.urls(self.store_id)
+                    logger.info(f"Using {len(categories)} cached categories for store {self.store_id}")
+                    return categories
+
+                hrefs = await self.page.evaluate(CATEGORY_HREFS_JS)
+                categories = [c["url"] for c in cat_registry.update(self.store_id, fingerprint, hrefs)]
+                if categories or not hrefs:
+                    logger.info(f"Found {len(categories)} unique category links (registry refreshed)")
+                    return categories
+                logger.warning("Category links did not match the expected /cn/.../cid/ layout, skipping registry")
+                return ordered_unique(hrefs)
+
+            hrefs = await self.page.evaluate(CATEGORY_HREFS_JS)
+            categories = ordered_unique(hrefs)
             logger.info(f"Found {len(categories)} unique category links")
             return categories
         except Exception as e:
             logger.error(f"Error extracting categories: {e}")
             return []
 
+    @traced("ZeptoScraper.scrape_assortment", attrs=("category_url",))
     async def scrape_assortment(self, category_url: str, pincode: str = "N/A") -> List[ProductItem]:
         logger.info(f"Scraping {category_url}")
         products: List[ProductItem] = []
-        captured_data = []
+        seen = set()
+        captured = 0
+        stats = new_category_stats(category_url)
+        self.network_stats[category_url] = stats
+        cat_name, sub_name = category_names(category_url)
 
         async def handle_response(response):
+            nonlocal captured
             try:
-                ct = response.headers.get("content-type", "").lower()
-                if "image" in ct or "font" in ct or "css" in ct or "javascript" in ct:
+                headers = response.headers
+                ct = headers.get("content-type", "").lower()
+                self.account_request(stats, headers)
+                if is_asset(ct):
                     return
                 # Capture useful types
                 if response.status == 200:
+                    if not self.should_read_body(stats, response.url):
+                        return
+                    body = await self.read_capped_body(stats, response)
+                    if body is None:
+                        return
+                    # Parse on arrival; only the products outlive this handler
                     try:
-                        data = await response.json()
-                        captured_data.append({"url": response.url, "type": "json", "data": data})
-                    except:
-                         try:
-                             text = await response.text()
-                             # Save string data if length seems substantial (Flight data is large)
-                             if len(text) > 10000 or "x-component" in ct:
-                                 captured_data.append({"url": response.url, "type": ct, "data": text})
-                         except: pass
+                        before = len(products)
+                        try:
+                            content = json.loads(body)
+                        except:
+                            content = body.decode("utf-8", "replace")
+                            # Keep string data only if it seems substantial (Flight data is large)
+                            if len(content) <= 10000 and "x-component" not in ct:
+                                content = None
+                        if content is not None:
+                            captured += 1
+                            registry.counter("zepto_responses_captured_total").inc()
+                            self.parse_capture(content, cat_name, sub_name, pincode, products, seen)
+                        self.account_body(stats, headers, response.url, len(body), len(products) - before)
+                    finally:
+                        self.release_body(len(body))
             except: pass
 
         self.page.on("response", handle_response)
@@ -206,7 +448,8 @@ class ZeptoScraper(BaseScraper):
         try:
             await self.page.goto(category_url, timeout=60000)
             await self.human_delay(3)
-            await self.human_scroll()
+            # Keep scrolling while the list keeps loading more products
+            await self.scroll_until_exhausted(lambda: len(products))
             await self.human_delay(2)
             
         except Exception as e:
@@ -214,369 +457,464 @@ class ZeptoScraper(BaseScraper):
         finally:
              self.page.remove_listener("response", handle_response)
 
-        # Parse captured data
-        logger.info(f"Captured {len(captured_data)} responses. Parsing...")
-        
-        # Extract Category/Sub from URL if possible
-        cat_name = "Unknown"
-        sub_name = "Unknown"
+        logger.info(f"Scraped {len(products)} products from {captured} Flight/JSON responses "
+                    f"(peak {stats['peak_capture_bytes'] / 1e6:.1f} MB held)")
+
+        return products
+
+    def parse_product_from_dict(self, p_data: dict, cat_name: str, sub_name: str, pincode: str) -> Optional[ProductItem]:
+        """Helper to parse product from an API JSON dict."""
         try:
-            if "/cn/" in category_url:
-                parts = category_url.split("/cn/")[1].split("/")
-                if len(parts) >= 2:
-                    cat_name = parts[0].replace("-", " ").title()
-                    sub_name = parts[1].replace("-", " ").title()
-        except: pass
-
-        # Helper to parse product from dict
-        def parse_product_from_dict(p_data: dict) -> Optional[ProductItem]:
-            try:
-                # Common fields in Zepto JSON
-                p_id = p_data.get("id")
-                if not p_id: return None
-                
-                name = p_data.get("name") or p_data.get("productName")
-                if not name: return None
-                
-                # Pricing
-                mrp = str(p_data.get("mrp", 0) / 100) if p_data.get("mrp") else "N/A"
-                price = str(p_data.get("sellingPrice", 0) / 100) if p_data.get("sellingPrice") else mrp
-                if price == "0.0": price = mrp # Fallback
-                
-                # Inventory
-                qty = p_data.get("availableQuantity", 0)
-                inventory = str(qty)
-                availability = "In Stock" if qty > 0 else "Out of Stock"
-                
-                # Meta
-                pack_size = p_data.get("packsize") or p_data.get("weightInGms") or "N/A"
-                brand = p_data.get("brand") or "Unknown"
-                
-                # URL construction
-                slug = p_data.get("slug")
-                pvid = p_data.get("id") # Using ID as PVID often works or store_product_id
-                url_part = f"/pn/{slug}/pvid/{pvid}" if slug else f"/pvid/{pvid}"
-                
-                return {
-                    "Category": cat_name,
-                    "Subcategory": sub_name,
-                    "Item Name": name,
-                    "Brand": brand,
-                    "Mrp": mrp,
-                    "Price": price,
-                    "Weight/pack_size": str(pack_size),
-                    "Delivery ETA": self.delivery_eta,
-                    "availability": availability,
-                    "inventory": inventory,
-                    "store_id": self.store_id,
-                    "base_product_id": url_part,
-                    "shelf_life_in_hours": str(p_data.get("shelfLifeInHours", "N/A")),
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "pincode_input": pincode,
-                    "clicked_label": self.clicked_location_label
-                }
-            except:
-                return None
+            # Common fields in Zepto JSON
+            p_id = p_data.get("id")
+            if not p_id: return None
 
-        # Process all captures
-        for capture in captured_data:
-            content = capture.get("data")
-            
-            # CASE 1: JSON Response (API)
-            if isinstance(content, dict) or isinstance(content, list):
-                # Traverse to find products
-                # Usually in props -> pageProps -> initialReduxState -> ... -> products
-                # Or simply a list of products in search/category response
-                
-                # Flatten simple lists
-                items_to_check = []
-                if isinstance(content, list):
-                    items_to_check = content
-                elif isinstance(content, dict):
-                    # Check common keys
-                    if "products" in content: items_to_check.extend(content["products"])
-                    if "items" in content: items_to_check.extend(content["items"])
-                    # Deep check for storeProducts
-                    # This is a naive recursive finder could be better but sticking to known patterns
-                    # Let's try to just dump the whole dict values if they look like products
-                    pass
-
-                for item in items_to_check:
-                    if isinstance(item, dict):
-                        p = parse_product_from_dict(item)
-                        if p and not any(x['base_product_id'] == p['base_product_id'] for x in products):
-                            products.append(p)
-
-            # CASE 2: HTML/String Response (SSR Flight Data)
-            if isinstance(content, str) and len(content) > 10000:
-                # Regex parsing logic for Flight/HTML string
-                # Matches: href="/pn/..." ... >Name</a> ... >Price</td>
-                
-                # First pass: Build a map of product details from JSON blocks (Inventory, Shelf Life, Pack Size)
-                # Key = PVID (id in JSON), Value = dict of attributes
-                product_details_map = {}
-                try:
-                    # Find all "id":"UUID" occurrences in the Flight data (escaped quotes)
-                    # We capture a window around it to find other properties
-                    # The properties usually follow or precede closely in the same object
-                    
-                    # Pattern look for id with some context
-                    # Flight data is messy, but usually "id" is close to "availableQuantity"
-                    # We iterate over all matches of id="UUID"
-                    id_matches = re.finditer(r'\\\"id\\\":\\\"([a-f0-9\-]+)\\\"', content)
-                    
-                    for match in id_matches:
-                        pvid_key = match.group(1)
-                        start = max(0, match.start() - 1000)
-                        end = min(len(content), match.end() + 1000)
-                        window = content[start:end]
-                        
-                        # To ensure we are in the same object, we should ideally parse syntax
-                        # But for now, we look for tight proximity or "availableQuantity"
-                        # Warning: Window might overlap multiple objects. 
-                        # We try to find the "closest" value. 
-                        # Actually, looking at debug data, "availableQuantity" comes BEFORE "id" sometimes.
-                        # {"availableQuantity":12,"baseProductId":...,"id":"..."}
-                        
-                        details = {}
-                        
-                        # Inventory
-                        qty_match = re.search(r'\\\"availableQuantity\\\":(\d+)', window)
-                        if qty_match: 
-                            # Check if this quantity is "closer" to this ID than another?
-                            # For now, take it. Most blocks are distinct.
-                            details['inventory'] = qty_match.group(1)
-                        
-                        # Shelf Life
-                        sl_match = re.search(r'\\\"shelfLifeInHours\\\":\\\"([^\"]+)\\\"', window)
-                        if sl_match: details['shelf_life'] = sl_match.group(1)
-                        
-                        # Pack Size (raw from store)
-                        ps_match = re.search(r'\\\"packsize\\\":(\d+)', window)
-                        if ps_match: details['pack_size_raw'] = ps_match.group(1)
-                        
-                        # Update map
-                        if details:
-                            if pvid_key not in product_details_map:
-                                product_details_map[pvid_key] = {}
-                            product_details_map[pvid_key].update(details)
-                            
-                    logger.info(f"Built details map with {len(product_details_map)} items")
-                    
-                except Exception as e:
-                    logger.warning(f"Error building details map: {e}")
+            name = p_data.get("name") or p_data.get("productName")
+            if not name: return None
 
-                link_matches = re.finditer(r'href=\"(/pn/[^\"]+)\"', content)
-                
-                for match in link_matches:
-                    try:
-                        url_part = match.group(1)
-                        if "pvid" not in url_part: continue 
-                        
-                        start_idx = match.end()
-                        snippet = content[start_idx:start_idx+800] 
-                        
-                        pvid = url_part.split("pvid/")[1] if "pvid/" in url_part else ""
-                        
-                        # Name
-                        name_match = re.search(r'>([^<]+)</a>', snippet)
-                        product_name = "Unknown"
-                        pack_size = "N/A"
-                        brand = "Unknown"
-                        price_extracted = None
-                        
-                        if name_match:
-                            raw_name = name_match.group(1).replace("<!-- -->", "").strip()
-                            product_name = re.sub(r'^\d+\.\s*', '', raw_name)
-                            
-                        # Pack Size Regex (from Name)
-                        # Matches "500g", "1 kg", "1pc", "Pack of 2"
-                        if product_name != "Unknown":
-                            size_match = re.search(r'(\d+(?:\.\d+)?\s*(?:g|kg|ml|l|litres|pc|pcs|unit|bunch|pack|bunches)\b)', product_name, re.IGNORECASE)
-                            if size_match:
-                                pack_size = size_match.group(1)
-                                
-                        # Brand from URL (Always try this)
-                        if "/pn/" in url_part:
-                            try:
-                                slug = url_part.split("/pn/")[1]
-                                brand_slug = slug.split("-")[0]
-                                brand = brand_slug.title()
-                            except: pass
-                            
-                        # Refine Brand if " - " exists in Name (overrides slug if valid)
-                        if product_name != "Unknown" and " - " in product_name:
-                            parts = product_name.split(" - ")
-                            if len(parts) > 1 and len(parts[0]) < 20: 
-                                    brand = parts[0]
-
-                        # Lookup details
-                        inventory = "N/A"
-                        shelf_life = "N/A"
-                        
-                        if pvid in product_details_map:
-                            details = product_details_map[pvid]
-                            inventory = details.get('inventory', "N/A")
-                            shelf_life = details.get('shelf_life', "N/A")
-                            
-                            # Fallback for pack size if regex failed
-                            if pack_size == "N/A" and 'pack_size_raw' in details:
-                                pack_size = details['pack_size_raw'] # Might need unit appened, but raw is better than N/A
-                        
-                        # Price
-                        price_match = re.search(r'<td>(₹\d+)</td>', snippet)
-                        price = "N/A"
-                        if price_match:
-                            price = price_match.group(1).replace('₹', '')
-                        elif price_extracted:
-                            price = str(price_extracted)
-
-                        if not any(p['base_product_id'] == url_part for p in products):
-                            item: ProductItem = {
-                                "Category": cat_name,
-                                "Subcategory": sub_name,
-                                "Item Name": product_name,
-                                "Brand": brand, 
-                                "Mrp": price, 
-                                "Price": price,
-                                "Weight/pack_size": pack_size,
-                                "Delivery ETA": self.delivery_eta,
-                                "availability": "In Stock" if inventory != "0" and inventory != "N/A" else "Out of Stock",
-                                "inventory": inventory,
-                                "store_id": self.store_id,
-                                "base_product_id": url_part,
-                                "shelf_life_in_hours": shelf_life,
-                                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                                "pincode_input": pincode,
-                                "clicked_label": self.clicked_location_label
-                            }
-                            products.append(item)
-                    except Exception as e:
-                        pass
-                        
-        logger.info(f"Scraped {len(products)} products from Flight/JSON data")
+            # Pricing
+            mrp = str(p_data.get("mrp", 0) / 100) if p_data.get("mrp") else "N/A"
+            price = str(p_data.get("sellingPrice", 0) / 100) if p_data.get("sellingPrice") else mrp
+            if price == "0.0": price = mrp # Fallback
 
-        return products
+            # Inventory
+            qty = p_data.get("availableQuantity", 0)
+            inventory = str(qty)
+            availability = "In Stock" if qty > 0 else "Out of Stock"
 
-    async def scrape_availability(self, product_url: str, pincode: str = "N/A") -> List[ProductItem]:
-        logger.info(f"Checking availability for {product_url} at {pincode}")
-        products: List[ProductItem] = []
-        
-        try:
-            await self.set_location(pincode)
-            
-            # Navigate to product page
-            await self.page.goto(product_url, timeout=60000)
-            await self.human_delay(2)
-            
-            # We can reuse the same capturing logic or just DOM parsing since it's a single page
-            # For speed/simplicity on single page, DOM + Next.js data is often enough
-            
-            content = await self.page.content()
-            
-            # Extract Data from NEXT_DATA or similar if possible, or Fallback to DOM
-            # Zepto uses standard Next.js often
-            
-            # DOM Selectors for Product Page
-            name = "Unknown"
-            try:
-                name = await self.page.inner_text("h1")
-            except: pass
-            
-            price = "N/A"
-            mrp = "N/A"
-            try:
-                # Look for price containers
-                price_app = await self.page.query_selector("[data-testid='product-price']")
-                if price_app:
-                     price = await price_app.inner_text()
-            except: pass
+            # Meta
+            pack_size = p_data.get("packsize") or p_data.get("weightInGms") or "N/A"
+            brand = p_data.get("brand") or "Unknown"
 
-            try:
-                 # MRP usually struck through
-                 mrp_el = await self.page.query_selector("[data-testid='product-mrp']")
-                 if mrp_el:
-                     mrp = await mrp_el.inner_text() 
-            except: pass
-            
-            # Sanitation
-            if price != "N/A": price = price.replace("₹", "").strip()
-            if mrp != "N/A": mrp = mrp.replace("₹", "").strip()
-            
-            # Inventory / Add Button
-            # If "Add" button exists -> In Stock. If "Out of Stock" text -> Out.
-            is_oos = await self.page.query_selector("text=Out of Stock")
-            inventory = "10+" # Default if in stock
-            if is_oos:
-                inventory = "0"
-            else:
-                 # Check for "Add" button
-                 add_btn = await self.page.query_selector("button[aria-label='Add to cart']")
-                 if not add_btn:
-                     # Maybe it's a counter (already in cart?) or OOS hidden
-                     pass
-            
-            # Weight/Pack Size
-            pack_size = "N/A"
-            try:
-                # Often near title
-                ps_el = await self.page.query_selector("[data-testid='product-quantity']")
-                if ps_el:
-                    pack_size = await ps_el.inner_text()
-            except: pass
+            # URL construction
+            slug = p_data.get("slug")
+            pvid = p_data.get("id") # Using ID as PVID often works or store_product_id
+            url_part = f"/pn/{slug}/pvid/{pvid}" if slug else f"/pvid/{pvid}"
 
-            item: ProductItem = {
-                "Category": "Availability Check",
-                "Subcategory": "Direct Link",
+            return {
+                "Category": cat_name,
+                "Subcategory": sub_name,
                 "Item Name": name,
-                "Brand": "Unknown", # Could extract
+                "Brand": brand,
                 "Mrp": mrp,
                 "Price": price,
-                "Weight/pack_size": pack_size,
+                "Weight/pack_size": str(pack_size),
                 "Delivery ETA": self.delivery_eta,
-                "availability": "Out of Stock" if inventory == "0" else "In Stock",
+                "availability": availability,
                 "inventory": inventory,
                 "store_id": self.store_id,
-                "base_product_id": product_url,
-                "shelf_life_in_hours": "N/A",
+                "base_product_id": url_part,
+                "shelf_life_in_hours": str(p_data.get("shelfLifeInHours", "N/A")),
                 "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
                 "pincode_input": pincode,
-                "clicked_label": self.clicked_location_label,
+                "clicked_label": self.clicked_location_label
             }
-            products.append(item)
-            
+        except:
+            registry.counter("zepto_parse_errors_total").inc()
+            return None
+
+    @traced("ZeptoScraper.parse_captures")
+    def parse_captures(self, captured_data: list, cat_name: str, sub_name: str, pincode: str) -> List[ProductItem]:
+        """Turns a list of captured responses into products (first one wins per id)."""
+        products: List[ProductItem] = []
+        seen = set()
+        for capture in captured_data:
+            self.parse_capture(capture.get("data"), cat_name, sub_name, pincode, products, seen)
+        return products
+
+    def parse_capture(self, content, cat_name: str, sub_name: str, pincode: str,
+                      products: List[ProductItem], seen: set):
+        """Parses one decoded response (JSON value or Flight/HTML text) into `products`."""
+        # CASE 1: JSON Response (API)
+        if isinstance(content, dict) or isinstance(content, list):
+            # Traverse to find products
+            # Usually in props -> pageProps -> initialReduxState -> ... -> products
+            # Or simply a list of products in search/category response
+
+            # Flatten simple lists
+            items_to_check = []
+            if isinstance(content, list):
+                items_to_check = content
+            elif isinstance(content, dict):
+                # Check common keys
+                if "products" in content: items_to_check.extend(content["products"])
+                if "items" in content: items_to_check.extend(content["items"])
+                # Deep check for storeProducts
+                # This is a naive recursive finder could be better but sticking to known patterns
+                # Let's try to just dump the whole dict values if they look like products
+                pass
+
+            for item in items_to_check:
+                if isinstance(item, dict):
+                    p = self.parse_product_from_dict(item, cat_name, sub_name, pincode)
+                    if p and p['base_product_id'] not in seen:
+                        products.append(p)
+                        seen.add(p['base_product_id'])
+
+        # CASE 2: HTML/String Response (SSR Flight Data)
+        if isinstance(content, str) and len(content) > 10000:
+            product_details_map = build_flight_details_map(content)
+            self.parse_flight_links(content, product_details_map, cat_name, sub_name, pincode, products, seen)
+
+    @traced("ZeptoScraper.parse_flight_links")
+    def parse_flight_links(self, content: str, product_details_map: dict, cat_name: str, sub_name: str,
+                           pincode: str, products: List[ProductItem], seen: set):
+        """
+        Regex parsing logic for Flight/HTML string.
+        Matches: href="/pn/..." ... >Name</a> ... >Price</td>
+        """
+        patterns = rules.patterns
+        name_re = patterns["link_name"]
+        index_prefix_re = patterns["name_index_prefix"]
+        pack_size_re = patterns["pack_size_in_name"]
+        price_re = patterns["link_price"]
+
+        for match in patterns["product_link"].finditer(content):
+            try:
+                url_part = match.group(1)
+                if "pvid" not in url_part: continue 
+
+                # The 800 chars after the link are searched in place (pos/endpos), not sliced
+                start_idx = match.end()
+                end_idx = start_idx + 800
+
+                pvid = url_part.split("pvid/")[1] if "pvid/" in url_part else ""
+
+                # Name
+                name_match = name_re.search(content, start_idx, end_idx)
+                product_name = "Unknown"
+                pack_size = "N/A"
+                brand = "Unknown"
+                price_extracted = None
+
+                if name_match:
+                    raw_name = name_match.group(1).replace("<!-- -->", "").strip()
+                    product_name = index_prefix_re.sub('', raw_name)
+
+                # Pack Size Regex (from Name)
+                # Matches "500g", "1 kg", "1pc", "Pack of 2"
+                if product_name != "Unknown":
+                    size_match = pack_size_re.search(product_name)
+                    if size_match:
+                        pack_size = size_match.group(1)
+
+                # Brand from URL (Always try this)
+                if "/pn/" in url_part:
+                    try:
+                        slug = url_part.split("/pn/")[1]
+                        brand_slug = slug.split("-")[0]
+                        brand = brand_slug.title()
+                    except: pass
+
+                # Refine Brand if " - " exists in Name (overrides slug if valid)
+                if product_name != "Unknown" and " - " in product_name:
+                    parts = product_name.split(" - ")
+                    if len(parts) > 1 and len(parts[0]) < 20: 
+                            brand = parts[0]
+
+                # Lookup details
+                inventory = "N/A"
+                shelf_life = "N/A"
+
+                if pvid in product_details_map:
+                    details = product_details_map[pvid]
+                    inventory = details.get('inventory', "N/A")
+                    shelf_life = details.get('shelf_life', "N/A")
+
+                    # Fallback for pack size if regex failed
+                    if pack_size == "N/A" and 'pack_size_raw' in details:
+                        pack_size = details['pack_size_raw'] # Might need unit appened, but raw is better than N/A
+
+                # Price
+                price_match = price_re.search(content, start_idx, end_idx)
+                price = "N/A"
+                if price_match:
+                    price = price_match.group(1).replace('₹', '')
+                elif price_extracted:
+                    price = str(price_extracted)
+
+                if url_part not in seen:
+                    item: ProductItem = {
+                        "Category": cat_name,
+                        "Subcategory": sub_name,
+                        "Item Name": product_name,
+                        "Brand": brand, 
+                        "Mrp": price, 
+                        "Price": price,
+                        "Weight/pack_size": pack_size,
+                        "Delivery ETA": self.delivery_eta,
+                        "availability": "In Stock" if inventory != "0" and inventory != "N/A" else "Out of Stock",
+                        "inventory": inventory,
+                        "store_id": self.store_id,
+                        "base_product_id": url_part,
+                        "shelf_life_in_hours": shelf_life,
+                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                        "pincode_input": pincode,
+                        "clicked_label": self.clicked_location_label
+                    }
+                    products.append(item)
+                    seen.add(url_part)
+            except Exception as e:
+                pass
+
+    @traced("ZeptoScraper.scrape_availability", attrs=("product_url",))
+    async def scrape_availability(self, product_url: str, pincode: str = "N/A") -> List[AvailabilityResult]:
+        logger.info(f"Checking availability for {product_url} at {pincode}")
+        return await self.check_availability([product_url], pincode)
+
+    @traced("ZeptoScraper.check_availability", attrs=("pincode",))
+    async def check_availability(self, product_urls: List[str], pincode: str = "N/A") -> List[AvailabilityResult]:
+        """
+        Availability of many products at one location, one AvailabilityResult
+        per URL: the location is set once, then the product payloads are
+        fetched concurrently from inside the page (see fetch_availability_fast).
+        URLs the fast path can't answer are rendered and read with one
+        evaluate each; a URL that fails entirely gets a result with `error` set.
+        """
+        if self.location_pincode != pincode:
+            await self.set_location(pincode)
+            if self.location_pincode != pincode:
+                # Checking at the wrong (or no) location would report the wrong store's stock
+                error = f"Location {pincode} could not be set"
+                return [self.availability_result(url, pincode, None, error=error) for url in product_urls]
+
+        found: Dict[str, ProductAvailability] = {}
+        if self.fast_availability:
+            found = await self.fetch_availability_fast(product_urls)
+
+        # The rest are rendered on the pool's pages, one URL per page at a time
+        missing = [url for url in product_urls if url not in found]
+        rendered = {}
+        if missing:
+            pool = self.availability_page_pool()
+            results = await asyncio.gather(*(self.fetch_availability_pooled(pool, url, pincode) for url in missing))
+            rendered = dict(zip(missing, results))
+
+        return [self.availability_result(url, pincode, found[url]) if url in found else rendered[url]
+                for url in product_urls]
+
+    def availability_page_pool(self) -> PagePool:
+        """The page pool of the current context (rebuilt after a browser restart)."""
+        if self.page_pool is None or self.page_pool.context is not self.context:
+            self.page_pool = PagePool(self.context, self.availability_pages, seed_pages=[self.page])
+        return self.page_pool
+
+    async def fetch_availability_pooled(self, pool: PagePool, product_url: str, pincode: str) -> AvailabilityResult:
+        """fetch_availability_dom on a pool page; a failure only affects this URL."""
+        try:
+            async with pool.page() as page:
+                return await self.fetch_availability_dom(product_url, pincode, page)
         except Exception as e:
             logger.error(f"Error scraping availability for {product_url}: {e}")
-            
-        return products
+            return self.availability_result(product_url, pincode, None, error=str(e))
 
-    async def fetch_category_content(self, url: str) -> str:
+    async def fetch_availability_fast(self, product_urls: List[str]) -> Dict[str, ProductAvailability]:
+        """{url: ProductAvailability} for the URLs whose RSC payload had the product."""
+        found = {}
+        with span("availability.fast", urls=len(product_urls)) as s:
+            try:
+                responses = await self.page.evaluate(
+                    PRODUCT_FETCH_JS,
+                    [product_urls, {"RSC": "1"}, self.availability_concurrency, PRODUCT_LINE_MARKERS],
+                )
+            except Exception as e:
+                logger.warning(f"Fast availability fetch failed, falling back to page renders: {e}")
+                responses = []
+            for url, response in zip(product_urls, responses):
+                if not response or not response.get("body"):
+                    continue
+                try:
+                    info = parse_product_payload(response["body"], url)
+                except Exception as e:
+                    logger.warning(f"Could not parse product payload of {url}: {e}")
+                    registry.counter("zepto_parse_errors_total").inc()
+                    continue
+                if info:
+                    found[url] = info
+            s.set_attribute("found", len(found))
+        registry.counter("zepto_availability_fast_total", "Availability checks answered from product payloads").inc(len(found))
+        return found
+
+    async def fetch_availability_dom(self, product_url: str, pincode: str, page=None) -> AvailabilityResult:
+        """
+        Renders the product page and reads it with one evaluate: the inline
+        product payload when it has the product, the visible fields otherwise.
+        """
+        page = page or self.page
+        registry.counter("zepto_availability_dom_total", "Availability checks that needed a page render").inc()
+        try:
+            await page.goto(product_url, timeout=60000)
+            await self.human_delay(2)
+            fields = await page.evaluate(PRODUCT_DOM_JS, product_dom_args())
+        except Exception as e:
+            logger.error(f"Error scraping availability for {product_url}: {e}")
+            return self.availability_result(product_url, pincode, None, error=str(e))
+
+        info = None
+        try:
+            info = parse_product_payload(fields.get("payload") or "", product_url)
+        except Exception as e:
+            logger.warning(f"Could not parse inline product payload of {product_url}: {e}")
+            registry.counter("zepto_parse_errors_total").inc()
+        if info:
+            return self.availability_result(product_url, pincode, info)
+
+        # Visible fields only: no variant, seller or exact stock data
+        out_of_stock = bool(fields.get("out_of_stock"))
+        info = {
+            "name": fields.get("name") or "Unknown",
+            "price": price_to_float(fields.get("price")),
+            "mrp": price_to_float(fields.get("mrp")),
+            "in_stock": not out_of_stock,
+            "inventory": 0 if out_of_stock else None,
+        }
+        return self.availability_result(product_url, pincode, info)
+
+    def availability_result(self, product_url: str, pincode: str, info: Optional[dict],
+                            error: Optional[str] = None) -> AvailabilityResult:
+        """An AvailabilityResult from a ProductAvailability (or the subset the DOM gave)."""
+        info = info or {}
+        if error:
+            availability = "Unknown"
+        else:
+            availability = "In Stock" if info.get("in_stock") else "Out of Stock"
+        return {
+            "input_pincode": pincode,
+            "url": product_url,
+            "platform": "zepto",
+            "name": info.get("name") or "Unknown",
+            "price": info.get("price"),
+            "mrp": info.get("mrp"),
+            "availability": availability,
+            "seller_details": info.get("seller_details"),
+            "manufacturer_details": info.get("manufacturer_details"),
+            "marketer_details": info.get("marketer_details"),
+            "variant_count": info.get("variant_count"),
+            "variant_in_stock_count": info.get("variant_in_stock_count"),
+            "inventory": info.get("inventory"),
+            "scraped_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "error": error,
+        }
+
+    def account_request(self, stats: CategoryNetworkStats, headers: dict):
+        stats["requests"] += 1
+        size = content_length(headers)
+        stats["bytes_transferred"] += size
+        registry.counter("zepto_bytes_transferred_total", "Content-Length of all responses seen by the scrape listeners").inc(size)
+
+    def should_read_body(self, stats: CategoryNetworkStats, url: str) -> bool:
+        """Consults the learned allowlist before pulling a body over CDP."""
+        if self.payload_allowlist is None or self.payload_allowlist.should_read(url):
+            return True
+        stats["bodies_skipped"] += 1
+        registry.counter("zepto_bodies_skipped_total", "Response bodies skipped by the payload allowlist").inc()
+        return False
+
+    async def read_capped_body(self, stats: CategoryNetworkStats, response) -> Optional[bytes]:
+        """
+        Reads a response body unless it is larger than `max_body_bytes`, and
+        counts it as held until `release_body`. While `max_capture_bytes` are
+        already held the read waits for bodies to be released, and the body is
+        dropped if there is still no room after `capture_wait_seconds`. Tracks
+        the peak bytes held at once per category and in `zepto_capture_peak_bytes`.
+        """
+        expected = content_length(response.headers)
+        if expected > self.max_body_bytes:
+            stats["bodies_oversized"] += 1
+            return None
+        # Bodies without a Content-Length only need some room; with nothing held, anything fits
+        if not await self.wait_for_capture_room(stats, expected):
+            return None
+        # Reserve the advertised size so concurrent handlers see it before the read completes
+        self.capture_bytes += expected
+        try:
+            body = await response.body()
+        finally:
+            self.capture_bytes -= expected
+        if len(body) > self.max_body_bytes:
+            stats["bodies_oversized"] += 1
+            self._capture_released.set()
+            return None
+        self.capture_bytes += len(body)
+        if self.capture_bytes > stats["peak_capture_bytes"]:
+            stats["peak_capture_bytes"] = self.capture_bytes
+            peak = registry.gauge("zepto_capture_peak_bytes", "Most response bytes held for parsing at once")
+            if self.capture_bytes > peak.value:
+                peak.set(self.capture_bytes)
+        return body
+
+    def release_body(self, size: int):
+        self.capture_bytes -= size
+        self._capture_released.set()
+
+    async def wait_for_capture_room(self, stats: CategoryNetworkStats, size: int) -> bool:
+        """False when the capture budget stayed full for `capture_wait_seconds` (the body is then counted as dropped)."""
+        def full() -> bool:
+            return self.capture_bytes > 0 and self.capture_bytes + max(size, 1) > self.max_capture_bytes
+        if not full():
+            return True
+        stats["bodies_throttled"] += 1
+        registry.counter("zepto_bodies_throttled_total", "Body reads that waited for the capture budget").inc()
+        deadline = time.monotonic() + self.capture_wait_seconds
+        while full():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                stats["bodies_dropped"] += 1
+                registry.counter("zepto_bodies_dropped_total", "Bodies not read because the capture budget stayed full").inc()
+                logger.warning(f"Capture budget full ({self.capture_bytes / 1e6:.1f} MB held), dropped a body")
+                return False
+            self._capture_released.clear()
+            try:
+                await asyncio.wait_for(self._capture_released.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    def account_body(self, stats: CategoryNetworkStats, headers: dict, url: str, size: int, products_found: int):
+        stats["bodies_read"] += 1
+        stats["bytes_read"] += size
+        if not content_length(headers):
+            # Chunked/compressed responses carry no Content-Length; fall back to the body
+            stats["bytes_transferred"] += size
+        registry.counter("zepto_bytes_read_total").inc(size)
+        if products_found:
+            stats["bytes_kept"] += size
+            if products_found > stats["data_products"]:
+                stats["data_url"] = url
+                stats["data_products"] = products_found
+        if self.payload_allowlist is not None:
+            self.payload_allowlist.record(url, products_found > 0)
+
+    @traced("ZeptoScraper.fetch_category_content", attrs=("url",))
+    async def fetch_category_content(self, url: str, headers: Optional[dict] = None) -> str:
         """
         Fetches the raw content of a URL using the browser's fetch API.
         This maintains cookies/headers but avoids page rendering overhead.
         """
+        if headers is None:
+            headers = {
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+                'Upgrade-Insecure-Requests': '1'
+            }
         try:
-            content = await self.page.evaluate(f"""
-                async () => {{
-                    try {{
-                        const response = await fetch("{url}", {{
-                            headers: {{
-                                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                                'Upgrade-Insecure-Requests': '1'
-                            }}
-                        }});
+            content = await self.page.evaluate("""
+                async ([url, headers]) => {
+                    try {
+                        const response = await fetch(url, { headers });
+                        if (!response.ok) return null;
                         return await response.text();
-                    }} catch (e) {{
+                    } catch (e) {
                         return null;
-                    }}
-                }}
-            """)
+                    }
+                }
+            """, [url, headers])
             return content
         except Exception as e:
             logger.error(f"Fast fetch failed for {url}: {e}")
             return None
 
-    async def scrape_assortment_fast(self, category_url: str, pincode: str = None) -> List[ProductItem]:
+    @traced("ZeptoScraper.scrape_assortment_fast", attrs=("category_url",))
+    async def scrape_assortment_fast(self, category_url: str, pincode: str = None) -> ProductBatch:
         """
         Scrapes assortment using network interception to capture React Server Components (RSC) data.
         This is more robust than regex on HTML, ensuring Price, Name, and Inventory are captured.
@@ -584,66 +922,56 @@ class ZeptoScraper(BaseScraper):
         logger.info(f"Fast Scraping: {category_url}")
         
         # Extract Category/Sub from URL if possible
-        cat_name = "Unknown"
-        sub_name = "Unknown"
-        try:
-            if "/cn/" in category_url:
-                parts = category_url.split("/cn/")[1].split("/")
-                if len(parts) >= 2:
-                    cat_name = parts[0].replace("-", " ").title()
-                    sub_name = parts[1].replace("-", " ").title()
-        except: pass
+        cat_name, sub_name = category_names(category_url)
 
         captured_products = {}
+        paged_requests = {}
+        expected_total = None
+        
+        stats = new_category_stats(category_url)
+        self.network_stats[category_url] = stats
         
         # Define capture logic
         async def handle_response(response):
+            nonlocal expected_total
             try:
-                ct = response.headers.get("content-type", "")
+                headers = response.headers
+                ct = headers.get("content-type", "")
+                self.account_request(stats, headers)
                 if "application/json" in ct or "text/x-component" in ct:
-                    text = await response.text()
-                    
-                    # Optimization: check if line likely contains product data before heavy parsing
-                    if '"cardData":' not in text:
+                    if not self.should_read_body(stats, response.url):
+                        return
+                    body = await self.read_capped_body(stats, response)
+                    if body is None:
                         return
+                    try:
+                        text = body.decode("utf-8", "replace")
+                        registry.counter("zepto_responses_captured_total", "Response bodies read by the scrape listeners").inc()
 
-                    # Parse RSC/JSON for products
-                    # Strategy: Split by lines (RSC) or just parse JSON
-                    lines = text.split('\n')
-                    for line in lines:
-                        if '"cardData":' in line:
-                            # Try to strip RSC prefix (ID:JSON) if present
-                            parts = line.split(':', 1)
-                            json_part = parts[1] if len(parts) > 1 else line
-                                
-                            try:
-                                data = json.loads(json_part)
-                                
-                                # Recursive search for cardData
-                                def find_cards(obj):
-                                    cards = []
-                                    if isinstance(obj, dict):
-                                        if "cardData" in obj:
-                                            cards.append(obj["cardData"])
-                                        for k, v in obj.items():
-                                            cards.extend(find_cards(v))
-                                    elif isinstance(obj, list):
-                                        for item in obj:
-                                            cards.extend(find_cards(item))
-                                    return cards
-
-                                cards = find_cards(data)
-                                for card in cards:
-                                    if "id" in card:
-                                        captured_products[card["id"]] = card
-                            except:
-                                pass
+                        cards = extract_cards(text)
+                        self.account_body(stats, headers, response.url, len(body), len(cards))
+
+                        # Remember paged listing requests so we can drive the rest of the pages
+                        if page_number(response.url) is not None and cards:
+                            paged_requests[response.url] = response.request.headers
+                        # Any product body may advertise the total (scroll mode has no paged API)
+                        if expected_total is None and cards:
+                            expected_total = find_expected_total(text)
+
+                        captured_products.update(cards)
+                    finally:
+                        self.release_body(len(body))
             except:
                 pass
 
         # Attach listener
         self.page.on("response", handle_response)
+        listening = True
         
+        mode = "single"
+        pages = 1
+        exhausted = False
+        fetch_start = time.perf_counter()
         try:
             # Navigate
             # Use 'domcontentloaded' or 'networkidle' depending on speed. 
@@ -651,65 +979,119 @@ class ZeptoScraper(BaseScraper):
             await self.page.goto(category_url, timeout=45000, wait_until='networkidle')
             
             # Small fallback wait to ensure stream completes
-            await asyncio.sleep(2)
+            with span("ZeptoScraper.settle_wait"):
+                await asyncio.sleep(2 * self.delay_scale)
+
+            if paged_requests:
+                # Drive the category's own paged API until it runs dry.
+                # In-page fetches also fire "response"; detach so the engine alone merges them.
+                self.page.remove_listener("response", handle_response)
+                listening = False
+                mode = "paged"
+                sample_url = max(paged_requests, key=page_number)
+                template = page_url_template(sample_url)
+                headers = {k: v for k, v in paged_requests[sample_url].items() if k.lower() in self.PAGED_FETCH_HEADERS}
+
+                async def fetch_page(n):
+                    return await self.fetch_category_content(template.format(page=n), headers=headers)
+
+                engine = PaginationEngine(fetch_page, extract_cards, concurrency=self.page_concurrency,
+                                          max_pages=self.max_pages, start_page=page_number(sample_url) + 1)
+                with span("PaginationEngine.run", template=template):
+                    result = await engine.run(captured_products, expected=expected_total)
+                pages += result["pages"]
+                expected_total = result["expected"]
+                exhausted = result["exhausted"]
+            else:
+                # No paged API seen: keep scrolling while new RSC chunks add products
+                mode = "scroll"
+                scrolls, went_idle = await self.scroll_until_exhausted(lambda: len(captured_products), max_scrolls=self.max_pages)
+                pages += scrolls
+                # Only complete if the list stopped growing (or reached the advertised total), not at max_scrolls
+                exhausted = went_idle or (expected_total is not None and len(captured_products) >= expected_total)
             
         except Exception as e:
             logger.error(f"Error navigating to {category_url}: {e}")
         finally:
-            self.page.remove_listener("response", handle_response)
+            if listening:
+                self.page.remove_listener("response", handle_response)
 
-        # Convert captured data to ProductItem
-        products: List[ProductItem] = []
+        coverage: CategoryCoverage = {
+            "category_url": category_url,
+            "mode": mode,
+            "expected": expected_total,
+            "captured": len(captured_products),
+            "pages": pages,
+            "exhausted": exhausted,
+        }
+        self.category_coverage[category_url] = coverage
+        if expected_total is not None and len(captured_products) < expected_total:
+            logger.warning(f"Coverage gap on {category_url}: captured {len(captured_products)} of {expected_total}")
+
+        # Convert captured data to compact records under one shared header
+        parse_start = time.perf_counter()
+        products = ProductBatch(self.batch_header(cat_name, sub_name, pincode))
         
-        for pid, card in captured_products.items():
-            try:
-                # Basic Checks
-                product_info = card.get('product', {})
-                variant_info = card.get('productVariant', {})
-                
-                name = product_info.get('name')
-                if not name: continue 
-                    
-                # Price (paise -> rupees)
-                price = None
-                if 'sellingPrice' in card:
-                    price = float(card['sellingPrice']) / 100.0
-                elif 'discountedSellingPrice' in card:
-                    price = float(card['discountedSellingPrice']) / 100.0
-                    
-                mrp = None
-                if 'mrp' in card:
-                     mrp = float(card['mrp']) / 100.0
-                elif 'mrp' in variant_info:
-                     mrp = float(variant_info['mrp']) / 100.0
-                     
-                inventory = card.get('availableQuantity')
-                
-                # Format fields
-                item: ProductItem = {
-                    "Category": cat_name,
-                    "Subcategory": sub_name,
-                    "Item Name": name,
-                    "Brand": product_info.get('brand', "Unknown"),
-                    "Mrp": mrp if mrp is not None else "N/A",
-                    "Price": price if price is not None else "N/A",
-                    "Weight/pack_size": variant_info.get('formattedPacksize', "N/A"),
-                    "Delivery ETA": self.delivery_eta,
-                    "availability": "In Stock" if (inventory and inventory > 0) else "Out of Stock",
-                    "inventory": inventory if inventory is not None else "0",
-                    "store_id": card.get('storeId', self.store_id),
-                    "base_product_id": pid,
-                    "shelf_life_in_hours": variant_info.get('shelfLifeInHours', "N/A"),
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "pincode_input": pincode,
-                    "clicked_label": self.clicked_location_label
-                }
-                products.append(item)
-            except Exception as e:
-                 # logger.warning(f"Failed to parse product card: {e}")
-                 pass
+        with span("ZeptoScraper.card_to_record", cards=len(captured_products)):
+            for pid, card in captured_products.items():
+                record = self.card_to_record(pid, card)
+                if record:
+                    products.append(record)
+
+        self.last_timings = {"fetch": parse_start - fetch_start, "parse": time.perf_counter() - parse_start}
 
         logger.info(f"Fast scraped {len(products)} products from {category_url}")
         return products
 
+    def batch_header(self, cat_name: str, sub_name: str, pincode: str) -> BatchHeader:
+        """Per-category and per-location values shared by every record of a scrape."""
+        return BatchHeader(cat_name, sub_name, self.delivery_eta, self.store_id, pincode, self.clicked_location_label)
+
+    def card_to_record(self, pid: str, card: dict) -> Optional[ProductRecord]:
+        """Converts one RSC cardData block into a ProductRecord (see batch_header for the shared fields)."""
+        try:
+            # Basic Checks
+            product_info = card.get('product', {})
+            variant_info = card.get('productVariant', {})
+
+            name = product_info.get('name')
+            if not name: return None
 
+            # Price (paise -> rupees)
+            price = None
+            if 'sellingPrice' in card:
+                price = float(card['sellingPrice']) / 100.0
+            elif 'discountedSellingPrice' in card:
+                price = float(card['discountedSellingPrice']) / 100.0
+
+            mrp = None
+            if 'mrp' in card:
+                 mrp = float(card['mrp']) / 100.0
+            elif 'mrp' in variant_info:
+                 mrp = float(variant_info['mrp']) / 100.0
+
+            store_id = card.get('storeId')
+            # No availableQuantity has always meant inventory 0 on this path (CSV, DB and change detection rely on it)
+            inventory = card.get('availableQuantity')
+            return ProductRecord(
+                name,
+                product_info.get('brand', "Unknown"),
+                mrp,
+                price,
+                variant_info.get('formattedPacksize', "N/A"),
+                inventory if inventory is not None else 0,
+                pid,
+                variant_info.get('shelfLifeInHours'),
+                store_id if store_id != self.store_id else None,
+            )
+        except Exception as e:
+            # logger.warning(f"Failed to parse product card: {e}")
+            registry.counter("zepto_parse_errors_total").inc()
+            return None
+
+    def card_to_product(self, pid: str, card: dict, cat_name: str, sub_name: str, pincode: str) -> Optional[ProductItem]:
+        """Converts one RSC cardData block into a ProductItem row (CSV schema)."""
+        record = self.card_to_record(pid, card)
+        if record is None:
+            return None
+        return record.to_row(self.batch_header(cat_name, sub_name, pincode))
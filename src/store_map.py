@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("StoreMap")
+
+UNRESOLVED_STORE = "N/A"
+
+class StoreMap:
+    """
+    Persisted pincode -> Zepto dark store mapping.
+
+    Each entry records what `ZeptoScraper.set_location` saw for the pincode
+    (store_id, delivery ETA and the clicked address label) and when. Entries
+    older than `ttl_hours` are treated as unknown and re-resolved.
+    """
+
+    def __init__(self, path: str, ttl_hours: float = 24 * 7):
+        self.path = path
+        self.ttl_hours = ttl_hours
+        self.entries: Dict[str, dict] = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+            logger.info(f"Loaded {len(self.entries)} pincode->store mappings from {self.path}")
+        except Exception as e:
+            logger.warning(f"Could not read store map {self.path}: {e}")
+            self.entries = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self, entry: dict, now: Optional[datetime] = None) -> bool:
+        try:
+            resolved_at = datetime.fromisoformat(entry["resolved_at"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        now = now or datetime.now()
+        return (now - resolved_at).total_seconds() < self.ttl_hours * 3600
+
+    def get(self, pincode: str) -> Optional[dict]:
+        """Returns the entry for `pincode` if it is resolved and within the TTL."""
+        entry = self.entries.get(pincode)
+        if entry and entry.get("store_id", UNRESOLVED_STORE) != UNRESOLVED_STORE and self.is_fresh(entry):
+            return entry
+        return None
+
+    def set(self, pincode: str, store_id: str, eta: str = "N/A", clicked_label: str = "N/A"):
+        self.entries[pincode] = {
+            "store_id": store_id,
+            "eta": eta,
+            "clicked_label": clicked_label,
+            "resolved_at": datetime.now().isoformat(),
+        }
+
+    def stale_pincodes(self, pincodes: List[str]) -> List[str]:
+        return [p for p in pincodes if self.get(p) is None]
+
+    def group_by_store(self, pincodes: List[str]) -> Dict[str, List[str]]:
+        """
+        Groups pincodes by their mapped store_id, preserving input order.
+        Pincodes without a usable mapping get a group of their own so they are
+        still scraped individually.
+        """
+        groups: Dict[str, List[str]] = {}
+        for p in pincodes:
+            entry = self.get(p)
+            key = entry["store_id"] if entry else f"unresolved:{p}"
+            groups.setdefault(key, []).append(p)
+        return groups
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import queue
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from metrics import registry
+from work_queue import LocalWorkQueue, WorkQueue, node_name
+
+logger = logging.getLogger("Supervisor")
+
+def process_rss_mb(pid: Optional[int] = None) -> float:
+    import psutil
+    try:
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except psutil.Error:
+        return 0.0
+
+def process_tree_rss_mb(pid: Optional[int] = None, include_self: bool = True) -> float:
+    """RSS of a process's children (browser, renderers), plus its own unless `include_self=False`, in MB."""
+    import psutil
+    try:
+        proc = psutil.Process(pid)
+        procs = ([proc] if include_self else []) + proc.children(recursive=True)
+    except psutil.Error:
+        return 0.0
+    total = 0
+    for p in procs:
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+class WorkerSupervisor:
+    """
+    Runs scraper workers as separate OS processes, each with its own event
+    loop and browser, so one crash (or a wedged Playwright driver) only costs
+    that worker's current unit.
+
+    `target(name, task_queue, event_queue, *args)` is started in a fresh
+    (spawned) process per worker. It pulls task dicts from `task_queue` until
+    it gets `None`, and reports back on `event_queue` with
+    `(name, kind, payload)` tuples:
+
+    - `("done", task_id)` when a task finished (successfully or not),
+    - `("retire", reason)` before the last "done" when it is about to exit
+      voluntarily (e.g. RSS over budget),
+    - `("release", reason)` before "done" when the task should not count as
+      finished (e.g. the location never applied): the unit goes back to the
+      queue like a crashed one (failed after `max_attempts`) and the handler
+      gets "requeued" or "failed" instead of "done",
+    - `("metrics", registry.take_updates())` now and then; merged into this
+      process's registry as the `worker` series of the worker's slot (W-1,
+      W-2, ...; respawns continue their predecessor's series),
+    - anything else is forwarded to the handler of `run_until_idle`.
+
+    Units come from `work_queue` (an in-process `LocalWorkQueue` by default,
+    or a shared broker so several machines drain the same run). Each idle
+    worker gets one leased unit at a time and the supervisor heartbeats the
+    lease while the worker is alive. When a process dies or overruns
+    `task_timeout`, its unit is released back to the queue (which fails it
+    after `max_attempts` leases) and the worker is replaced while work remains.
+    """
+
+    def __init__(self, target: Callable, num_workers: int, args: tuple = (), max_attempts: int = 3,
+                 task_timeout: Optional[float] = None, max_restarts: int = 20, poll_interval: float = 0.5,
+                 work_queue: Optional[WorkQueue] = None):
+        self.ctx = mp.get_context("spawn")
+        self.target = target
+        self.num_workers = num_workers
+        self.args = args
+        self.task_timeout = task_timeout
+        self.max_restarts = max_restarts
+        self.poll_interval = poll_interval
+        self.work_queue = work_queue or LocalWorkQueue(max_attempts=max_attempts)
+        self.heartbeat_interval = max(1.0, self.work_queue.visibility_timeout / 3)
+        self.node = node_name()
+
+        self.events = self.ctx.Queue()
+        self.slots: Dict[str, dict] = {}
+        self.failed = []
+        self.restarts = 0
+        self._generations = {}
+
+        self.crashes_total = registry.counter("zepto_worker_crashes_total", "Worker processes that died or were killed mid-task")
+        self.respawns_total = registry.counter("zepto_worker_respawns_total", "Worker processes started to replace a dead or retired one")
+        self.requeued_total = registry.counter("zepto_units_requeued_total", "In-flight units put back after their worker died")
+        registry.gauge("zepto_active_workers", "Live worker processes", fn=lambda: len(self.slots))
+        registry.gauge("zepto_unit_backlog", "Units queued or leased, across all nodes", fn=self.work_queue.outstanding)
+
+    def start(self) -> "WorkerSupervisor":
+        for i in range(self.num_workers):
+            self._spawn(f"W-{i + 1}")
+        return self
+
+    def _spawn(self, base: str):
+        generation = self._generations.get(base, 0) + 1
+        self._generations[base] = generation
+        # A respawned worker gets a new name so late events from its dead predecessor are dropped
+        name = base if generation == 1 else f"{base}.{generation}"
+        task_queue = self.ctx.Queue()
+        process = self.ctx.Process(target=self.target, args=(name, task_queue, self.events) + tuple(self.args), name=name)
+        process.start()
+        self.slots[name] = {"base": base, "process": process, "queue": task_queue, "owner": f"{self.node}/{name}",
+                            "task": None, "task_started": None, "heartbeat_at": 0.0, "retiring": False, "release": None}
+        logger.info(f"Started worker {name} (pid {process.pid})")
+
+    def submit(self, task: dict) -> int:
+        return self.work_queue.put(task)
+
+    def _dispatch(self):
+        now = time.monotonic()
+        queue_empty = False
+        for slot in self.slots.values():
+            if slot["task"] is None and not slot["retiring"] and slot["process"].is_alive():
+                if queue_empty:
+                    continue
+                task = self.work_queue.lease(slot["owner"])
+                if task is None:
+                    # Nothing to hand out, but the busy slots after this one still need their heartbeat
+                    queue_empty = True
+                    continue
+                slot["task"] = task
+                slot["task_started"] = now
+                slot["heartbeat_at"] = now
+                slot["queue"].put(task)
+            elif slot["task"] is not None and now - slot["heartbeat_at"] > self.heartbeat_interval:
+                slot["heartbeat_at"] = now
+                if not self.work_queue.heartbeat(slot["task"]["id"], slot["owner"]):
+                    logger.warning(f"Lease on unit {slot['task']['id']} held by {slot['owner']} was lost")
+
+    async def _finish(self, name: str, task_id: int, handler):
+        slot = self.slots.get(name)
+        if not slot or not slot["task"] or slot["task"]["id"] != task_id:
+            return
+        task = slot["task"]
+        slot["task"] = None
+        slot["task_started"] = None
+        reason, slot["release"] = slot["release"], None
+        if reason:
+            await self._release(name, slot, task, reason, handler)
+            return
+        result = None
+        try:
+            result = await handler(name, "done", None, task)
+        finally:
+            self.work_queue.ack(task_id, slot["owner"], result)
+
+    async def _release(self, name: str, slot: dict, task: dict, reason: str, handler):
+        outcome = self.work_queue.release(task["id"], slot["owner"], error=reason)
+        if outcome == "requeued":
+            self.requeued_total.inc()
+            logger.warning(f"Requeued task {task['id']} ({task.get('kind')}) after attempt {task['attempts']}: {reason}")
+            await handler(name, "requeued", None, task)
+        else:
+            logger.error(f"Giving up on task {task['id']} ({task.get('kind')}) after {task['attempts']} attempts: {reason}")
+            self.failed.append(task)
+            await handler(name, "failed", None, task)
+
+    async def _check_workers(self, handler):
+        now = time.monotonic()
+        for name, slot in list(self.slots.items()):
+            process = slot["process"]
+            if process.is_alive() and self.task_timeout and slot["task_started"] and now - slot["task_started"] > self.task_timeout:
+                logger.error(f"Worker {name} exceeded {self.task_timeout:.0f}s on task {slot['task']['id']}. Killing it.")
+                process.kill()
+                process.join(5)
+            if process.is_alive():
+                continue
+
+            del self.slots[name]
+            task = slot["task"]
+            clean_exit = process.exitcode == 0 and slot["retiring"] and task is None
+            if not clean_exit:
+                self.crashes_total.inc()
+                logger.error(f"Worker {name} died (exit code {process.exitcode})")
+
+            if task is not None:
+                await self._release(name, slot, task, f"worker exit code {process.exitcode}", handler)
+
+            if self.work_queue.outstanding() and self.restarts < self.max_restarts:
+                self.restarts += 1
+                self.respawns_total.inc()
+                self._spawn(slot["base"])
+            elif self.work_queue.outstanding():
+                logger.error(f"Restart budget ({self.max_restarts}) used up; not replacing {name}")
+
+    async def run_until_idle(self, handler: Callable[[str, str, object, Optional[dict]], Awaitable[object]]):
+        """
+        Dispatches queued units until none is queued or leased (on any node),
+        calling `await handler(worker, kind, payload, task)` for each worker
+        event (`task` is the unit that worker is on), plus the supervisor's
+        own "done", "requeued" and "failed" notifications. Whatever the
+        handler returns for "done" is stored as the unit's result. The
+        handler may submit more units.
+        """
+        loop = asyncio.get_running_loop()
+        # Replace workers that retired or died while there was nothing to do
+        live_bases = {slot["base"] for slot in self.slots.values()}
+        for i in range(self.num_workers):
+            base = f"W-{i + 1}"
+            if self.work_queue.outstanding() and base not in live_bases and self.restarts < self.max_restarts:
+                self.restarts += 1
+                self.respawns_total.inc()
+                self._spawn(base)
+
+        while self.work_queue.outstanding():
+            if not self.slots:
+                logger.error(f"No live workers left with {self.work_queue.outstanding()} units outstanding")
+                if not self.work_queue.shared:
+                    # Nobody else will pick these up
+                    while (task := self.work_queue.lease(f"{self.node}/supervisor")) is not None:
+                        self.work_queue.release(task["id"], f"{self.node}/supervisor", error="no live workers", give_up=True)
+                        self.failed.append(task)
+                        await handler(None, "failed", None, task)
+                break
+
+            self._dispatch()
+            try:
+                name, kind, payload = await loop.run_in_executor(None, self.events.get, True, self.poll_interval)
+            except queue.Empty:
+                name = None
+
+            if name is not None:
+                slot = self.slots.get(name)
+                try:
+                    if kind == "done":
+                        await self._finish(name, payload, handler)
+                    elif kind == "retire":
+                        if slot:
+                            slot["retiring"] = True
+                            logger.info(f"Worker {name} retiring: {payload}")
+                    elif kind == "release":
+                        if slot:
+                            slot["release"] = payload or "released by worker"
+                    elif kind == "metrics":
+                        # Also from workers that just died: what they counted still happened
+                        self._merge_metrics(name, payload)
+                    elif slot:
+                        await handler(name, kind, payload, slot["task"])
+                except Exception as e:
+                    logger.error(f"Event handler failed on {kind} from {name}: {e}")
+
+            await self._check_workers(handler)
+
+    def _merge_metrics(self, name: str, updates: dict):
+        registry.merge_worker(name.split(".")[0], updates or {})
+
+    def _drain_metrics(self):
+        """Merges the metrics workers sent on their way out; other late events no longer matter."""
+        while True:
+            try:
+                name, kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                return
+            except Exception:
+                return
+            if kind == "metrics":
+                self._merge_metrics(name, payload)
+
+    def stop(self, timeout: float = 60):
+        for slot in self.slots.values():
+            try:
+                slot["queue"].put(None)
+            except Exception:
+                pass
+        deadline = time.monotonic() + timeout
+        for name, slot in self.slots.items():
+            slot["process"].join(max(0.0, deadline - time.monotonic()))
+            if slot["process"].is_alive():
+                logger.warning(f"Worker {name} did not exit in time. Terminating.")
+                slot["process"].terminate()
+                slot["process"].join(5)
+        self.slots = {}
+        self._drain_metrics()
@@ -0,0 +1,209 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("Tracing")
+
+# Innermost open span of the current task/thread (asyncio tasks copy the context,
+# so spans opened in a worker coroutine nest under the span that created it).
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """
+    A timed operation. Field names follow the OpenTelemetry span model
+    (trace_id/span_id/parent_span_id, unix-nano timestamps, attributes, status)
+    so exported JSONL can be converted to OTLP without guessing.
+    """
+
+    __slots__ = ("tracer", "name", "attributes", "trace_id", "span_id", "parent_span_id",
+                 "start_ns", "end_ns", "status", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict):
+        parent = _current_span.get()
+        self.tracer = tracer
+        self.name = name
+        self.attributes = dict(parent.inherited() if parent else {}, **attributes)
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.start_ns = 0
+        self.end_ns = 0
+        self.status = "OK"
+        self._token = None
+
+    def inherited(self) -> dict:
+        """Attributes copied to child spans so every span can be grouped per pincode."""
+        return {k: v for k, v in self.attributes.items() if k in Tracer.INHERITED_ATTRIBUTES}
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc_type is not None:
+            self.status = "ERROR"
+            self.attributes["exception"] = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.tracer.export(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+class _NoopSpan:
+    """Returned while tracing is off: entering/leaving costs two attribute lookups."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+class JsonlExporter:
+    """Appends finished spans to a JSONL file, one span per line."""
+
+    def __init__(self, path: str, flush_every: int = 200):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.flush_every = flush_every
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._buffer.append(span.to_dict())
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in self._buffer:
+                f.write(json.dumps(record, default=str) + "\n")
+        self._buffer = []
+
+    def shutdown(self):
+        with self._lock:
+            self._flush_locked()
+
+class Tracer:
+    # Propagated from parent to child spans
+    INHERITED_ATTRIBUTES = {"pincode", "worker", "store_id"}
+
+    def __init__(self):
+        self.exporters = []
+        self._otel_tracer = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters) or self._otel_tracer is not None
+
+    def span(self, name: str, **attributes):
+        if self._otel_tracer is not None:
+            return self._otel_tracer.start_as_current_span(name, attributes=attributes)
+        if not self.exporters:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def export(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Span export failed: {e}")
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def use_opentelemetry(self, otel_tracer=None):
+        """Routes spans to an OpenTelemetry tracer (requires `opentelemetry-api`)."""
+        if otel_tracer is None:
+            from opentelemetry import trace
+            otel_tracer = trace.get_tracer("zepto-scraper")
+        self._otel_tracer = otel_tracer
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+        self.exporters = []
+        self._otel_tracer = None
+
+# Process-wide tracer; a no-op until an exporter is configured
+tracer = Tracer()
+
+def span(name: str, **attributes):
+    return tracer.span(name, **attributes)
+
+def configure_jsonl(path: str) -> JsonlExporter:
+    exporter = JsonlExporter(path)
+    tracer.add_exporter(exporter)
+    logger.info(f"Tracing spans to {path}")
+    return exporter
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def traced(name: Optional[str] = None, attrs: tuple = ()):
+    """
+    Decorator that wraps a function or coroutine in a span. `attrs` names
+    call arguments to record as span attributes (e.g. ("pincode", "category_url")).
+    """
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+        sig = inspect.signature(fn) if attrs else None
+
+        def span_attributes(args, kwargs):
+            if not sig:
+                return {}
+            try:
+                bound = sig.bind_partial(*args, **kwargs).arguments
+            except TypeError:
+                return {}
+            return {a: bound[a] for a in attrs if a in bound and bound[a] is not None}
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await fn(*args, **kwargs)
+                with tracer.span(span_name, **span_attributes(args, kwargs)):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with tracer.span(span_name, **span_attributes(args, kwargs)):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
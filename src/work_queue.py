@@ -0,0 +1,336 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("WorkQueue")
+
+def node_name() -> str:
+    """Identifies this runner in lease owners: `<host>:<pid>`."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class WorkQueue(ABC):
+    """
+    Leased work units. A unit is a JSON-serialisable dict; `lease` returns it
+    with its `id` and `attempts` added.
+
+    A leased unit stays invisible to other consumers until its lease expires
+    (`visibility_timeout` seconds without a `heartbeat`), after which it is
+    handed out again. `release` gives a unit back early, and a unit that has
+    been leased `max_attempts` times is marked failed instead of requeued.
+    """
+
+    shared = False  # True when other processes/machines may consume the same queue
+
+    def __init__(self, visibility_timeout: float = 300, max_attempts: int = 3):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def put(self, payload: dict) -> int:
+        pass
+
+    def put_many(self, payloads: List[dict]) -> List[int]:
+        return [self.put(p) for p in payloads]
+
+    @abstractmethod
+    def lease(self, owner: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    def heartbeat(self, task_id: int, owner: str) -> bool:
+        """Extends the lease; False if the unit is no longer leased by `owner`."""
+
+    @abstractmethod
+    def ack(self, task_id: int, owner: str, result=None):
+        pass
+
+    @abstractmethod
+    def release(self, task_id: int, owner: str, error: str = "", give_up: bool = False) -> str:
+        """Returns "requeued" or "failed"."""
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        """Units per state: queued, leased, done, failed."""
+
+    def outstanding(self) -> int:
+        counts = self.counts()
+        return counts.get("queued", 0) + counts.get("leased", 0)
+
+    @abstractmethod
+    def results(self, kind: Optional[str] = None) -> list:
+        """Results passed to `ack`, optionally only for units whose payload `kind` matches."""
+
+    @abstractmethod
+    def close(self):
+        """Marks the queue as complete: no more units will be added."""
+
+    @abstractmethod
+    def is_closed(self) -> bool:
+        pass
+
+    def reset(self):
+        """Drops every unit and reopens the queue."""
+
+class LocalWorkQueue(WorkQueue):
+    """In-process queue (the default): same semantics, nothing persisted."""
+
+    def __init__(self, visibility_timeout: float = 300, max_attempts: int = 3):
+        super().__init__(visibility_timeout, max_attempts)
+        self.reset()
+
+    def reset(self):
+        self.units: Dict[int, dict] = {}
+        self.ready = deque()
+        self.next_id = 1
+        self.closed = False
+
+    def put(self, payload: dict) -> int:
+        task_id = self.next_id
+        self.next_id += 1
+        self.units[task_id] = {"payload": payload, "state": "queued", "attempts": 0,
+                               "owner": None, "lease_until": 0.0, "result": None, "error": ""}
+        self.ready.append(task_id)
+        return task_id
+
+    def _reclaim_expired(self, now: float):
+        for task_id, unit in self.units.items():
+            if unit["state"] == "leased" and unit["lease_until"] < now:
+                logger.warning(f"Lease on unit {task_id} held by {unit['owner']} expired")
+                self._requeue(task_id, unit, "lease expired")
+
+    def _requeue(self, task_id: int, unit: dict, error: str, give_up: bool = False) -> str:
+        unit["owner"] = None
+        unit["error"] = error
+        if give_up or unit["attempts"] >= self.max_attempts:
+            unit["state"] = "failed"
+            return "failed"
+        unit["state"] = "queued"
+        self.ready.appendleft(task_id)
+        return "requeued"
+
+    def lease(self, owner: str) -> Optional[dict]:
+        now = time.time()
+        self._reclaim_expired(now)
+        while self.ready:
+            task_id = self.ready.popleft()
+            unit = self.units[task_id]
+            if unit["state"] != "queued":
+                continue
+            unit["state"] = "leased"
+            unit["attempts"] += 1
+            unit["owner"] = owner
+            unit["lease_until"] = now + self.visibility_timeout
+            return dict(unit["payload"], id=task_id, attempts=unit["attempts"])
+        return None
+
+    def heartbeat(self, task_id: int, owner: str) -> bool:
+        unit = self.units.get(task_id)
+        if not unit or unit["state"] != "leased" or unit["owner"] != owner:
+            return False
+        unit["lease_until"] = time.time() + self.visibility_timeout
+        return True
+
+    def ack(self, task_id: int, owner: str, result=None):
+        unit = self.units.get(task_id)
+        if not unit or unit["owner"] != owner:
+            logger.warning(f"Ack for unit {task_id} by {owner}, which no longer holds it")
+        if unit:
+            unit["state"] = "done"
+            unit["owner"] = None
+            unit["result"] = result
+
+    def release(self, task_id: int, owner: str, error: str = "", give_up: bool = False) -> str:
+        unit = self.units.get(task_id)
+        if not unit or unit["state"] != "leased" or unit["owner"] != owner:
+            return unit["state"] if unit else "failed"
+        return self._requeue(task_id, unit, error, give_up)
+
+    def counts(self) -> Dict[str, int]:
+        self._reclaim_expired(time.time())
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        for unit in self.units.values():
+            counts[unit["state"]] += 1
+        return counts
+
+    def results(self, kind: Optional[str] = None) -> list:
+        return [u["result"] for u in self.units.values()
+                if u["state"] == "done" and u["result"] is not None and (kind is None or u["payload"].get("kind") == kind)]
+
+    def close(self):
+        self.closed = True
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+class SqliteWorkQueue(WorkQueue):
+    """
+    Broker backed by a SQLite file, so several runners (one per machine, or
+    several on one box) can pull units from the same queue. Every operation
+    is a short `BEGIN IMMEDIATE` transaction; WAL mode keeps readers from
+    blocking. The file must live on storage all nodes can lock reliably (a
+    local disk or a well-behaved network share); `name` separates runs.
+    """
+
+    shared = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS work_units (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            queue TEXT NOT NULL,
+            kind TEXT,
+            payload TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            owner TEXT,
+            lease_until REAL,
+            result TEXT,
+            error TEXT,
+            updated_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS work_units_ready ON work_units (queue, state, id);
+        CREATE TABLE IF NOT EXISTS work_queues (
+            queue TEXT PRIMARY KEY,
+            closed INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    def __init__(self, path: str, name: str = "default", visibility_timeout: float = 300, max_attempts: int = 3):
+        super().__init__(visibility_timeout, max_attempts)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.name = name
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        self.conn.execute("INSERT OR IGNORE INTO work_queues (queue) VALUES (?)", (name,))
+
+    def _transaction(self):
+        return _ImmediateTransaction(self.conn)
+
+    def reset(self):
+        with self._transaction() as cur:
+            cur.execute("DELETE FROM work_units WHERE queue = ?", (self.name,))
+            cur.execute("UPDATE work_queues SET closed = 0 WHERE queue = ?", (self.name,))
+
+    def put(self, payload: dict) -> int:
+        return self.put_many([payload])[0]
+
+    def put_many(self, payloads: List[dict]) -> List[int]:
+        ids = []
+        now = time.time()
+        with self._transaction() as cur:
+            for p in payloads:
+                cur.execute("INSERT INTO work_units (queue, kind, payload, updated_at) VALUES (?, ?, ?, ?)",
+                            (self.name, p.get("kind"), json.dumps(p), now))
+                ids.append(cur.lastrowid)
+        return ids
+
+    def _reclaim_expired(self, cur, now: float):
+        cur.execute("""UPDATE work_units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                              owner = NULL, error = 'lease expired', updated_at = ?
+                       WHERE queue = ? AND state = 'leased' AND lease_until < ?""",
+                    (self.max_attempts, now, self.name, now))
+        if cur.rowcount:
+            logger.warning(f"Reclaimed {cur.rowcount} units with expired leases")
+
+    def lease(self, owner: str) -> Optional[dict]:
+        now = time.time()
+        with self._transaction() as cur:
+            self._reclaim_expired(cur, now)
+            row = cur.execute("SELECT id, payload, attempts FROM work_units WHERE queue = ? AND state = 'queued' ORDER BY id LIMIT 1",
+                              (self.name,)).fetchone()
+            if not row:
+                return None
+            task_id, payload, attempts = row
+            cur.execute("UPDATE work_units SET state = 'leased', attempts = ?, owner = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                        (attempts + 1, owner, now + self.visibility_timeout, now, task_id))
+        return dict(json.loads(payload), id=task_id, attempts=attempts + 1)
+
+    def heartbeat(self, task_id: int, owner: str) -> bool:
+        now = time.time()
+        with self._transaction() as cur:
+            cur.execute("UPDATE work_units SET lease_until = ?, updated_at = ? WHERE id = ? AND state = 'leased' AND owner = ?",
+                        (now + self.visibility_timeout, now, task_id, owner))
+            return cur.rowcount == 1
+
+    def ack(self, task_id: int, owner: str, result=None):
+        with self._transaction() as cur:
+            cur.execute("UPDATE work_units SET state = 'done', owner = NULL, result = ?, updated_at = ? WHERE id = ?",
+                        (json.dumps(result) if result is not None else None, time.time(), task_id))
+
+    def release(self, task_id: int, owner: str, error: str = "", give_up: bool = False) -> str:
+        with self._transaction() as cur:
+            row = cur.execute("SELECT state, attempts, owner FROM work_units WHERE id = ?", (task_id,)).fetchone()
+            if not row:
+                return "failed"
+            state, attempts, current_owner = row
+            if state != "leased" or current_owner != owner:
+                return state
+            new_state = "failed" if give_up or attempts >= self.max_attempts else "queued"
+            cur.execute("UPDATE work_units SET state = ?, owner = NULL, error = ?, updated_at = ? WHERE id = ?",
+                        (new_state, error, time.time(), task_id))
+        return "failed" if new_state == "failed" else "requeued"
+
+    def counts(self) -> Dict[str, int]:
+        with self._transaction() as cur:
+            self._reclaim_expired(cur, time.time())
+            rows = cur.execute("SELECT state, COUNT(*) FROM work_units WHERE queue = ? GROUP BY state", (self.name,)).fetchall()
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def results(self, kind: Optional[str] = None) -> list:
+        sql = "SELECT result FROM work_units WHERE queue = ? AND state = 'done' AND result IS NOT NULL"
+        params = [self.name]
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        return [json.loads(r[0]) for r in self.conn.execute(sql + " ORDER BY id", params)]
+
+    def close(self):
+        self.conn.execute("UPDATE work_queues SET closed = 1 WHERE queue = ?", (self.name,))
+
+    def is_closed(self) -> bool:
+        row = self.conn.execute("SELECT closed FROM work_queues WHERE queue = ?", (self.name,)).fetchone()
+        return bool(row and row[0])
+
+class _ImmediateTransaction:
+    """`BEGIN IMMEDIATE` ... COMMIT/ROLLBACK, taking the write lock up front."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn.cursor()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+def open_work_queue(url: Optional[str], name: str = "default", visibility_timeout: float = 300,
+                    max_attempts: int = 3) -> WorkQueue:
+    """
+    `None`/"" or "local" -> LocalWorkQueue; "sqlite:///path/to/queue.db" -> SqliteWorkQueue.
+    """
+    if not url or url == "local":
+        return LocalWorkQueue(visibility_timeout, max_attempts)
+    if url.startswith("sqlite:///"):
+        return SqliteWorkQueue(url[len("sqlite:///"):], name, visibility_timeout, max_attempts)
+    raise ValueError(f"Unsupported work queue URL: {url}")
+
+async def keep_leased(queue: WorkQueue, task_id: int, owner: str, interval: Optional[float] = None):
+    """Heartbeats a lease until cancelled (run it alongside the unit's work)."""
+    interval = interval or max(1.0, queue.visibility_timeout / 3)
+    while True:
+        await asyncio.sleep(interval)
+        if not queue.heartbeat(task_id, owner):
+            logger.warning(f"Lost the lease on unit {task_id}")
+            return